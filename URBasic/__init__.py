@@ -32,11 +32,20 @@ from URBasic.connectionState import ConnectionState
 from URBasic.dashboard import DashBoard
 from URBasic.dataLog import DataLog
 from URBasic.dataLogging import DataLogging
+from URBasic.configuration import LogConfiguration, RTDEConfiguration
+from URBasic.columnLog import ColumnLog
 #from URBasic.kinematic import *
 from URBasic.manipulation import *
 from URBasic.realTimeClient import RealTimeClient
 from URBasic.robotConnector import RobotConnector
+from URBasic.derivedChannels import DerivedChannels
+import URBasic.filters
 from URBasic.robotModel import RobotModel
+from URBasic.sharedRobotModel import SharedRobotModel
 from URBasic.rtde import RTDE
+from URBasic.asyncRtde import AsyncRTDE
+from URBasic.rtdeReplay import ReplayRTDE
+from URBasic.rtdeServer import RTDEServer
+from URBasic.reactor import Reactor
 from URBasic.urScript import UrScript
 from URBasic.urScriptExt import UrScriptExt
@@ -0,0 +1,396 @@
+'''
+Python 3.x library to control an UR robot through its TCP/IP interfaces
+Copyright (C) 2017  Martin Huus Bjerge, Rope Robotics ApS, Denmark
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+and associated documentation files (the "Software"), to deal in the Software without restriction,
+including without limitation the rights to use, copy, modify, merge, publish, distribute,
+sublicense, and/or sell copies of the Software, and to permit persons to whom the Software
+is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL "Rope Robotics ApS" BE LIABLE FOR ANY CLAIM,
+DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Except as contained in this notice, the name of "Rope Robotics ApS" shall not be used
+in advertising or otherwise to promote the sale, use or other dealings in this Software
+without prior written authorization from "Rope Robotics ApS".
+'''
+__author__ = "Martin Huus Bjerge"
+__copyright__ = "Copyright 2017, Rope Robotics ApS, Denmark"
+__license__ = "MIT License"
+
+import URBasic
+import asyncio
+import collections
+import socket
+from URBasic.rtde import Command, ConnectionState, RTDE, RTDEFrameBuffer, RTDERecorder, RTDESession
+
+DEFAULT_TIMEOUT = 1.0
+
+class AsyncRTDE(asyncio.BufferedProtocol):
+    '''
+    asyncio interface to UR robot Real Time Data Exchange interface.
+    Uses the same recipe negotiation and decoding (RTDESession) as URBasic.rtde.RTDE,
+    but is served by the asyncio event loop instead of a thread, so one event loop
+    can serve several robots.
+
+    Received data is read directly into the RTDEFrameBuffer (asyncio.BufferedProtocol)
+    and delivered through the async iterator samples(). At most maxQueued samples are waiting:
+    when the queue is full either the oldest sample is dropped (dropOldest=True, counted in dropped) or
+    decoding stops at the next package and reading from the socket is paused until the consumer
+    catches up (dropOldest=False), the packages already read wait undecoded in the receive buffer.
+
+    Input parameters:
+    robotModel (RobotModel): The robot model to update, ipAddress must be set
+    conf_filename (string):  [Optional] Path to xml file describing what channels to activate
+    historySeconds (float): [Optional] Keep a time series history of this length of all output fields
+    frequency (float): [Optional] Output package frequency, default is the controller frequency
+    outputFields (list<str>): [Optional] Output fields to receive instead of the receive fields of the configuration file
+    recordFile (str): [Optional] Record all packages to this file for offline replay, see RTDERecorder
+    maxQueued (int): Max number of samples waiting for the consumer
+    dropOldest (bool): Drop the oldest sample when the queue is full, else pause reading
+
+    Example:
+    import asyncio
+    import URBasic
+    async def main():
+        robotModel = URBasic.robotModel.RobotModel()
+        robotModel.ipAddress = '192.168.56.101'
+        rtde = URBasic.asyncRtde.AsyncRTDE(robotModel)
+        await rtde.connect()
+        async for sample in rtde.samples():
+            print(sample['actual_TCP_pose'])
+            await rtde.send('input_int_register_0', 1)
+        await rtde.close()
+    asyncio.run(main())
+    '''
+
+    def __init__(self, robotModel, conf_filename=None, historySeconds=None, frequency=None, outputFields=None, recordFile=None, maxQueued=100, dropOldest=True):
+        '''
+        Constructor see class description for more info.
+        '''
+        if(False):
+            assert isinstance(robotModel, URBasic.robotModel.RobotModel)  ### This line is to get code completion for RobotModel
+        self.__robotModel = robotModel
+
+        logger = URBasic.dataLogging.DataLogging()
+        name = logger.AddEventLogging(__name__,log2Consol=False)
+        self._logger = logger.__dict__[name]
+        self.__session = RTDESession(robotModel, conf_filename, self._logger, historySeconds, frequency)
+        self.__frameBuffer = RTDEFrameBuffer()
+        self.__outputFields = outputFields
+        self.__recorder = None
+        if recordFile is not None:
+            self.__recorder = RTDERecorder(recordFile)
+        self.__transport = None
+        self.__responses = {}
+        self.__queue = collections.deque()
+        self.__maxQueued = maxQueued
+        self.__dropOldest = dropOldest
+        self.__readingPaused = False
+        self.__closing = False
+        self.__available = None
+        self.__writable = None
+        self.__closed = None
+        self.dropped = 0
+        self._logger.info('AsyncRTDE constructor done')
+
+    async def connect(self, port=30004, timeout=DEFAULT_TIMEOUT):
+        '''
+        Connect to the robot controller, negotiate the recipes and start the data synchronization.
+
+        Input parameters:
+        port (int): RTDE port of the controller
+        timeout (float): Max time to wait for each step in seconds
+
+        Return value:
+        success (boolean)
+        '''
+        loop = asyncio.get_running_loop()
+        self.__available = asyncio.Event()
+        self.__writable = asyncio.Event()
+        self.__writable.set()
+        self.__closed = loop.create_future()
+        self.__closing = False
+        await asyncio.wait_for(loop.create_connection(lambda: self, self.__robotModel.ipAddress, port), timeout)
+
+        await self.__request(Command.RTDE_GET_URCONTROL_VERSION, self.__session.controllerVersionRequest(), timeout)
+        for protocol in (2, 1):
+            await self.__request(Command.RTDE_REQUEST_PROTOCOL_VERSION, self.__session.protocolVersionRequest(protocol), timeout)
+            if self.__session.protocolVersion() is not None:
+                break
+        package = self.__session.setupOutputsRequest(self.__outputFields)
+        if package is None:
+            return False
+        await self.__request(Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS, package, timeout)
+        for package in self.__session.setupInputsRequests():
+            await self.__request(Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS, package, timeout)
+        if self.__session.setupRejected():
+            self._logger.error('RTDE interface not started: ' + str(self.__session.setupError() or 'input recipe fields in use'))
+            return False
+        await self.__request(Command.RTDE_CONTROL_PACKAGE_START, self.__session.startRequest(), timeout)
+        return self.isRunning()
+
+    async def reduceOutputRecipe(self, fields=[], timeout=DEFAULT_TIMEOUT):
+        '''
+        Stop the usage tracking of the robot model (see RobotModel.trackUsage) and
+        renegotiate the output recipe to the used fields, see RTDE.reduceOutputRecipe
+
+        Return value:
+        success (boolean)
+        '''
+        self.__robotModel.trackUsage(False)
+        decoder = self.__session.outputDecoder()
+        if decoder is None:
+            self._logger.error('reduceOutputRecipe: No output recipe set up')
+            return False
+        used = self.__robotModel.usedFields() | set(fields) | set(RTDE.REQUIRED_OUTPUT_FIELDS)
+        return await self.setupOutputRecipe([name for name in decoder.names if name in used], timeout)
+
+    async def setupOutputRecipe(self, output_variables, timeout=DEFAULT_TIMEOUT):
+        '''
+        Change the output recipe while running (pause, setup outputs, start), see RTDE.setupOutputRecipe
+
+        Return value:
+        success (boolean)
+        '''
+        names = ['timestamp'] + [name for name in output_variables if name != 'timestamp']
+        self.__outputFields = names
+        if not self.isRunning():
+            return False
+        await self.__request(Command.RTDE_CONTROL_PACKAGE_PAUSE, self.__session.pauseRequest(), timeout)
+        await self.__request(Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS, self.__session.setupOutputsRequest(names), timeout)
+        await self.__request(Command.RTDE_CONTROL_PACKAGE_START, self.__session.startRequest(), timeout)
+        return self.isRunning()
+
+    async def close(self, timeout=DEFAULT_TIMEOUT):
+        '''
+        Pause the data synchronization and close the connection.
+        '''
+        if self.__transport is None:
+            return
+        #From now on a full sample queue drops the oldest sample, so the pause response
+        #is read even when the consumer stopped reading samples
+        self.__closing = True
+        if self.__readingPaused:
+            self.__readingPaused = False
+            self.__decodeFrames()
+            self.__transport.resume_reading()
+        if self.isRunning():
+            try:
+                await self.__request(Command.RTDE_CONTROL_PACKAGE_PAUSE, self.__session.pauseRequest(), timeout)
+            except (asyncio.TimeoutError, ConnectionError):
+                self._logger.warning('RTDE pause not acknowledged before close')
+        transport = self.__transport
+        transport.close()
+        try:
+            await asyncio.wait_for(self.__closed, timeout)
+        except asyncio.TimeoutError:
+            self._logger.warning('RTDE connection not closed within ' + str(timeout) + ' s, aborted')
+            transport.abort()
+        self.__session.closeColumnLog()
+        self._logger.info("AsyncRTDE interface is stopped")
+
+    async def __request(self, command, package, timeout):
+        if self.__transport is None:
+            raise ConnectionError('RTDE not connected to robot')
+        future = asyncio.get_running_loop().create_future()
+        self.__responses[command] = future
+        self.__write(package)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.__responses.pop(command, None)
+
+    async def samples(self):
+        '''
+        Async iterator returning each received data package as a dictionary of field name and value.
+        The iterator ends when the connection is closed.
+        '''
+        while True:
+            while len(self.__queue):
+                sample = self.__queue.popleft()
+                if self.__readingPaused and self.__transport is not None:
+                    self.__readingPaused = False
+                    #Decode the packages left in the receive buffer before reading more
+                    self.__decodeFrames()
+                    if not self.__readingPaused:
+                        self.__transport.resume_reading()
+                yield sample
+            if self.__transport is None:
+                return
+            self.__available.clear()
+            await self.__available.wait()
+
+    async def send(self, variable_name=None, value=None, recipe=None, changedOnly=False):
+        '''
+        Set data (optional) and send the input recipes to the robot controller.
+        Waits while the transport write buffer is full.
+
+        Input parameters:
+        variable_name (List/str): [Optional] Variable name from the list of possible RTDE inputs, see setData
+        value (list/int/double): [Optional] Value(s) to set
+        recipe (str): [Optional] Name of the input recipe to send, see RTDESession.dataRequests
+        changedOnly (bool): [Optional] Only send the input recipes with changed data
+
+        Return value:
+        success (boolean)
+        '''
+        if variable_name is not None:
+            self.__session.setData(variable_name, value)
+        packages = self.__session.dataRequests(recipe, changedOnly)
+        if packages is None or self.__transport is None:
+            return False
+        await self.__writable.wait()
+        for package in packages:
+            #The transport may keep unsent data, so the reused send buffer is copied
+            self.__write(bytes(package))
+        return True
+
+    def __write(self, package):
+        self.__transport.write(package)
+        if self.__recorder is not None:
+            self.__recorder.recordPackage(RTDERecorder.SENT, package)
+
+    def setData(self, variable_name, value):
+        '''
+        Set data to be send to the robot, see RTDESession.setData
+        '''
+        return self.__session.setData(variable_name, value)
+
+    def isRunning(self):
+        '''
+        Return True if RTDE interface is running
+        '''
+        return self.__session.connectionState >= ConnectionState.STARTED
+
+    def session(self):
+        '''
+        Return the protocol session (RTDESession) of this interface.
+        '''
+        return self.__session
+
+    def sampleSequence(self):
+        '''
+        Return the sequence number of the latest received data package, see RTDESession.sampleSequence
+        '''
+        return self.__session.sampleSequence()
+
+    def subscribe(self, predicate, callback=None, once=True):
+        '''
+        Register a predicate evaluated once per data package, see RTDESession.subscribe
+        '''
+        return self.__session.subscribe(predicate, callback, once)
+
+    def unsubscribe(self, subscription):
+        '''
+        Remove a subscription, see subscribe.
+        '''
+        self.__session.unsubscribe(subscription)
+
+    def history(self, name=None, seconds=None, samples=None, copy=False):
+        '''
+        Return the latest window of an output field from the history, see RTDESession.history
+        '''
+        return self.__session.history(name, seconds, samples, copy)
+
+    def metrics(self):
+        '''
+        Return the link quality measurements of the connection, see RTDE.metrics
+        '''
+        return self.__session.metrics()
+
+    def frameBufferStats(self):
+        '''
+        Return the counters of the receive buffer, see RTDEFrameBuffer.stats
+        '''
+        return self.__frameBuffer.stats()
+
+    '''asyncio.BufferedProtocol callbacks'''
+    def connection_made(self, transport):
+        self.__transport = transport
+        sock = transport.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.__frameBuffer.clear()
+        self.__readingPaused = False
+        self.__session.connectionState = ConnectionState.CONNECTED
+
+    def get_buffer(self, sizehint):
+        return self.__frameBuffer.getBuffer()
+
+    def buffer_updated(self, nbytes):
+        self.__frameBuffer.commit(nbytes)
+        packages = self.__decodeFrames()
+        self.__session.metrics().recordRead(nbytes, packages)
+
+    def __decodeFrames(self):
+        '''
+        Handle the packages in the receive buffer, stops when reading is paused because the sample queue is full.
+
+        Return value:
+        packages (int): Number of handled packages
+        '''
+        packages = 0
+        for (packet_command, packet) in self.__frameBuffer.frames():
+            packages += 1
+            if self.__recorder is not None:
+                self.__recorder.record(RTDERecorder.RECEIVED, packet_command, packet)
+            try:
+                data = self.__session.handlePackage(packet_command, packet)
+            except Exception as e:
+                future = self.__responses.get(packet_command)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+                else:
+                    self._logger.error('RTDE package error: ' + str(e))
+                continue
+            if packet_command == Command.RTDE_DATA_PACKAGE:
+                if data is not None:
+                    self.__deliver(data)
+                    if self.__readingPaused:
+                        break
+            else:
+                future = self.__responses.get(packet_command)
+                if future is not None and not future.done():
+                    future.set_result(data)
+        return packages
+
+    def __deliver(self, sample):
+        dropOldest = self.__dropOldest or self.__closing
+        if len(self.__queue) >= self.__maxQueued and dropOldest:
+            self.__queue.popleft()
+            self.dropped += 1
+        self.__queue.append(sample)
+        self.__available.set()
+        if len(self.__queue) >= self.__maxQueued and not dropOldest:
+            self.__readingPaused = True
+            self.__transport.pause_reading()
+
+    def pause_writing(self):
+        self.__writable.clear()
+
+    def resume_writing(self):
+        self.__writable.set()
+
+    def connection_lost(self, exc):
+        self.__transport = None
+        self.__session.connectionState = ConnectionState.DISCONNECTED
+        if self.__recorder is not None:
+            self.__recorder.close()
+            self.__recorder = None
+        for future in self.__responses.values():
+            if not future.done():
+                future.set_exception(ConnectionError('RTDE connection lost'))
+        self.__available.set()
+        self.__writable.set()
+        if not self.__closed.done():
+            self.__closed.set_result(exc)
+        self.__session.notifyAll()
+        self._logger.info("RTDE disconnected")
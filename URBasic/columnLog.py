@@ -0,0 +1,268 @@
+'''
+Python 3.x library to control an UR robot through its TCP/IP interfaces
+Copyright (C) 2017  Martin Huus Bjerge, Rope Robotics ApS, Denmark
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+and associated documentation files (the "Software"), to deal in the Software without restriction,
+including without limitation the rights to use, copy, modify, merge, publish, distribute,
+sublicense, and/or sell copies of the Software, and to permit persons to whom the Software
+is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL "Rope Robotics ApS" BE LIABLE FOR ANY CLAIM,
+DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Except as contained in this notice, the name of "Rope Robotics ApS" shall not be used
+in advertising or otherwise to promote the sale, use or other dealings in this Software
+without prior written authorization from "Rope Robotics ApS".
+'''
+__author__ = "Martin Huus Bjerge"
+__copyright__ = "Copyright 2017, Rope Robotics ApS, Denmark"
+__license__ = "MIT License"
+
+
+import URBasic
+import os
+import json
+import queue
+import struct
+import threading
+import numpy as np
+
+
+class ColumnLog(object):
+    '''
+    Lossless binary log of every RTDE output package, written from the RTDE decode path
+    (see RTDESession.logColumns) instead of polling the robot model like URBasic.dataLog.DataLog.
+
+    Each package is one row of the structured dtype of the output decoder, copied from its
+    preallocated record (URBasic.rtde.RTDEOutputDecoder.record) into a preallocated chunk buffer.
+    When chunkPackages rows are collected the chunk is handed to a writer thread, which writes it
+    field by field, so the receive thread never formats values or waits for the disk.
+
+    File format (header integers big endian):
+    MAGIC
+    Schema block: b'S', length (uint32), JSON with names, types, formats (numpy dtype and shape per field) and rowSize
+    Chunk block:  b'C', CHUNK header (schema number, rows, sequence number of the first row),
+                  rows*rowSize bytes, the rows of each field in turn (little endian, native type of the field)
+    A schema block is written when the output recipe changes, and the chunks that follow use it.
+    Every field keeps its RTDE type, UINT64 counters are exact.
+
+    Input parameters:
+    filename (str): Path of the log, an existing file is appended
+    chunkPackages (int): Number of packages per chunk
+    buffers (int): Number of chunk buffers, more are allocated (and a warning logged) if the writer falls behind
+
+    Example:
+    log = ColumnLog('robot.urcol')
+    ...
+    segments = ColumnLog.read('robot.urcol')
+    print(segments[0]['actual_TCP_force'].shape)
+    '''
+    MAGIC = b'URCOLS2\n'
+    CHUNK = struct.Struct('>IIQ')
+    SCHEMA = struct.Struct('>I')
+
+    def __init__(self, filename, chunkPackages=500, buffers=4):
+        if chunkPackages < 1:
+            raise ValueError('Column log chunk must hold at least one package, got ' + str(chunkPackages))
+        logger = URBasic.dataLogging.DataLogging()
+        name = logger.AddEventLogging(__name__,log2Consol=False)
+        self.__logger = logger.__dict__[name]
+        self.filename = filename
+        self.chunkPackages = int(chunkPackages)
+        self.__buffers = buffers
+        self.__file = open(filename, 'ab')
+        if self.__file.tell() == 0:
+            self.__file.write(self.MAGIC)
+        self.__schema = -1
+        self.__names = None
+        self.__free = None
+        self.__chunk = None
+        self.__rows = 0
+        self.__firstSequence = 0
+        self.__sequence = 0
+        self.__queue = queue.Queue()
+        #Serializes the receive thread (append) and close, so no package is appended during or after the final flush
+        self.__lock = threading.Lock()
+        self.__closed = False
+        self.packages = 0
+        self.chunks = 0
+        self.extraBuffers = 0
+        self.__writer = threading.Thread(target=self.__write, name='ColumnLog')
+        self.__writer.daemon = True
+        self.__writer.start()
+
+    @staticmethod
+    def defaultFilename(host=None):
+        '''
+        Return the path of the column log of a robot in the log folder of URBasic.dataLogging.DataLogging.
+        '''
+        directory = URBasic.dataLogging.DataLogging().directory
+        if host is None:
+            return os.path.join(directory, 'UrDataLog.urcol')
+        return os.path.join(directory, 'UrDataLog_' + str(host).replace(':', '_') + '.urcol')
+
+    def setSchema(self, decoder):
+        '''
+        Start logging the packages of an output recipe, called when the recipe is set up.
+        The collected rows of the previous recipe are written first.
+
+        Input parameters:
+        decoder (RTDEOutputDecoder): Decoder of the output recipe
+        '''
+        with self.__lock:
+            if self.__names == decoder.names or self.__closed:
+                return
+            self.__flush()
+            self.__names = list(decoder.names)
+            self.__schema += 1
+            fields = [decoder.dtype.fields[name][0] for name in decoder.names]
+            formats = [[field.base.newbyteorder('<').str, list(field.shape)] for field in fields]
+            schema = json.dumps({'names':decoder.names, 'types':decoder.types, 'formats':formats, 'rowSize':decoder.dtype.itemsize}).encode('utf-8')
+            self.__queue.put(b'S' + self.SCHEMA.pack(len(schema)) + schema)
+            self.__free = queue.Queue()
+            for _ in range(self.__buffers):
+                self.__free.put(np.empty(self.chunkPackages, decoder.dtype))
+            self.__chunk = self.__free.get()
+            self.__rows = 0
+
+    def append(self, record):
+        '''
+        Append a package (called by the receive thread).
+
+        Input parameters:
+        record (numpy array): Package values, see RTDEOutputDecoder.record
+        '''
+        with self.__lock:
+            if self.__chunk is None:
+                return
+            if self.__rows == 0:
+                self.__firstSequence = self.__sequence
+            self.__chunk[self.__rows] = record
+            self.__rows += 1
+            self.__sequence += 1
+            self.packages += 1
+            if self.__rows == self.chunkPackages:
+                self.__flush()
+
+    def flush(self):
+        '''
+        Hand the collected rows to the writer thread.
+        '''
+        with self.__lock:
+            self.__flush()
+
+    def __flush(self):
+        if self.__chunk is None or self.__rows == 0:
+            return
+        self.__queue.put((self.__schema, self.__firstSequence, self.__rows, self.__chunk, self.__free))
+        self.__rows = 0
+        try:
+            self.__chunk = self.__free.get_nowait()
+        except queue.Empty:
+            self.extraBuffers += 1
+            self.__logger.warning('Column log writer is behind, allocated chunk buffer number ' + str(self.__buffers + self.extraBuffers))
+            self.__chunk = np.empty_like(self.__chunk)
+
+    def close(self):
+        '''
+        Write the collected rows, stop the writer thread and close the file.
+        Packages appended after close are ignored.
+        '''
+        with self.__lock:
+            if self.__closed:
+                return
+            self.__closed = True
+            self.__flush()
+            self.__chunk = None
+        self.__queue.put(None)
+        self.__writer.join()
+        self.__file.close()
+
+    def __write(self):
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                return
+            try:
+                if type(item) is bytes:
+                    self.__file.write(item)
+                    continue
+                (schema, firstSequence, rows, chunk, free) = item
+                self.__file.write(b'C' + self.CHUNK.pack(schema, rows, firstSequence))
+                for name in chunk.dtype.names:
+                    values = chunk[name][:rows]
+                    self.__file.write(np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<')).data)
+                self.__file.flush()
+                self.chunks += 1
+                free.put(chunk)
+            except (OSError, ValueError) as e:
+                self.__logger.error('Column log write failed: ' + str(e))
+
+    @staticmethod
+    def read(filename):
+        '''
+        Read a column log. An incomplete chunk at the end (e.g. after a crash) is ignored.
+
+        Input parameters:
+        filename (str): Path of the log
+
+        Return value:
+        segments (list<dict>): One dictionary per schema block of field name and numpy array
+                               (one row per package), and 'sequence' with the package numbers
+        '''
+        with open(filename, 'rb') as f:
+            data = f.read()
+        if data[:len(ColumnLog.MAGIC)] != ColumnLog.MAGIC:
+            raise ValueError('Not a column log: ' + filename)
+        segments = []
+        schemas = []
+        offset = len(ColumnLog.MAGIC)
+        while offset < len(data):
+            kind = data[offset:offset+1]
+            offset += 1
+            if kind == b'S':
+                if offset + ColumnLog.SCHEMA.size > len(data):
+                    break
+                (length,) = ColumnLog.SCHEMA.unpack_from(data, offset)
+                offset += ColumnLog.SCHEMA.size
+                if offset + length > len(data):
+                    break
+                schema = json.loads(data[offset:offset+length].decode('utf-8'))
+                offset += length
+                schemas.append(schema)
+                segments.append({'chunks':[], 'sequence':[]})
+            elif kind == b'C':
+                if offset + ColumnLog.CHUNK.size > len(data):
+                    break
+                (schemaNumber, rows, firstSequence) = ColumnLog.CHUNK.unpack_from(data, offset)
+                offset += ColumnLog.CHUNK.size
+                #Schema numbers restart in each appended session, chunks belong to the latest schema block
+                schema = schemas[-1]
+                size = rows*schema['rowSize']
+                if offset + size > len(data):
+                    break
+                chunk = []
+                for (fmt, shape) in schema['formats']:
+                    count = rows*int(np.prod(shape))
+                    chunk.append(np.frombuffer(data, fmt, count, offset).reshape([rows] + shape))
+                    offset += count*np.dtype(fmt).itemsize
+                segments[-1]['chunks'].append(chunk)
+                segments[-1]['sequence'].append(np.arange(firstSequence, firstSequence + rows))
+            else:
+                raise ValueError('Corrupt column log ' + filename + ' at byte ' + str(offset - 1))
+        result = []
+        for ii in range(len(segments)):
+            if not len(segments[ii]['chunks']):
+                continue
+            segment = {'sequence':np.concatenate(segments[ii]['sequence'])}
+            for (jj, name) in enumerate(schemas[ii]['names']):
+                segment[name] = np.concatenate([chunk[jj] for chunk in segments[ii]['chunks']])
+            result.append(segment)
+        return result
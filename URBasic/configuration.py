@@ -0,0 +1,338 @@
+'''
+Python 3.x library to control an UR robot through its TCP/IP interfaces
+Copyright (C) 2017  Martin Huus Bjerge, Rope Robotics ApS, Denmark
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+and associated documentation files (the "Software"), to deal in the Software without restriction,
+including without limitation the rights to use, copy, modify, merge, publish, distribute,
+sublicense, and/or sell copies of the Software, and to permit persons to whom the Software
+is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL "Rope Robotics ApS" BE LIABLE FOR ANY CLAIM,
+DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Except as contained in this notice, the name of "Rope Robotics ApS" shall not be used
+in advertising or otherwise to promote the sale, use or other dealings in this Software
+without prior written authorization from "Rope Robotics ApS".
+'''
+__author__ = "Martin Huus Bjerge"
+__copyright__ = "Copyright 2017, Rope Robotics ApS, Denmark"
+__license__ = "MIT License"
+
+import URBasic
+import os
+import ast
+import threading
+import collections
+import types
+import xml.etree.ElementTree as ET
+
+#Universal Robots do not support more than 96 fields in a receive or send recipe
+MAX_FIELDS = 96
+RTDE_TYPES = ('BOOL', 'UINT8', 'UINT32', 'UINT64', 'INT32', 'DOUBLE',
+              'VECTOR3D', 'VECTOR6D', 'VECTOR6INT32', 'VECTOR6UINT32')
+FILE_MODES = {'Overwrite':'w', 'Append':'a'}
+DATA_FORMATS = {'CSV':'csv', 'Columnar':'columnar'}
+
+_cache = {}
+_cacheLock = threading.Lock()
+
+
+def defaultPath(filename):
+    '''
+    Return the path of a file in the folder holding the URBasic package,
+    where the default configuration files and the log folder are.
+
+    Input parameters:
+    filename (str): Name of the file
+
+    Return value:
+    path (str)
+    '''
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(URBasic.__file__))), filename)
+
+
+def load(parse, filename):
+    '''
+    Return the configuration parsed from a file, parsing the file only the first time
+    and when it is changed (the cache is keyed by path, modification time and size).
+
+    Input parameters:
+    parse (function): function(filename, root) building the configuration object from the root element
+    filename (str): Path of the configuration file
+
+    Return value:
+    configuration (object returned by parse)
+    '''
+    filename = os.path.abspath(filename)
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        raise ValueError("Configuration file don't exist : " + filename)
+    version = (stat.st_mtime_ns, stat.st_size)
+    key = (parse, filename)
+    with _cacheLock:
+        entry = _cache.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    try:
+        root = ET.parse(filename).getroot()
+    except ET.ParseError as e:
+        raise ValueError('Not a valid configuration file ' + filename + ': ' + str(e))
+    configuration = parse(filename, root)
+    with _cacheLock:
+        _cache[key] = (version, configuration)
+    return configuration
+
+
+class RTDERecipe(collections.namedtuple('RTDERecipe', ['key', 'names', 'types', 'initValues'])):
+    '''
+    Immutable receive or send recipe of a RTDE configuration file.
+
+    key (str): Name of the recipe (key attribute of the element)
+    names (tuple<str>): Field names
+    types (tuple<str>): RTDE types of the fields, None where the type is not given
+    initValues (tuple<float>): Initial values of send recipes, None for the receive recipe
+    '''
+    __slots__ = ()
+
+
+class RTDEConfiguration(collections.namedtuple('RTDEConfiguration', ['filename', 'outputs', 'inputs'])):
+    '''
+    Immutable RTDE configuration (see rtdeConfigurationDefault.xml), parsed and validated once
+    per version of the file, see load.
+
+    The receive element is the output recipe (outputs), where timestamp is always the first field,
+    and each send element is an input recipe (inputs). A recipe with more fields than the
+    controller supports (MAX_FIELDS), unknown types, fields used twice or send fields without
+    initValue are rejected with a ValueError.
+
+    filename (str): Path of the configuration file
+    outputs (RTDERecipe): The output recipe, None if the file has no receive element
+    inputs (tuple<RTDERecipe>): The input recipes
+
+    Example:
+    config = URBasic.configuration.RTDEConfiguration.load()
+    print(config.outputs.names)
+    '''
+    __slots__ = ()
+
+    @staticmethod
+    def defaultFilename():
+        '''
+        Return the path of rtdeConfiguration.xml if it exists, else of rtdeConfigurationDefault.xml
+        '''
+        filename = defaultPath('rtdeConfiguration.xml')
+        if not os.path.isfile(filename):
+            filename = defaultPath('rtdeConfigurationDefault.xml')
+        return filename
+
+    @staticmethod
+    def load(filename=None):
+        '''
+        Return the configuration of a file, see the module function load.
+
+        Input parameters:
+        filename (str): [Optional] Path of the configuration file, default see defaultFilename
+
+        Return value:
+        configuration (RTDEConfiguration)
+        '''
+        if filename is None:
+            filename = RTDEConfiguration.defaultFilename()
+        return load(RTDEConfiguration.parse, filename)
+
+    @staticmethod
+    def parse(filename, root):
+        '''
+        Build the configuration from the root element of the file.
+        '''
+        outputs = None
+        receive = root.find('receive')
+        if receive is not None:
+            outputs = RTDEConfiguration.__recipe(filename, receive, 'out', False)
+            if 'timestamp' not in outputs.names:
+                outputs = RTDERecipe(outputs.key, ('timestamp',) + outputs.names, ('DOUBLE',) + outputs.types, None)
+            elif outputs.names[0] != 'timestamp':
+                index = outputs.names.index('timestamp')
+                order = [index] + [ii for ii in range(len(outputs.names)) if ii != index]
+                outputs = RTDERecipe(outputs.key, tuple(outputs.names[ii] for ii in order), tuple(outputs.types[ii] for ii in order), None)
+            RTDEConfiguration.__validateSize(filename, outputs)
+
+        inputs = []
+        recipeOfField = {}
+        for send in root.findall('send'):
+            recipe = RTDEConfiguration.__recipe(filename, send, 'in', True)
+            RTDEConfiguration.__validateSize(filename, recipe)
+            if recipe.key in [other.key for other in inputs]:
+                raise ValueError('Send recipe ' + recipe.key + ' is defined twice in ' + filename)
+            for name in recipe.names:
+                if name in recipeOfField:
+                    raise ValueError('Send field ' + name + ' is used by the recipes ' + recipeOfField[name] + ' and ' + recipe.key + ' in ' + filename)
+                recipeOfField[name] = recipe.key
+            inputs.append(recipe)
+        return RTDEConfiguration(filename, outputs, tuple(inputs))
+
+    @staticmethod
+    def __recipe(filename, element, defaultKey, hasInitValues):
+        names = []
+        fieldTypes = []
+        initValues = []
+        for child in element:
+            if 'name' not in child.attrib:
+                raise ValueError('Field without name in ' + element.tag + ' element of ' + filename)
+            name = child.attrib['name']
+            if name in names:
+                raise ValueError('Field ' + name + ' is used twice in ' + element.tag + ' element of ' + filename)
+            fieldType = child.attrib.get('type')
+            if fieldType is not None and fieldType not in RTDE_TYPES:
+                raise ValueError('Unknown data type ' + fieldType + ' of field ' + name + ' in ' + filename)
+            names.append(name)
+            fieldTypes.append(fieldType)
+            if hasInitValues:
+                if 'initValue' not in child.attrib:
+                    raise ValueError('Send field ' + name + ' has no initValue in ' + filename)
+                initValues.append(float(child.attrib['initValue']))
+        return RTDERecipe(element.attrib.get('key', defaultKey), tuple(names), tuple(fieldTypes),
+                          tuple(initValues) if hasInitValues else None)
+
+    @staticmethod
+    def __validateSize(filename, recipe):
+        if len(recipe.names) > MAX_FIELDS:
+            raise ValueError('Recipe ' + recipe.key + ' in ' + filename + ' has ' + str(len(recipe.names)) +
+                             ' fields, the controller supports ' + str(MAX_FIELDS))
+
+    def input(self, key):
+        '''
+        Return the input recipe named key, None if not found.
+        '''
+        for recipe in self.inputs:
+            if recipe.key == key:
+                return recipe
+        return None
+
+
+class LogConfiguration(collections.namedtuple('LogConfiguration', ['filename', 'developerMode', 'eventFileMode',
+                                                                   'dataFileMode', 'defaultDecimals', 'decimals',
+                                                                   'dataFormat', 'chunkPackages', 'deadbands'])):
+    '''
+    Immutable logging configuration (see logConfig.xml), parsed and validated once per version
+    of the file, see load. Used by URBasic.dataLogging.DataLogging and URBasic.dataLog.DataLog.
+
+    filename (str): Path of the configuration file
+    developerMode (bool): Log directly in the log folder instead of a folder per date and time
+    eventFileMode (str): File mode of the event log, 'w' (Overwrite) or 'a' (Append)
+    dataFileMode (str): File mode of the data log, 'w' (Overwrite) or 'a' (Append)
+    defaultDecimals (int): Decimals of logged values
+    decimals (mapping): Decimals of the fields listed in logParameters, read only
+    dataFormat (str): 'csv' to log the changed values in UrDataLog.csv (URBasic.dataLog.DataLog),
+                      'columnar' to log every RTDE package to a binary column log (URBasic.columnLog.ColumnLog)
+    chunkPackages (int): Packages per chunk of the column log
+    deadbands (mapping): Absolute and relative deadband of the fields listed in deadbands, read only, see fieldDeadband
+
+    Example:
+    config = URBasic.configuration.LogConfiguration.load()
+    print(config.fieldDecimals('actual_q'))
+    '''
+    __slots__ = ()
+
+    @staticmethod
+    def load(filename=None):
+        '''
+        Return the configuration of a file, see the module function load.
+
+        Input parameters:
+        filename (str): [Optional] Path of the configuration file, default logConfig.xml
+
+        Return value:
+        configuration (LogConfiguration)
+        '''
+        if filename is None:
+            filename = defaultPath('logConfig.xml')
+        return load(LogConfiguration.parse, filename)
+
+    @staticmethod
+    def parse(filename, root):
+        '''
+        Build the configuration from the root element of the file.
+        '''
+        developerMode = False
+        developerModeTag = root.find('developerMode')
+        if developerModeTag is not None:
+            developerMode = ast.literal_eval(developerModeTag.text.strip())
+            if type(developerMode) is not bool:
+                raise ValueError('developerMode must be True or False in ' + filename)
+
+        eventFileMode = LogConfiguration.__fileMode(root, 'eventLogConfig', 'eventLogfile')
+        dataFileMode = LogConfiguration.__fileMode(root, 'dataLogConfig', 'dataLogfile')
+
+        defaultDecimals = 5
+        decimals = {}
+        dataFormat = 'csv'
+        chunkPackages = 500
+        deadbands = {}
+        dataLogConfig = root.find('dataLogConfig')
+        if dataLogConfig is not None:
+            formatTag = dataLogConfig.find('format')
+            if formatTag is not None:
+                if formatTag.text not in DATA_FORMATS:
+                    raise ValueError("Not supported dataLogfile format: " + str(formatTag.text))
+                dataFormat = DATA_FORMATS[formatTag.text]
+            chunkPackagesTag = dataLogConfig.find('chunkPackages')
+            if chunkPackagesTag is not None:
+                chunkPackages = int(chunkPackagesTag.text)
+                if chunkPackages < 1:
+                    raise ValueError('chunkPackages must be at least 1 in ' + filename)
+            defaultDecimalsTag = dataLogConfig.find('defaultDecimals')
+            if defaultDecimalsTag is not None:
+                defaultDecimals = int(defaultDecimalsTag.text)
+            logParameters = dataLogConfig.find('logParameters')
+            if logParameters is not None:
+                for child in logParameters:
+                    decimals[child.tag] = int(child.text)
+            deadbandsTag = dataLogConfig.find('deadbands')
+            if deadbandsTag is not None:
+                for child in deadbandsTag:
+                    absolute = float(child.attrib.get('absolute', 0.))
+                    relative = float(child.attrib.get('relative', 0.))
+                    if absolute < 0 or relative < 0:
+                        raise ValueError('Deadband of ' + child.tag + ' must not be negative in ' + filename)
+                    deadbands[child.tag] = (absolute, relative)
+        return LogConfiguration(filename, developerMode, eventFileMode, dataFileMode, defaultDecimals, types.MappingProxyType(decimals),
+                                dataFormat, chunkPackages, types.MappingProxyType(deadbands))
+
+    @staticmethod
+    def __fileMode(root, tag, name):
+        fileModeTag = root.find(tag + '/fileMode')
+        if fileModeTag is None:
+            return 'w'
+        if fileModeTag.text not in FILE_MODES:
+            raise ValueError("Not supported " + name + " mode: " + str(fileModeTag.text))
+        return FILE_MODES[fileModeTag.text]
+
+    def fieldDecimals(self, name):
+        '''
+        Return the number of decimals to log of a field.
+        '''
+        return self.decimals.get(name, self.defaultDecimals)
+
+    def fieldDeadband(self, name):
+        '''
+        Return the deadband of a logged field, a value is logged when it differs from the last logged value
+        by more than max(absolute, relative*abs(last logged value)).
+        Fields not listed in deadbands have an absolute deadband of half the last logged decimal
+        (see fieldDecimals), i.e. changes hidden by the rounding are not logged.
+
+        Return value:
+        absolute (float)
+        relative (float)
+        '''
+        if name in self.deadbands:
+            return self.deadbands[name]
+        return (0.5*10.**-self.fieldDecimals(name), 0.)
@@ -29,14 +29,18 @@ import threading
 import URBasic
 import numpy as np
 import time
-import xml.etree.ElementTree as ET
+from URBasic.configuration import LogConfiguration
 
 
 class DataLog(threading.Thread):
     '''
     This module handle logging of all data signal from the robot (not event logging).
+
+    Input parameters:
+    robotModel (RobotModel): The robot model to log
+    start (bool): Start the logging thread, else the owner calls poll periodically (e.g. from a Reactor timer)
     ''' 
-    def __init__(self, robotModel):
+    def __init__(self, robotModel, start=True):
 
         if(False):
             assert isinstance(robotModel, URBasic.robotModel.RobotModel)  ### This line is to get code completion for RobotModel
@@ -50,67 +54,29 @@ class DataLog(threading.Thread):
         self.__stop_event = True
         
         
-        configFilename = URBasic.__file__[0:URBasic.__file__.find('URBasic')] + 'logConfig.xml'
-        self.__config = Config
-        self.__readConfig(configFileName=configFilename, config=self.__config)
+        self.__config = LogConfiguration.load()
         
-        self.__robotModelDataDirCopy = None
-        self.start()
+        self.__compression = DeadbandCompression(self.__config, self.__logger)
+        self.__lastTimestamp = None
+        self.__lastSnapshot = None
+        if start:
+            self.start()
         self.__logger.info('DataLog constructor done')
          
          
-    def __readConfig(self, configFileName, config):
-        tree = ET.parse(configFileName)
-        logConfig = tree.getroot()
-        dataLogConfig = logConfig.find('dataLogConfig')
-        decimals = dataLogConfig.find('defaultDecimals')
-        config.Decimals = int(decimals.text)         
-        logParameters = dataLogConfig.find('logParameters')
-        for Child in logParameters:
-            setattr(config, Child.tag, Child.text)
-            
-
          
     def logdata(self, robotModelDataDir):
-        if(self.__robotModelDataDirCopy != None):
-            if(self.__robotModelDataDirCopy['timestamp'] != robotModelDataDir['timestamp'] or robotModelDataDir['timestamp'] is None):
-                for tagname in robotModelDataDir.keys():
-                    if tagname != 'timestamp' and  robotModelDataDir[tagname] is not None:
-                        roundingDecimals = self.__config.Decimals
-                        tp = type(robotModelDataDir[tagname])
-                        if tp is np.ndarray:
-                            if tagname in self.__config.__dict__:
-                                roundingDecimals = int(self.__config.__dict__[tagname])
-                            roundedValues = np.round(robotModelDataDir[tagname], roundingDecimals)
-                            if self.__robotModelDataDirCopy[tagname] is None:
-                                roundedValuesCopy = roundedValues+1
-                            else:
-                                roundedValuesCopy = np.round(self.__robotModelDataDirCopy[tagname], roundingDecimals)
-                            if not (roundedValues==roundedValuesCopy).all():
-                                if 6==len(robotModelDataDir[tagname]):
-                                    self.__dataLogger.info((tagname+';%s;%s;%s;%s;%s;%s;%s'), robotModelDataDir['timestamp'], *roundedValues)
-                                elif 3==len(robotModelDataDir[tagname]):
-                                    self.__dataLogger.info((tagname+';%s;%s;%s;%s'), robotModelDataDir['timestamp'], *roundedValues)
-                                else:
-                                    self.__logger.warning('Logger data unexpected type in rtde.py - class URRTDElogger - def logdata Type: ' + str(tp) + ' - Len: ' + str(len(robotModelDataDir[tagname])))
-                        elif tp is float:
-                            if tagname in self.__config.__dict__:
-                                roundingDecimals = int(self.__config.__dict__[tagname])
-                            roundedValues = round(robotModelDataDir[tagname], roundingDecimals)
-                            if self.__robotModelDataDirCopy[tagname] is None:
-                                roundedValuesCopy = roundedValues+1
-                            else:                            
-                                roundedValuesCopy = round(self.__robotModelDataDirCopy[tagname], roundingDecimals)
-                            if roundedValues != roundedValuesCopy:
-                                self.__dataLogger.info((tagname+';%s;%s'), robotModelDataDir['timestamp'], roundedValues)
-                        elif tp is bool or tp is int or tp is np.float64: 
-                            if robotModelDataDir[tagname] != self.__robotModelDataDirCopy[tagname]:
-                                self.__dataLogger.info((tagname+';%s;%s'), robotModelDataDir['timestamp'], robotModelDataDir[tagname])
-                        else:
-                            self.__logger.warning('Logger data unexpected type in rtde.py - class URRTDElogger - def logdata Type: ' + str(tp))
-        self.__robotModelDataDirCopy = robotModelDataDir
-        
-                    
+        '''
+        Log the fields that changed more than their deadband since they were last logged, see DeadbandCompression.
+        Nothing is logged if the timestamp is the same as in the previous call.
+        '''
+        timestamp = robotModelDataDir['timestamp']
+        if timestamp is not None and timestamp == self.__lastTimestamp:
+            return
+        self.__lastTimestamp = timestamp
+        for (tagname, values) in self.__compression.changes(robotModelDataDir):
+            self.__dataLogger.info(tagname + ';%s'*(len(values) + 1), timestamp, *values)
+
     def close(self):
         if self.__stop_event is False:
             self.__stop_event = True
@@ -119,14 +85,173 @@ class DataLog(threading.Thread):
     def run(self):
         self.__stop_event = False
         while not self.__stop_event:
-            try:
-                dataDirCopy = self.__robotModel.dataDir.copy()
-                self.logdata(dataDirCopy)
-                time.sleep(0.005)
-            except:
-                self.__robotModelDataDirCopy = dataDirCopy
-                self.__logger.warning("DataLog error while running, but will retry")
+            self.poll()
+            time.sleep(0.005)
         self.__logger.info("DataLog is stopped")
 
-class Config(object):
-    Decimals = 5
+    def poll(self):
+        '''
+        Log the changes of the robot model since the last poll.
+        Nothing is done until the RTDE interface publishes a new snapshot (see RobotModel.snapshot),
+        and the RTDE fields are logged from the snapshot, so all values are from the same package.
+        With the Columnar data log format of logConfig.xml every RTDE package is logged by the RTDE interface
+        (see URBasic.columnLog.ColumnLog), and only the other fields and the derived channels are logged here.
+        '''
+        snapshot = self.__robotModel.snapshot()
+        if snapshot is not None and snapshot is self.__lastSnapshot:
+            return
+        self.__lastSnapshot = snapshot
+        dataDir = self.__robotModel.dataDir
+        if snapshot is None:
+            dataDirCopy = dataDir.copy()
+        else:
+            #Fields not in the package, e.g. of URplus devices
+            dataDirCopy = dict((name, dataDir[name]) for name in dataDir if name not in snapshot)
+            if self.__config.dataFormat == 'columnar':
+                #The RTDE fields are in the column log (see URBasic.columnLog.ColumnLog), only log the other fields
+                for name in self.__robotModel.derivedChannels.names():
+                    dataDirCopy[name] = snapshot.get(name)
+                dataDirCopy['timestamp'] = snapshot.timestamp
+            else:
+                dataDirCopy.update(snapshot.copy())
+        try:
+            self.logdata(dataDirCopy)
+        except:
+            self.__lastTimestamp = dataDirCopy['timestamp']
+            self.__logger.warning("DataLog error while running, but will retry")
+
+
+class DeadbandCompression(object):
+    '''
+    Change detection of the logged fields of DataLog.
+
+    The numeric values of all fields are kept in one contiguous float64 array (scalars take one element,
+    vectors one element per axis), and so are the last logged values and the absolute and relative deadbands
+    of logConfig.xml (see URBasic.configuration.LogConfiguration.fieldDeadband). A package is compared to the
+    last logged values in one vectorized operation, and only the fields with an element outside its deadband are
+    returned, with the values rounded to the decimals of logConfig.xml. Integer and bool fields are returned
+    on any change (deadband 0 unless configured) and not rounded.
+
+    Input parameters:
+    config (LogConfiguration): The logging configuration
+    logger (logging.Logger): Logger for fields of unsupported types
+
+    Example:
+    compression = DeadbandCompression(LogConfiguration.load(), logger)
+    for (name, values) in compression.changes(robotModel.dataDir):
+        print(name, values)
+    '''
+    def __init__(self, config, logger):
+        self.__config = config
+        self.__logger = logger
+        self.__keys = None
+        self.__fields = ()
+        self.__pending = ()
+        self.__ignored = set()
+        self.__starts = np.zeros(0, dtype=np.intp)
+        self.__sizes = np.zeros(0, dtype=np.intp)
+        self.__values = np.zeros(0)
+        self.__last = np.zeros(0)
+        self.__absolute = np.zeros(0)
+        self.__relative = np.zeros(0)
+        self.__scale = np.zeros(0)
+
+    def changes(self, data):
+        '''
+        Return the fields of data that changed more than their deadband since they were last returned,
+        and remember their values as the last logged values.
+
+        Input parameters:
+        data (dict): Field name and value, e.g. a copy of RobotModel.dataDir
+
+        Return value:
+        changes (list<(str, list)>): Field name and the values to log
+        '''
+        keys = list(data)
+        if keys != self.__keys or any(data[name] is not None for name in self.__pending):
+            self.__layout(data, keys)
+        values = self.__values
+        try:
+            for (name, start, stop, _) in self.__fields:
+                value = data[name]
+                values[start:stop] = np.nan if value is None else value
+        except ValueError:
+            #A field changed size, e.g. a new output recipe
+            self.__layout(data, keys)
+            return self.changes(data)
+        if not len(self.__fields):
+            return []
+
+        last = self.__last
+        changed = (np.abs(values - last) > np.maximum(self.__absolute, self.__relative*np.abs(last))) | (np.isnan(last) & ~np.isnan(values))
+        fieldChanged = np.logical_or.reduceat(changed, self.__starts)
+        indexes = np.flatnonzero(fieldChanged)
+        if not len(indexes):
+            return []
+        elements = np.repeat(fieldChanged, self.__sizes)
+        last[elements] = values[elements]
+        rounded = (np.round(values*self.__scale)/self.__scale).tolist()
+        result = []
+        for index in indexes.tolist():
+            (name, start, stop, exact) = self.__fields[index]
+            if exact:
+                value = data[name]
+                result.append((name, value.tolist() if type(value) is np.ndarray else [value]))
+            else:
+                result.append((name, rounded[start:stop]))
+        return result
+
+    def __layout(self, data, keys):
+        '''
+        Place the fields in the arrays, keeping the last logged values of fields that keep their size.
+        '''
+        previous = dict((name, (start, stop)) for (name, start, stop, _) in self.__fields)
+        fields = []
+        pending = []
+        absolute = []
+        relative = []
+        scale = []
+        start = 0
+        for name in keys:
+            value = data[name]
+            if name == 'timestamp' or name in self.__ignored:
+                continue
+            if value is None:
+                pending.append(name)
+                continue
+            if type(value) is np.ndarray:
+                size = value.size
+                exact = value.dtype.kind in 'biu'
+                if size == 0:
+                    continue
+            elif isinstance(value, (bool, int, np.integer, np.bool_)):
+                (size, exact) = (1, True)
+            elif isinstance(value, float):
+                (size, exact) = (1, False)
+            else:
+                self.__ignored.add(name)
+                self.__logger.warning('DataLog can not log ' + name + ' of type ' + str(type(value)))
+                continue
+            (fieldAbsolute, fieldRelative) = self.__config.fieldDeadband(name)
+            if exact and name not in self.__config.deadbands:
+                fieldAbsolute = 0.
+            fields.append((name, start, start + size, exact))
+            absolute += [fieldAbsolute]*size
+            relative += [fieldRelative]*size
+            scale += [10.**self.__config.fieldDecimals(name)]*size
+            start += size
+
+        last = np.full(start, np.nan)
+        for (name, fieldStart, fieldStop, _) in fields:
+            if name in previous and previous[name][1] - previous[name][0] == fieldStop - fieldStart:
+                last[fieldStart:fieldStop] = self.__last[previous[name][0]:previous[name][1]]
+        self.__keys = keys
+        self.__fields = tuple(fields)
+        self.__pending = tuple(pending)
+        self.__starts = np.array([field[1] for field in fields], dtype=np.intp)
+        self.__sizes = np.array([field[2] - field[1] for field in fields], dtype=np.intp)
+        self.__values = np.empty(start)
+        self.__last = last
+        self.__absolute = np.array(absolute)
+        self.__relative = np.array(relative)
+        self.__scale = np.array(scale)
@@ -30,9 +30,12 @@ import logging
 import time
 import os
 import re
+import atexit
+import threading
+import collections
+import queue
 import URBasic
-import xml.etree.ElementTree as ET
-import ast
+from URBasic.configuration import LogConfiguration, defaultPath
 from six import with_metaclass
 
 class Singleton(type):
@@ -43,9 +46,172 @@ class Singleton(type):
         return self._instances[self]
 
 
+class LogWriter(threading.Thread):
+    '''
+    Background thread writing the log records of DataLogging, so no thread logging a message
+    (e.g. the RTDE receive thread) formats it or waits for the disk or the console.
+
+    Records are put in a bounded queue.SimpleQueue together with the handler that writes them (see QueuedHandler).
+    The writer blocks on the queue until a record arrives, takes up to batchSize records at a time,
+    formats them with the formatter of their handler, and writes each handler's records with one write and
+    one flush. When the queue is full the record is dropped and counted (dropped, tallied per thread so
+    concurrent loggers need no lock), and the number of dropped records is logged by the writer.
+
+    The message of a record is built by the writer, so the arguments of a log call must not be changed after the call.
+
+    Input parameters:
+    capacity (int): Max number of queued records
+    batchSize (int): Max number of records per write
+    reportHandler (logging.Handler): [Optional] Handler writing the dropped record warnings
+    '''
+    def __init__(self, capacity=10000, batchSize=500, reportHandler=None):
+        threading.Thread.__init__(self, name='LogWriter')
+        self.daemon = True
+        self.capacity = capacity
+        self.batchSize = batchSize
+        self.reportHandler = reportHandler
+        self.written = 0
+        self.__drops = {}
+        self.__reported = 0
+        self.__queue = queue.SimpleQueue()
+        self.start()
+        atexit.register(self.close)
+
+    def put(self, handler, record):
+        '''
+        Queue a record (logging.LogRecord or an already formatted line) for a handler without blocking.
+
+        Return value:
+        queued (bool): False if the queue was full and the record is dropped
+        '''
+        if self.__queue.qsize() >= self.capacity:
+            self.__drop(1)
+            return False
+        self.__queue.put((handler, record))
+        return True
+
+    @property
+    def dropped(self):
+        '''
+        Number of records dropped because the queue was full or the write failed.
+        '''
+        return sum(list(self.__drops.values()))
+
+    def __drop(self, count):
+        #Each thread only changes its own tally
+        ident = threading.get_ident()
+        self.__drops[ident] = self.__drops.get(ident, 0) + count
+
+    def flush(self, timeout=None):
+        '''
+        Wait until the records queued before the call are written.
+
+        Return value:
+        done (bool): False if timed out
+        '''
+        if not self.is_alive():
+            return False
+        done = threading.Event()
+        self.__queue.put((done, None))
+        return done.wait(timeout)
+
+    def close(self, timeout=5.):
+        '''
+        Write the queued records and stop the writer.
+        '''
+        if self.is_alive():
+            self.__queue.put((None, None))
+            self.join(timeout)
+
+    def run(self):
+        stop = False
+        while not stop:
+            batch = [self.__queue.get()]
+            try:
+                while len(batch) < self.batchSize:
+                    batch.append(self.__queue.get_nowait())
+            except queue.Empty:
+                pass
+            stop = self.__write(batch)
+
+    def __write(self, batch):
+        '''
+        Format and write a batch, return True if the batch holds the stop marker.
+        '''
+        stop = False
+        lines = collections.OrderedDict()
+        dropped = self.dropped
+        if dropped != self.__reported and self.reportHandler is not None:
+            record = logging.makeLogRecord({'name':'URBasic_dataLoggingEvent', 'levelno':logging.WARNING, 'levelname':'WARNING',
+                                            'msg':str(dropped - self.__reported) + ' log records dropped, the log queue was full'})
+            batch.insert(0, (self.reportHandler, record))
+            self.__reported = dropped
+        flushed = []
+        for (handler, record) in batch:
+            if handler is None:
+                stop = True
+                continue
+            if type(handler) is threading.Event:
+                flushed.append(handler)
+                continue
+            if type(record) is str:
+                line = record
+            else:
+                try:
+                    line = handler.format(record)
+                except Exception:
+                    handler.handleError(record)
+                    continue
+            lines.setdefault(handler, []).append(line)
+        for (handler, handlerLines) in lines.items():
+            handler.acquire()
+            try:
+                if isinstance(handler, logging.FileHandler) and handler.stream is None:
+                    handler.stream = handler._open()
+                handler.stream.write(handler.terminator.join(handlerLines) + handler.terminator)
+                handler.flush()
+                self.written += len(handlerLines)
+            except Exception:
+                #e.g. disk full, the lines are lost and counted as dropped
+                self.__drop(len(handlerLines))
+            finally:
+                handler.release()
+        for done in flushed:
+            done.set()
+        return stop
+
+
+class QueuedHandler(logging.Handler):
+    '''
+    Logging handler queueing the records for a target handler in a LogWriter, see DataLogging.
+
+    Input parameters:
+    writer (LogWriter): The writer
+    target (logging.Handler): The handler writing the records
+    '''
+    def __init__(self, writer, target):
+        logging.Handler.__init__(self, target.level)
+        self.writer = writer
+        self.target = target
+
+    def handle(self, record):
+        #The queue is thread safe, so the handler lock is not needed
+        rv = self.filter(record)
+        if rv:
+            self.writer.put(self.target, record)
+        return rv
+
+    def emit(self, record):
+        self.writer.put(self.target, record)
+
+
 class DataLogging(with_metaclass(Singleton, object)):
     '''
     A module that add general logging functions to the UR Interface framework.
+
+    All event and data logging goes through one bounded queue to a background writer (LogWriter),
+    so logging never blocks the calling thread. If the queue is full records are dropped and counted,
+    see dropped.
     '''
 
     def __init__(self,path=None):
@@ -55,12 +221,10 @@ class DataLogging(with_metaclass(Singleton, object)):
         self.directory = None
         self.logDir = None
 
-        self.__developerTestingFlag = False
-        self.__eventLogFileMode = 'w'
-        self.__dataLogFileMode = 'w'
-
-        configFilename = URBasic.__file__[0:URBasic.__file__.find('URBasic')] + 'logConfig.xml'
-        self.__readConfig(configFileName=configFilename)
+        config = LogConfiguration.load()
+        self.__developerTestingFlag = config.developerMode
+        self.__eventLogFileMode = config.eventFileMode
+        self.__dataLogFileMode = config.dataFileMode
 
         self.GetLogPath(path=path, developerTestingFlag=self.__developerTestingFlag)
 
@@ -73,31 +237,10 @@ class DataLogging(with_metaclass(Singleton, object)):
         self.fileDataLogHandler = logging.FileHandler(os.path.join(self.directory, 'UrDataLog.csv'), mode=self.__dataLogFileMode)
         self.writeDataLogHeadder = True
 
-
-
-    def __readConfig(self, configFileName):
-        tree = ET.parse(configFileName)
-        logConfig = tree.getroot()
-        developerModeTag = logConfig.find('developerMode')
-        self.__developerTestingFlag = ast.literal_eval(developerModeTag.text)
-
-        eventLogConfig = logConfig.find('eventLogConfig')
-        eventFileModeTag = eventLogConfig.find('fileMode')
-        if (eventFileModeTag.text == "Overwrite"):
-            self.__eventLogFileMode = 'w'
-        elif (eventFileModeTag.text == "Append"):
-            self.__eventLogFileMode = 'a'
-        else:
-            raise ValueError("Not supported eventLogfile mode: " + eventFileModeTag.text)
-
-        dataLogConfig = logConfig.find('dataLogConfig')
-        dataFileModeTag = dataLogConfig.find('fileMode')
-        if (dataFileModeTag.text == "Overwrite"):
-            self.__dataLogFileMode = 'w'
-        elif (dataFileModeTag.text == "Append"):
-            self.__dataLogFileMode = 'a'
-        else:
-            raise ValueError("Not supported dataLogfile mode: " + dataFileModeTag.text)
+        self.writer = LogWriter(reportHandler=self.fileLogHandler)
+        self.__queuedFileLogHandler = QueuedHandler(self.writer, self.fileLogHandler)
+        self.__queuedStreamLogHandler = QueuedHandler(self.writer, self.streamLogHandler)
+        self.__queuedDataLogHandler = QueuedHandler(self.writer, self.fileDataLogHandler)
 
 
 
@@ -107,7 +250,7 @@ class DataLogging(with_metaclass(Singleton, object)):
         Path format .\[path]\YY-mm-dd\HH-MM-SS\
         '''
         if path is None:
-            path = URBasic.__file__[0:URBasic.__file__.find('URBasic')] + 'log'
+            path = defaultPath('log')
         else:
             path = os.path.join(*(re.split('\\\\|/', path)))
         if path[-1:]=='\\' or path[-1:]=='/':
@@ -137,9 +280,9 @@ class DataLogging(with_metaclass(Singleton, object)):
         name = name.replace('__', '').replace('.', '_') + 'Event'
         self.__dict__[name] = logging.getLogger(name)
         if log2file:
-            self.__dict__[name].addHandler(self.fileLogHandler)
+            self.__dict__[name].addHandler(self.__queuedFileLogHandler)
         if log2Consol:
-            self.__dict__[name].addHandler(self.streamLogHandler)
+            self.__dict__[name].addHandler(self.__queuedStreamLogHandler)
         self.__dict__[name].setLevel(level)
         return name
 
@@ -155,11 +298,22 @@ class DataLogging(with_metaclass(Singleton, object)):
         '''
         name = name+'Data'
         self.__dict__[name] = logging.getLogger(name)
-        self.__dict__[name].addHandler(self.fileDataLogHandler)
+        self.__dict__[name].addHandler(self.__queuedDataLogHandler)
         self.__dict__[name].setLevel(logging.INFO)
         if self.writeDataLogHeadder:
-            self.__dict__[name].info('Time;ModuleName;Level;Channel;UR_Time;Value1;Value2;Value3;Value4;Value5;Value6')
+            self.writer.put(self.fileDataLogHandler, 'Time;ModuleName;Level;Channel;UR_Time;Value1;Value2;Value3;Value4;Value5;Value6')
             self.fileDataLogHandler.setFormatter(logging.Formatter('%(asctime)s;%(name)s;%(levelname)s;%(message)s'))
-            self.__dict__[name].addHandler(self.fileDataLogHandler)
             self.writeDataLogHeadder = False
         return name
+
+    def dropped(self):
+        '''
+        Return the number of log records dropped because the log queue was full.
+        '''
+        return self.writer.dropped
+
+    def flush(self):
+        '''
+        Wait until all logged records are written to the files and the console.
+        '''
+        self.writer.flush()
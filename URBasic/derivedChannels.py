@@ -0,0 +1,336 @@
+'''
+Python 3.x library to control an UR robot through its TCP/IP interfaces
+Copyright (C) 2017  Martin Huus Bjerge, Rope Robotics ApS, Denmark
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+and associated documentation files (the "Software"), to deal in the Software without restriction,
+including without limitation the rights to use, copy, modify, merge, publish, distribute,
+sublicense, and/or sell copies of the Software, and to permit persons to whom the Software
+is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL "Rope Robotics ApS" BE LIABLE FOR ANY CLAIM,
+DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Except as contained in this notice, the name of "Rope Robotics ApS" shall not be used
+in advertising or otherwise to promote the sale, use or other dealings in this Software
+without prior written authorization from "Rope Robotics ApS".
+'''
+__author__ = "Martin Huus Bjerge"
+__copyright__ = "Copyright 2017, Rope Robotics ApS, Denmark"
+__license__ = "MIT License"
+
+
+import URBasic
+import ast
+import math
+import threading
+import numpy as np
+
+
+def norm(vector):
+    '''
+    Return the euclidean norm of a vector, or of each row of a 2 dimensional array of vectors.
+
+    Input parameters:
+    vector (numpy array): Vector, e.g. actual_TCP_force[0:3]
+
+    Return value:
+    norm (float or numpy array)
+    '''
+    vector = np.asarray(vector, dtype=float)
+    if vector.ndim == 1:
+        return math.hypot(*vector.tolist())
+    return np.sqrt(np.sum(vector*vector, axis=-1))
+
+def toolFrame(vectorBase, axisAngle):
+    '''
+    Return a vector given in the base frame rotated into the tool (TCP) frame.
+    Same rotation as URBasic.kinematic.Vektor_from_Base_to_TCP (Rodrigues' rotation formula),
+    without the dependencies of the kinematic module, and also accepting 2 dimensional arrays
+    with one vector and axis angle per row.
+
+    Input parameters:
+    vectorBase (numpy array): The vector to be rotated, e.g. actual_TCP_force[0:3]
+    axisAngle (numpy array): Axis angle between the base and the TCP, e.g. actual_TCP_pose[3:6]
+
+    Return value:
+    vectorTCP (numpy array)
+    '''
+    vectorBase = np.asarray(vectorBase, dtype=float)
+    axisAngle = np.asarray(axisAngle, dtype=float)
+    if vectorBase.ndim == 1 and axisAngle.ndim == 1:
+        (x, y, z) = vectorBase.tolist()
+        (rx, ry, rz) = axisAngle.tolist()
+        angle = math.sqrt(rx*rx + ry*ry + rz*rz)
+        if angle == 0.:
+            return vectorBase.copy()
+        (ex, ey, ez) = (rx/angle, ry/angle, rz/angle)
+        (cos, sin) = (math.cos(angle), math.sin(angle))
+        dot = (1 - cos)*(ex*x + ey*y + ez*z)
+        return np.array([cos*x + sin*(ey*z - ez*y) + dot*ex,
+                         cos*y + sin*(ez*x - ex*z) + dot*ey,
+                         cos*z + sin*(ex*y - ey*x) + dot*ez])
+    angle = np.sqrt(np.sum(axisAngle*axisAngle, axis=-1))[..., np.newaxis]
+    eRot = axisAngle / np.where(angle == 0., 1., angle)
+    cos = np.cos(angle)
+    dot = np.sum(eRot*vectorBase, axis=-1)[..., np.newaxis]
+    cross = eRot[..., [1, 2, 0]]*vectorBase[..., [2, 0, 1]] - eRot[..., [2, 0, 1]]*vectorBase[..., [1, 2, 0]]
+    return cos*vectorBase + np.sin(angle)*cross + (1 - cos)*dot*eRot
+
+
+class MovedDistance(object):
+    '''
+    Stateful channel function returning the total distance moved along one axis of a pose,
+    updated incrementally with the change since the previous package.
+
+    Input parameters:
+    axis (int): Element of the pose, 2 is the vertical (z) axis
+
+    Example:
+    robotModel.derivedChannels.add('urPlus_totalMovedVerticalDistance', MovedDistance(), ['actual_TCP_pose'])
+    '''
+    def __init__(self, axis=2):
+        self.axis = axis
+        self.total = 0.
+        self.__last = None
+
+    def __call__(self, pose):
+        position = float(pose[self.axis])
+        if self.__last is not None:
+            self.total += abs(position - self.__last)
+        self.__last = position
+        return self.total
+
+    def reset(self):
+        '''
+        Restart the total from zero.
+        '''
+        self.total = 0.
+        self.__last = None
+
+
+class DerivedChannel(object):
+    '''
+    A channel computed from fields of the RTDE output package, fields of dataDir
+    (e.g. the URplus fields) or other derived channels, see DerivedChannels.add.
+    '''
+    __slots__ = ['name', 'inputs', 'function', 'expression', 'sequenced']
+
+    def __init__(self, name, inputs, function, expression=None, sequenced=False):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.function = function
+        self.expression = expression
+        #The function takes the sequence number of the package (sequence keyword), e.g. a streaming filter
+        self.sequenced = sequenced
+
+
+class DerivedChannels(object):
+    '''
+    Declarative derived channels of a robot model (RobotModel.derivedChannels).
+
+    Each channel is an expression over fields of the RTDE output package, fields of dataDir
+    (e.g. the URplus fields) or other channels. The RTDE receive thread evaluates all channels once
+    per package in dependency order and adds the results to the package before it is published,
+    so a channel is read, logged by DataLog and subscribed to (RTDE.subscribe) like a native field,
+    and is cached in the snapshot of its package (see RobotModel.snapshot).
+
+    An expression is a string evaluated with the NAMESPACE functions (numpy as np, norm, toolFrame, ...)
+    where every other name is an input field, or a function called with the values of a list of inputs.
+    A channel is None when one of its inputs is None, and when it raises (logged once per channel).
+
+    Example:
+    channels = robotModel.derivedChannels
+    channels.add('tcp_force_norm', 'norm(actual_TCP_force[0:3])')
+    channels.add('tcp_force_alarm', 'tcp_force_norm > 50.')
+    sub = rob.subscribe(lambda package: package['tcp_force_alarm'])
+    '''
+    NAMESPACE = {'np':np, 'math':math, 'norm':norm, 'toolFrame':toolFrame,
+                 'abs':abs, 'min':min, 'max':max, 'float':float, 'int':int, 'bool':bool}
+
+    def __init__(self):
+        '''
+        Constructor see class description for more info.
+        '''
+        logger = URBasic.dataLogging.DataLogging()
+        name = logger.AddEventLogging(__name__,log2Consol=False)
+        self.__logger = logger.__dict__[name]
+        self.__lock = threading.Lock()
+        self.__channels = {}
+        self.__order = ()
+        self.__failed = set()
+        self.__sequence = None
+        self.__results = {}
+
+    def add(self, name, expression, inputs=None, sequenced=False):
+        '''
+        Add or replace a channel.
+
+        Input parameters:
+        name (str): Name of the channel, used like a field name
+        expression (str or function): Expression over the input fields, or function(*values of inputs)
+        inputs (list<str>): Input fields of a function, found from the names of a string expression if not given
+        sequenced (bool): Call the function with the sequence number of the package as keyword sequence, see addFilter
+
+        Example:
+        channels.add('tcp_speed_norm', 'norm(actual_TCP_speed[0:3])')
+        channels.add('tcp_force_tool', 'toolFrame(actual_TCP_force[0:3], actual_TCP_pose[3:6])')
+        channels.add('urPlus_totalMovedVerticalDistance', MovedDistance(), ['actual_TCP_pose'])
+        '''
+        if isinstance(expression, str):
+            try:
+                tree = ast.parse(expression, mode='eval')
+            except SyntaxError as e:
+                raise ValueError('Not a valid expression of derived channel ' + name + ': ' + str(e))
+            if inputs is None:
+                inputs = []
+                for node in ast.walk(tree):
+                    if isinstance(node, ast.Name) and node.id not in self.NAMESPACE and node.id not in inputs:
+                        inputs.append(node.id)
+            channel = DerivedChannel(name, inputs, compile(tree, '<derived channel ' + name + '>', 'eval'), expression)
+        elif callable(expression):
+            if inputs is None:
+                raise ValueError('Inputs of derived channel ' + name + ' must be given for a function')
+            channel = DerivedChannel(name, inputs, expression, sequenced=sequenced)
+        else:
+            raise ValueError('Derived channel ' + name + ' must be an expression or a function')
+        if name in channel.inputs:
+            raise ValueError('Derived channel ' + name + ' depends on itself')
+        with self.__lock:
+            channels = dict(self.__channels)
+            channels[name] = channel
+            self.__order = self.__sort(channels)
+            self.__channels = channels
+            self.__failed.discard(name)
+
+    def addFilter(self, name, field, streamFilter):
+        '''
+        Add a channel with the values of a field (or another channel) filtered by a streaming filter,
+        see URBasic.filters. The filter gets the sequence number of the package, so it is advanced once per package for all readers.
+
+        Input parameters:
+        name (str): Name of the channel
+        field (str): Field to filter
+        streamFilter (URBasic.filters.StreamFilter): The filter, not shared with other channels
+
+        Example:
+        channels.addFilter('actual_TCP_force_lp', 'actual_TCP_force', URBasic.filters.Biquad.lowPass(10., 500.))
+        channels.addFilter('urPlus_force_torque_sensor_median', 'urPlus_force_torque_sensor', URBasic.filters.Median(5))
+        '''
+        self.add(name, streamFilter, [field], sequenced=True)
+
+    def remove(self, name):
+        '''
+        Remove a channel, channels depending on it will be None.
+        '''
+        with self.__lock:
+            channels = dict(self.__channels)
+            channels.pop(name, None)
+            self.__order = self.__sort(channels)
+            self.__channels = channels
+
+    def names(self):
+        '''
+        Return the channel names in evaluation order.
+        '''
+        return [channel.name for channel in self.__order]
+
+    def inputs(self):
+        '''
+        Return the set of fields read by the channels, other than the channels themselves.
+        '''
+        order = self.__order
+        names = set(channel.name for channel in order)
+        return set(field for channel in order for field in channel.inputs if field not in names)
+
+    def __len__(self):
+        return len(self.__order)
+
+    @staticmethod
+    def __sort(channels):
+        '''
+        Return the channels in dependency order, raise ValueError on cyclic dependencies.
+        '''
+        order = []
+        state = {}
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError('Derived channels have a cyclic dependency: ' + ' -> '.join(path + [name]))
+            state[name] = 'visiting'
+            for field in channels[name].inputs:
+                if field in channels:
+                    visit(field, path + [name])
+            state[name] = 'done'
+            order.append(channels[name])
+        for name in channels:
+            visit(name, [])
+        return tuple(order)
+
+    def evaluate(self, package, dataDir=None, sequence=None):
+        '''
+        Evaluate all channels on a package, called by the RTDE receive thread once per package.
+        The results of the latest sequence number are cached, so evaluating the same package again
+        returns the same values and does not advance stateful channels (e.g. MovedDistance).
+
+        Input parameters:
+        package (dict): Field values of the package
+        dataDir (dict): [Optional] Values of fields not in the package, e.g. RobotModel.dataDir
+        sequence (int): [Optional] Sequence number of the package
+
+        Return value:
+        values (dict): Channel name and value, vector values are read only numpy arrays
+        '''
+        if sequence is not None and sequence == self.__sequence:
+            return self.__results
+        results = {}
+        for channel in self.__order:
+            args = []
+            for field in channel.inputs:
+                value = results.get(field, package.get(field))
+                if value is None and dataDir is not None and field not in results:
+                    value = dataDir.get(field)
+                if value is None:
+                    break
+                args.append(value)
+            else:
+                try:
+                    if channel.sequenced:
+                        value = channel.function(*args, sequence=sequence)
+                    elif channel.expression is None:
+                        value = channel.function(*args)
+                    else:
+                        value = eval(channel.function, self.NAMESPACE, dict(zip(channel.inputs, args)))
+                    if type(value) is np.ndarray and value.flags.writeable:
+                        #The function may keep using the array (e.g. the state of a filter), freeze a copy
+                        value = value.copy()
+                        value.flags.writeable = False
+                except Exception as e:
+                    value = None
+                    if channel.name not in self.__failed:
+                        self.__failed.add(channel.name)
+                        self.__logger.error('Derived channel ' + channel.name + ' failed: ' + str(e))
+            results[channel.name] = value
+        self.__sequence = sequence
+        self.__results = results
+        return results
+
+    def addDefaults(self):
+        '''
+        Add the commonly used channels:
+        tcp_speed_norm (float): Norm of the TCP linear speed in m/s
+        tcp_force_norm (float): Norm of the TCP force in N
+        tcp_force_tool (numpy array): TCP force in the tool frame
+        urPlus_totalMovedVerticalDistance (float): Total distance moved along the base z axis in m
+        '''
+        self.add('tcp_speed_norm', 'norm(actual_TCP_speed[0:3])')
+        self.add('tcp_force_norm', 'norm(actual_TCP_force[0:3])')
+        self.add('tcp_force_tool', 'toolFrame(actual_TCP_force[0:3], actual_TCP_pose[3:6])')
+        self.add('urPlus_totalMovedVerticalDistance', MovedDistance(), ['actual_TCP_pose'])
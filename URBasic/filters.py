@@ -0,0 +1,301 @@
+'''
+Python 3.x library to control an UR robot through its TCP/IP interfaces
+Copyright (C) 2017  Martin Huus Bjerge, Rope Robotics ApS, Denmark
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+and associated documentation files (the "Software"), to deal in the Software without restriction,
+including without limitation the rights to use, copy, modify, merge, publish, distribute,
+sublicense, and/or sell copies of the Software, and to permit persons to whom the Software
+is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL "Rope Robotics ApS" BE LIABLE FOR ANY CLAIM,
+DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Except as contained in this notice, the name of "Rope Robotics ApS" shall not be used
+in advertising or otherwise to promote the sale, use or other dealings in this Software
+without prior written authorization from "Rope Robotics ApS".
+'''
+__author__ = "Martin Huus Bjerge"
+__copyright__ = "Copyright 2017, Rope Robotics ApS, Denmark"
+__license__ = "MIT License"
+
+
+import math
+import numpy as np
+
+
+class StreamFilter(object):
+    '''
+    Base class of the streaming filters. A filter is called with one sample at a time
+    (a scalar or a vector, e.g. the six axes of actual_TCP_force) and returns the filtered sample.
+    All axes are filtered at once, and the state is fixed size, so the cost per sample is constant.
+
+    A filter is attached to a field as a derived channel, see URBasic.derivedChannels.DerivedChannels.addFilter,
+    so the filtered value is computed once per package for all readers. The channel passes the sequence
+    number of the package, and calling the filter again with the same sequence number returns the previous
+    result without advancing the filter. A field that is updated slower than the RTDE packages
+    (e.g. urPlus_force_torque_sensor in dataDir) is sampled once per package, holding its latest value.
+
+    Input parameters:
+    initial (float or vector): [Optional] Initial state, as if the filter had settled on this value.
+                               If not given the filter settles on the first sample.
+    '''
+    def __init__(self, initial=None):
+        self._initial = initial
+        self.__lastSequence = None
+        self.__lastOutput = None
+        self._primed = False
+
+    def __call__(self, sample, sequence=None):
+        '''
+        Filter a sample.
+
+        Input parameters:
+        sample (float or vector): The new sample
+        sequence (int): [Optional] Sequence number of the sample, a repeated sequence number returns the previous result
+
+        Return value:
+        output (numpy array): The filtered sample
+        '''
+        if sequence is not None and sequence == self.__lastSequence:
+            return self.__lastOutput
+        value = np.array(sample, dtype=float)
+        if not self._primed:
+            self._prime(value if self._initial is None else np.broadcast_to(np.asarray(self._initial, dtype=float), value.shape).copy())
+            self._primed = True
+        output = self._update(value)
+        self.__lastSequence = sequence
+        self.__lastOutput = output
+        return output
+
+    def reset(self):
+        '''
+        Clear the state, the filter settles again on the initial value or the next sample.
+        '''
+        self.__lastSequence = None
+        self.__lastOutput = None
+        self._primed = False
+
+    def _prime(self, value):
+        raise NotImplementedError('Function Not yet implemented')
+
+    def _update(self, value):
+        raise NotImplementedError('Function Not yet implemented')
+
+
+class Exponential(StreamFilter):
+    '''
+    Exponential smoothing, y = y + alpha*(x - y).
+
+    Input parameters:
+    alpha (float): Weight of the new sample, 0 < alpha <= 1
+    initial (float or vector): [Optional] see StreamFilter
+
+    Example:
+    smooth = URBasic.filters.Exponential.timeConstant(0.05, 500.)
+    '''
+    def __init__(self, alpha, initial=None):
+        if not 0. < alpha <= 1.:
+            raise ValueError('Exponential filter alpha must be in (0, 1], got ' + str(alpha))
+        StreamFilter.__init__(self, initial)
+        self.alpha = alpha
+        self.__state = None
+
+    @staticmethod
+    def timeConstant(tau, frequency, initial=None):
+        '''
+        Return the exponential filter with time constant tau seconds at a sample frequency in Hz.
+        '''
+        return Exponential(1. - math.exp(-1./(tau*frequency)), initial)
+
+    def _prime(self, value):
+        self.__state = value
+
+    def _update(self, value):
+        self.__state = self.__state + self.alpha*(value - self.__state)
+        return self.__state
+
+
+class Biquad(StreamFilter):
+    '''
+    Second order IIR filter (direct form II transposed) with normalized coefficients,
+    y = b0*x + b1*x[-1] + b2*x[-2] - a1*y[-1] - a2*y[-2].
+
+    Input parameters:
+    b (list<float>): Numerator coefficients b0, b1, b2
+    a (list<float>): Denominator coefficients a0, a1, a2, normalized to a0 if a0 is not 1
+    initial (float or vector): [Optional] see StreamFilter
+
+    Example:
+    lowPass = URBasic.filters.Biquad.lowPass(10., 500.)
+    '''
+    def __init__(self, b, a, initial=None):
+        if len(b) != 3 or len(a) != 3 or a[0] == 0:
+            raise ValueError('Biquad filter needs 3 numerator and 3 denominator coefficients with a0 != 0')
+        StreamFilter.__init__(self, initial)
+        (self.b0, self.b1, self.b2) = [float(x)/a[0] for x in b]
+        (self.a1, self.a2) = [float(x)/a[0] for x in a[1:]]
+        self.__b = None
+        self.__a = None
+        self.__state = None
+
+    @staticmethod
+    def lowPass(cutoff, frequency, q=1./math.sqrt(2.), initial=None):
+        '''
+        Return a low pass filter (Butterworth for the default q) with cutoff frequency in Hz
+        at a sample frequency in Hz, e.g. 500 Hz for the RTDE packages of an e-series robot.
+        '''
+        (cos, alpha) = Biquad.__design(cutoff, frequency, q)
+        return Biquad([(1 - cos)/2., 1 - cos, (1 - cos)/2.], [1 + alpha, -2*cos, 1 - alpha], initial)
+
+    @staticmethod
+    def highPass(cutoff, frequency, q=1./math.sqrt(2.), initial=None):
+        '''
+        Return a high pass filter with cutoff frequency in Hz at a sample frequency in Hz.
+        '''
+        (cos, alpha) = Biquad.__design(cutoff, frequency, q)
+        return Biquad([(1 + cos)/2., -(1 + cos), (1 + cos)/2.], [1 + alpha, -2*cos, 1 - alpha], initial)
+
+    @staticmethod
+    def notch(center, frequency, q=1./math.sqrt(2.), initial=None):
+        '''
+        Return a notch filter removing the center frequency in Hz at a sample frequency in Hz.
+        '''
+        (cos, alpha) = Biquad.__design(center, frequency, q)
+        return Biquad([1., -2*cos, 1.], [1 + alpha, -2*cos, 1 - alpha], initial)
+
+    @staticmethod
+    def __design(cutoff, frequency, q):
+        if not 0. < cutoff < frequency/2.:
+            raise ValueError('Filter frequency ' + str(cutoff) + ' Hz must be between 0 and half the sample frequency ' + str(frequency) + ' Hz')
+        w0 = 2*math.pi*cutoff/frequency
+        return (math.cos(w0), math.sin(w0)/(2*q))
+
+    def _prime(self, value):
+        gain = (self.b0 + self.b1 + self.b2)/(1. + self.a1 + self.a2)
+        output = gain*value
+        self.__state = np.array([output - self.b0*value, self.b2*value - self.a2*output])
+        shape = (2,) + (1,)*value.ndim
+        self.__b = np.array([self.b1, self.b2]).reshape(shape)
+        self.__a = np.array([self.a1, self.a2]).reshape(shape)
+
+    def _update(self, value):
+        #Both delay elements of all axes are updated with one operation per coefficient row
+        output = self.b0*value + self.__state[0]
+        state = self.__b*value - self.__a*output
+        state[0] += self.__state[1]
+        self.__state = state
+        return output
+
+
+class MovingAverage(StreamFilter):
+    '''
+    Average of the latest length samples, kept as a running sum in a ring buffer.
+    The sum is recomputed from the buffer once per length samples to remove rounding drift.
+
+    Input parameters:
+    length (int): Number of samples in the window
+    initial (float or vector): [Optional] see StreamFilter
+
+    Example:
+    average = URBasic.filters.MovingAverage(60, initial=0.)
+    average(sample)
+    if average.total() < tolerance: ...
+    '''
+    def __init__(self, length, initial=None):
+        if length < 1:
+            raise ValueError('Moving average length must be at least 1, got ' + str(length))
+        StreamFilter.__init__(self, initial)
+        self.length = int(length)
+        self.__buffer = None
+        self.__sum = None
+        self.__index = 0
+
+    def _prime(self, value):
+        self.__buffer = np.empty((self.length,) + value.shape)
+        self.__buffer[:] = value
+        self.__sum = self.length*value
+        self.__index = 0
+
+    def _update(self, value):
+        self.__sum = self.__sum + (value - self.__buffer[self.__index])
+        self.__buffer[self.__index] = value
+        self.__index += 1
+        if self.__index == self.length:
+            self.__index = 0
+            self.__sum = self.__buffer.sum(axis=0)
+        return self.__sum/self.length
+
+    def total(self):
+        '''
+        Return the sum of the samples in the window, None before the first sample if no initial value is given.
+        '''
+        if self.__sum is None:
+            if self._initial is None:
+                return None
+            return self.length*np.array(self._initial, dtype=float)
+        return self.__sum.copy()
+
+
+class Median(StreamFilter):
+    '''
+    Median of the latest length samples per axis, removing spikes. The window is a ring buffer,
+    and the median of all axes is found by sorting the window with one np.sort call per sample,
+    so keep length small (e.g. 5 to 15).
+
+    Input parameters:
+    length (int): Number of samples in the window, odd lengths give a sample value
+    initial (float or vector): [Optional] see StreamFilter
+    '''
+    def __init__(self, length, initial=None):
+        if length < 1:
+            raise ValueError('Median filter length must be at least 1, got ' + str(length))
+        StreamFilter.__init__(self, initial)
+        self.length = int(length)
+        self.__buffer = None
+        self.__index = 0
+
+    def _prime(self, value):
+        self.__buffer = np.empty((self.length,) + value.shape)
+        self.__buffer[:] = value
+        self.__index = 0
+
+    def _update(self, value):
+        self.__buffer[self.__index] = value
+        self.__index = (self.__index + 1) % self.length
+        ordered = np.sort(self.__buffer, axis=0)
+        middle = self.length//2
+        if self.length % 2:
+            return ordered[middle]
+        return (ordered[middle - 1] + ordered[middle])/2.
+
+
+class Chain(StreamFilter):
+    '''
+    Filters applied one after the other, e.g. a median filter removing spikes followed by a low pass filter.
+
+    Input parameters:
+    filters (StreamFilter): The filters in order
+    '''
+    def __init__(self, *filters):
+        StreamFilter.__init__(self)
+        self.filters = filters
+
+    def _prime(self, value):
+        pass
+
+    def _update(self, value):
+        for streamFilter in self.filters:
+            value = streamFilter(value)
+        return value
+
+    def reset(self):
+        StreamFilter.reset(self)
+        for streamFilter in self.filters:
+            streamFilter.reset()
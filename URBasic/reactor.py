@@ -0,0 +1,896 @@
+'''
+Python 3.x library to control an UR robot through its TCP/IP interfaces
+Copyright (C) 2017  Martin Huus Bjerge, Rope Robotics ApS, Denmark
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+and associated documentation files (the "Software"), to deal in the Software without restriction,
+including without limitation the rights to use, copy, modify, merge, publish, distribute,
+sublicense, and/or sell copies of the Software, and to permit persons to whom the Software
+is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL "Rope Robotics ApS" BE LIABLE FOR ANY CLAIM,
+DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Except as contained in this notice, the name of "Rope Robotics ApS" shall not be used
+in advertising or otherwise to promote the sale, use or other dealings in this Software
+without prior written authorization from "Rope Robotics ApS".
+'''
+__author__ = "Martin Huus Bjerge"
+__copyright__ = "Copyright 2017, Rope Robotics ApS, Denmark"
+__license__ = "MIT License"
+
+import URBasic
+import threading
+import selectors
+import socket
+import collections
+import heapq
+import random
+import errno
+import time
+import URBasic.dashboard
+import URBasic.realTimeClient
+from URBasic.connectionState import ConnectionState
+from URBasic.rtde import Command, RTDE, RTDEFrameBuffer, RTDESession
+
+DEFAULT_TIMEOUT = 1.0
+#Seconds between the data timeout checks of ReactorRTDE
+WATCHDOG_INTERVAL = 0.1
+
+
+class ReactorTimer(object):
+    '''
+    Handle of a call scheduled with Reactor.callLater or Reactor.callEvery, see Reactor.cancel.
+    '''
+    __slots__ = ['when', 'interval', 'function', 'args', 'cancelled']
+
+    def __init__(self, when, interval, function, args):
+        self.when = when
+        self.interval = interval
+        self.function = function
+        self.args = args
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return self.when < other.when
+
+
+class Reactor(threading.Thread):
+    '''
+    One I/O thread multiplexing the sockets of many robot connections with selectors
+    (epoll on Linux), instead of a thread per connection.
+
+    Connections (see ReactorConnection) are non blocking state machines: the reactor calls
+    them when their socket is readable or writable and when their timers are due, so the
+    CPU used scales with the packet rate and not with the number of connections.
+    The callbacks run on the reactor thread and must never block.
+
+    Other threads interact with the reactor through call, callLater and callEvery,
+    which are thread safe and wake up the reactor.
+
+    Example:
+    reactor = URBasic.reactor.Reactor()
+    robots = []
+    for host in ['192.168.1.11', '192.168.1.12']:
+        robotModel = URBasic.robotModel.RobotModel()
+        robots.append(URBasic.urScriptExt.UrScriptExt(host, robotModel, reactor=reactor))
+    ...
+    reactor.close()
+    '''
+
+    def __init__(self):
+        '''
+        Constructor see class description for more info.
+        '''
+        logger = URBasic.dataLogging.DataLogging()
+        name = logger.AddEventLogging(__name__,log2Consol=False)
+        self._logger = logger.__dict__[name]
+
+        self.__selector = selectors.DefaultSelector()
+        self.__lock = threading.Lock()
+        self.__calls = collections.deque()
+        self.__timers = []
+        self.__stop_event = False
+        (self.__wakeupReader, self.__wakeupWriter) = socket.socketpair()
+        self.__wakeupReader.setblocking(False)
+        self.__wakeupWriter.setblocking(False)
+        self.__selector.register(self.__wakeupReader, selectors.EVENT_READ, self.__wakeup)
+        self.__wakeupPending = False
+        self.__connections = set()
+        self.loops = 0
+        self.events = 0
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.start()
+        self._logger.info('Reactor constructor done')
+
+    def inReactorThread(self):
+        '''
+        Return True if called from the reactor thread.
+        '''
+        return threading.current_thread() is self
+
+    def call(self, function, *args):
+        '''
+        Run a function on the reactor thread as soon as possible (thread safe).
+        Called from the reactor thread the function is run directly.
+        '''
+        if self.inReactorThread():
+            function(*args)
+            return
+        with self.__lock:
+            self.__calls.append((function, args))
+            wakeup = not self.__wakeupPending
+            self.__wakeupPending = True
+        if wakeup:
+            try:
+                self.__wakeupWriter.send(b'\0')
+            except (BlockingIOError, OSError):
+                pass
+
+    def callLater(self, delay, function, *args):
+        '''
+        Run a function on the reactor thread after delay seconds (thread safe).
+
+        Return value:
+        timer (ReactorTimer): Handle to cancel the call
+        '''
+        timer = ReactorTimer(time.monotonic()+delay, None, function, args)
+        self.call(heapq.heappush, self.__timers, timer)
+        return timer
+
+    def callEvery(self, interval, function, *args):
+        '''
+        Run a function on the reactor thread every interval seconds (thread safe).
+
+        Return value:
+        timer (ReactorTimer): Handle to cancel the calls
+        '''
+        timer = ReactorTimer(time.monotonic()+interval, interval, function, args)
+        self.call(heapq.heappush, self.__timers, timer)
+        return timer
+
+    def cancel(self, timer):
+        '''
+        Cancel a call scheduled with callLater or callEvery.
+        '''
+        if timer is not None:
+            timer.cancelled = True
+
+    def register(self, sock, events, handler):
+        '''
+        Watch a socket for events (reactor thread only).
+
+        Input parameters:
+        sock (socket): Non blocking socket
+        events (int): selectors.EVENT_READ and/or selectors.EVENT_WRITE
+        handler (function): function(mask) called when the socket is ready
+        '''
+        self.__selector.register(sock, events, handler)
+
+    def modify(self, sock, events, handler):
+        '''
+        Change the events watched on a socket (reactor thread only).
+        '''
+        self.__selector.modify(sock, events, handler)
+
+    def unregister(self, sock):
+        '''
+        Stop watching a socket (reactor thread only).
+        '''
+        try:
+            self.__selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+
+    def connections(self):
+        '''
+        Return the number of watched sockets.
+        '''
+        watched = self.__selector.get_map()
+        if watched is None:
+            return 0
+        return len(watched) - 1
+
+    def attach(self, connection):
+        '''
+        Add a connection to the connections closed by close (thread safe), see ReactorConnection.open.
+        '''
+        with self.__lock:
+            self.__connections.add(connection)
+
+    def detach(self, connection):
+        '''
+        Remove a connection from the connections closed by close (thread safe), see ReactorConnection.close.
+        '''
+        with self.__lock:
+            self.__connections.discard(connection)
+
+    def close(self):
+        '''
+        Close the open connections and stop the reactor thread.
+        '''
+        if self.__stop_event:
+            return
+        with self.__lock:
+            connections = list(self.__connections)
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception as e:
+                self._logger.error('Reactor connection close failed: ' + str(e))
+        self.__stop_event = True
+        self.call(lambda: None)
+        if not self.inReactorThread():
+            self.join()
+        self.__selector.close()
+        self.__wakeupReader.close()
+        self.__wakeupWriter.close()
+
+    def __wakeup(self, mask):
+        try:
+            self.__wakeupReader.recv(4096)
+        except (BlockingIOError, OSError):
+            pass
+
+    def __runCalls(self):
+        with self.__lock:
+            calls = self.__calls
+            self.__calls = collections.deque()
+            self.__wakeupPending = False
+        for (function, args) in calls:
+            try:
+                function(*args)
+            except Exception as e:
+                self._logger.error('Reactor call failed: ' + str(e))
+
+    def __runTimers(self):
+        now = time.monotonic()
+        timers = self.__timers
+        while len(timers) and timers[0].when <= now:
+            timer = heapq.heappop(timers)
+            if timer.cancelled:
+                continue
+            if timer.interval is not None:
+                timer.when = max(timer.when + timer.interval, now)
+                heapq.heappush(timers, timer)
+            try:
+                timer.function(*timer.args)
+            except Exception as e:
+                self._logger.error('Reactor timer failed: ' + str(e))
+
+    def run(self):
+        while not self.__stop_event:
+            timeout = DEFAULT_TIMEOUT
+            if len(self.__calls):
+                timeout = 0
+            elif len(self.__timers):
+                timeout = min(timeout, max(0., self.__timers[0].when - time.monotonic()))
+            for (key, mask) in self.__selector.select(timeout):
+                self.events += 1
+                try:
+                    key.data(mask)
+                except Exception as e:
+                    self._logger.error('Reactor handler failed: ' + str(e))
+            self.__runCalls()
+            self.__runTimers()
+            self.loops += 1
+        #Run the calls queued by close, e.g. closing the connections
+        self.__runCalls()
+        self._logger.info('Reactor is stopped')
+
+
+class ReactorConnection(object):
+    '''
+    Non blocking TCP client connection served by a Reactor.
+
+    The connection connects without blocking, reads into the buffer given by getBuffer and
+    calls onData, queues writes that can not be send at once and reconnects with jittered
+    exponential backoff when the connection is lost, until closed.
+
+    Subclasses implement the protocol as a state machine in the callbacks
+    onConnected, onData and onDisconnected, which run on the reactor thread.
+
+    Input parameters:
+    reactor (Reactor): The reactor serving the connection
+    host (str): Host name or IP address
+    port (int): TCP port
+    reconnectDelay (float): First reconnect delay in seconds, doubled for each failed attempt
+    maxReconnectDelay (float): Max reconnect delay in seconds
+    '''
+
+    def __init__(self, reactor, host, port, reconnectDelay=0.1, maxReconnectDelay=5.):
+        self.reactor = reactor
+        self.host = host
+        self.port = port
+        self.reconnectDelay = reconnectDelay
+        self.maxReconnectDelay = maxReconnectDelay
+        self.connectionState = ConnectionState.DISCONNECTED
+        self.connects = 0
+        self.__sock = None
+        self.__connecting = False
+        self.__writeLock = threading.Lock()
+        self.__writes = collections.deque()
+        self.__writeWatched = False
+        self.__attempt = 0
+        self.__timer = None
+        self.__closed = False
+        self.__scratch = bytearray(65536)
+
+    def open(self):
+        '''
+        Start connecting (thread safe).
+        '''
+        self.__closed = False
+        self.reactor.attach(self)
+        self.reactor.call(self.__connect)
+
+    def close(self):
+        '''
+        Close the connection and stop reconnecting (thread safe).
+        '''
+        self.__closed = True
+        self.reactor.detach(self)
+        self.reactor.call(self.__close)
+
+    def isConnected(self):
+        '''
+        Return True if the connection is open.
+        '''
+        return self.connectionState >= ConnectionState.CONNECTED
+
+    def write(self, data):
+        '''
+        Send data (thread safe). Data that can not be send at once is queued and send
+        when the socket is writable. Returns False if not connected.
+        '''
+        watch = False
+        sent = 0
+        with self.__writeLock:
+            sock = self.__sock
+            if sock is None or self.__connecting:
+                return False
+            if not len(self.__writes):
+                try:
+                    sent = sock.send(data)
+                except (BlockingIOError, InterruptedError):
+                    sent = 0
+                except OSError:
+                    sent = None
+                if sent == len(data):
+                    return True
+                if sent is not None:
+                    data = data[sent:]
+            if sent is not None:
+                self.__writes.append(bytes(data))
+                watch = not self.__writeWatched
+                self.__writeWatched = True
+        if sent is None:
+            self.reactor.call(self.__lost, sock)
+            return False
+        if watch:
+            self.reactor.call(self.__watch, sock)
+        return True
+
+    def drop(self):
+        '''
+        Close the socket and reconnect after the reconnect delay (thread safe).
+        '''
+        self.reactor.call(self.__drop)
+
+    def resetBackoff(self):
+        '''
+        Reset the reconnect delay, to be called when the protocol is up and running.
+        '''
+        self.__attempt = 0
+
+    '''Protocol callbacks, run on the reactor thread'''
+    def getBuffer(self):
+        '''
+        Return a writable memoryview to read into, default a scratch buffer (data is dropped).
+        '''
+        return memoryview(self.__scratch)
+
+    def onConnected(self):
+        pass
+
+    def onData(self, nbytes):
+        pass
+
+    def onDisconnected(self):
+        pass
+
+    def __connect(self):
+        self.__timer = None
+        if self.__closed or self.__sock is not None:
+            return
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        result = sock.connect_ex((self.host, self.port))
+        if result not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            sock.close()
+            self.__scheduleReconnect()
+            return
+        with self.__writeLock:
+            self.__sock = sock
+            self.__connecting = True
+        self.reactor.register(sock, selectors.EVENT_WRITE, self.__onEvent)
+
+    def __watch(self, sock):
+        if sock is self.__sock and not self.__connecting:
+            self.reactor.modify(sock, selectors.EVENT_READ | selectors.EVENT_WRITE, self.__onEvent)
+
+    def __onEvent(self, mask):
+        sock = self.__sock
+        if sock is None:
+            return
+        if self.__connecting:
+            error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if error != 0:
+                self.__lost(sock)
+                return
+            with self.__writeLock:
+                self.__connecting = False
+            self.connects += 1
+            self.connectionState = ConnectionState.CONNECTED
+            self.reactor.modify(sock, selectors.EVENT_READ, self.__onEvent)
+            self.onConnected()
+            return
+        if mask & selectors.EVENT_READ:
+            try:
+                nbytes = sock.recv_into(self.getBuffer())
+            except (BlockingIOError, InterruptedError):
+                nbytes = None
+            except OSError:
+                nbytes = 0
+            if nbytes == 0:
+                self.__lost(sock)
+                return
+            if nbytes:
+                self.onData(nbytes)
+        if mask & selectors.EVENT_WRITE:
+            self.__flush(sock)
+
+    def __flush(self, sock):
+        failed = False
+        with self.__writeLock:
+            while len(self.__writes):
+                data = self.__writes[0]
+                try:
+                    sent = sock.send(data)
+                except (BlockingIOError, InterruptedError):
+                    return
+                except OSError:
+                    failed = True
+                    break
+                if sent < len(data):
+                    self.__writes[0] = data[sent:]
+                    return
+                self.__writes.popleft()
+            self.__writeWatched = False
+        if failed:
+            #Lost like a failed read, the unsent data is dropped
+            self.__lost(sock)
+        elif sock is self.__sock:
+            self.reactor.modify(sock, selectors.EVENT_READ, self.__onEvent)
+
+    def __lost(self, sock):
+        if sock is not self.__sock:
+            return
+        self.reactor.unregister(sock)
+        with self.__writeLock:
+            self.__sock = None
+            self.__connecting = False
+            self.__writes.clear()
+            self.__writeWatched = False
+        sock.close()
+        wasConnected = self.connectionState >= ConnectionState.CONNECTED
+        self.connectionState = ConnectionState.DISCONNECTED
+        if wasConnected:
+            self.onDisconnected()
+        self.__scheduleReconnect()
+
+    def __drop(self):
+        if self.__sock is not None:
+            self.__lost(self.__sock)
+
+    def __scheduleReconnect(self):
+        if self.__closed or self.__timer is not None:
+            return
+        delay = min(self.maxReconnectDelay, self.reconnectDelay * 2**self.__attempt)
+        delay *= random.uniform(0.5, 1.)
+        self.__attempt += 1
+        self.__timer = self.reactor.callLater(delay, self.__connect)
+
+    def __close(self):
+        self.reactor.cancel(self.__timer)
+        self.__timer = None
+        sock = self.__sock
+        if sock is not None:
+            self.__lost(sock)
+            self.reactor.cancel(self.__timer)
+            self.__timer = None
+
+
+class ReactorRTDE(ReactorConnection):
+    '''
+    RTDE interface served by a Reactor, with the API of URBasic.rtde.RTDE.
+
+    The negotiation (controller version, protocol version 2 falling back to 1, output setup,
+    input setups and start) is driven by the responses, see RTDESession.connectRequests,
+    and is pipelined with the accepted recipes after a reconnect. Decoding is done by the
+    same RTDESession as RTDE. As in RTDE a running connection without data packages for
+    RTDESession.dataTimeout is considered lost and reconnected, checked by a reactor timer.
+
+    Input parameters:
+    reactor (Reactor): The reactor serving the connection
+    robotModel (RobotModel): The robot model to update, robotModel.ipAddress is the host
+    conf_filename (string): [Optional] Path to xml file describing what channels to activate
+    historySeconds (float): [Optional] Keep a time series history of this length of all output fields
+    frequency (float): [Optional] Output package frequency, default is the controller frequency
+    outputFields (list<str>): [Optional] Output fields to receive instead of the receive fields of the configuration file
+    '''
+
+    def __init__(self, reactor, robotModel, conf_filename=None, historySeconds=None, frequency=None, outputFields=None):
+        '''
+        Constructor see class description for more info.
+        '''
+        ReactorConnection.__init__(self, reactor, robotModel.ipAddress, 30004, reconnectDelay=0.01)
+        self.__robotModel = robotModel
+        logger = URBasic.dataLogging.DataLogging()
+        name = logger.AddEventLogging(__name__,log2Consol=False)
+        self._logger = logger.__dict__[name]
+        self.__session = RTDESession(robotModel, conf_filename, self._logger, historySeconds, frequency)
+        self.__outputFields = outputFields
+        self.__frameBuffer = RTDEFrameBuffer()
+        self.__lastData = time.monotonic()
+        self.__watchdog = None
+        self.open()
+        self._logger.info('ReactorRTDE constructor done')
+
+    def getBuffer(self):
+        return self.__frameBuffer.getBuffer()
+
+    def onConnected(self):
+        self.__frameBuffer.clear()
+        self.__session.connectionState = ConnectionState.CONNECTED
+        self.__lastData = time.monotonic()
+        self.reactor.cancel(self.__watchdog)
+        self.__watchdog = self.reactor.callEvery(WATCHDOG_INTERVAL, self.__checkData)
+        fields = self.__outputFields
+        if fields is not None:
+            fields = list(fields) + [name for name in RTDE.REQUIRED_OUTPUT_FIELDS if name not in fields]
+        self.write(b''.join(self.__session.connectRequests(fields)))
+
+    def onDisconnected(self):
+        self.reactor.cancel(self.__watchdog)
+        self.__watchdog = None
+        self.__session.connectionState = ConnectionState.DISCONNECTED
+        self.__session.metrics().recordReconnect()
+        self.__session.notifyAll()
+        self._logger.info('RTDE disconnected')
+
+    def onData(self, nbytes):
+        self.__lastData = time.monotonic()
+        self.__frameBuffer.commit(nbytes)
+        packages = 0
+        for (packet_command, packet) in self.__frameBuffer.frames():
+            packages += 1
+            try:
+                self.__session.handlePackage(packet_command, packet)
+            except ValueError as e:
+                self._logger.error('RTDE package error: ' + str(e))
+                continue
+            if packet_command != Command.RTDE_DATA_PACKAGE and self.__session.isNegotiating():
+                self.__negotiate(packet_command)
+                if not self.isConnected():
+                    #Dropped or closed by the negotiation, the rest belongs to the old connection
+                    break
+        self.__session.metrics().recordRead(nbytes, packages)
+
+    def __checkData(self):
+        '''
+        Drop a running connection without data packages for RTDESession.dataTimeout (reactor timer).
+        '''
+        if self.__session.connectionState == ConnectionState.STARTED and time.monotonic()-self.__lastData > self.__session.dataTimeout():
+            self._logger.warning('RTDE connection lost: no data received')
+            self.drop()
+
+    def __negotiate(self, command):
+        '''
+        Send the next requests of the negotiation, see RTDESession.negotiate
+        '''
+        packages = self.__session.negotiate(command)
+        if packages is None:
+            if self.__session.setupError() is not None:
+                #Reconnecting does not help, stop the interface
+                self._logger.error('RTDE interface stopped: ' + self.__session.setupError())
+                self.close()
+                return
+            self._logger.error('RTDE negotiation failed')
+            self.drop()
+            return
+        if len(packages):
+            self.write(b''.join(packages))
+        if not self.__session.isNegotiating():
+            if self.__session.connectionState == ConnectionState.STARTED:
+                self.resetBackoff()
+                self._logger.info('RTDE interface started')
+            else:
+                self._logger.error('RTDE interface not able to start')
+
+    def isRunning(self):
+        '''
+        Return True if RTDE interface is running
+        '''
+        return self.__session.connectionState >= ConnectionState.STARTED
+
+    def session(self):
+        '''
+        Return the protocol session (RTDESession) of the interface.
+        '''
+        return self.__session
+
+    def setData(self, variable_name, value):
+        '''
+        Set input data, see RTDE.setData
+        '''
+        return self.__session.setData(variable_name, value)
+
+    def sendData(self, recipe=None, changedOnly=False):
+        '''
+        Send the input recipes, see RTDE.sendData
+        '''
+        packages = self.__session.dataRequests(recipe, changedOnly)
+        if packages is None:
+            return False
+        for package in packages:
+            if not self.write(bytes(package)):
+                return False
+        return True
+
+    def sampleSequence(self):
+        '''
+        Return the sequence number of the latest received data package, see RTDESession.sampleSequence
+        '''
+        return self.__session.sampleSequence()
+
+    def wait_for_sample(self, after_seq=None, timeout=DEFAULT_TIMEOUT):
+        '''
+        Wait until a data package newer than after_seq has been received, see RTDESession.wait_for_sample
+        '''
+        return self.__session.wait_for_sample(after_seq, timeout)
+
+    def subscribe(self, predicate, callback=None, once=True):
+        '''
+        Register a predicate evaluated once per data package on the reactor thread, see RTDESession.subscribe
+        '''
+        return self.__session.subscribe(predicate, callback, once)
+
+    def unsubscribe(self, subscription):
+        '''
+        Remove a subscription, see subscribe.
+        '''
+        self.__session.unsubscribe(subscription)
+
+    def history(self, name=None, seconds=None, samples=None, copy=False):
+        '''
+        Return the latest window of an output field from the history, see RTDESession.history
+        '''
+        return self.__session.history(name, seconds, samples, copy)
+
+    def metrics(self):
+        '''
+        Return the link quality measurements of the interface, see RTDEMetrics.
+        '''
+        return self.__session.metrics()
+
+    def outputDecoder(self):
+        '''
+        Return the compiled decoder of the output recipe, see RTDESession.outputDecoder
+        '''
+        return self.__session.outputDecoder()
+
+    def frameBufferStats(self):
+        '''
+        Return the counters of the receive buffer, see RTDEFrameBuffer.stats
+        '''
+        return self.__frameBuffer.stats()
+
+    def close(self):
+        '''
+        Pause the data stream and close the connection.
+        '''
+        if self.isRunning():
+            self.write(self.__session.pauseRequest())
+        self.reactor.cancel(self.__watchdog)
+        ReactorConnection.close(self)
+        self.__session.connectionState = ConnectionState.DISCONNECTED
+        self.__session.closeColumnLog()
+        self.__session.notifyAll()
+
+
+class ReactorDashBoard(URBasic.dashboard.DashBoard):
+    '''
+    Dashboard server interface served by a Reactor, with the commands of URBasic.dashboard.DashBoard.
+    Only the transport of DashBoard is replaced, a command waits for the response line
+    received by the reactor thread.
+
+    Input parameters:
+    reactor (Reactor): The reactor serving the connection
+    robotModel (RobotModel): The robot model, robotModel.ipAddress is the host
+    '''
+
+    def __init__(self, reactor, robotModel):
+        '''
+        Constructor see class description for more info.
+        '''
+        threading.Thread.__init__(self)
+        logger = URBasic.dataLogging.DataLogging()
+        name = logger.AddEventLogging(__name__)
+        self._logger = logger.__dict__[name]
+        self.last_respond = None
+        self.__dataEvent = threading.Condition()
+        self.__connection = ReactorLineConnection(reactor, robotModel.ipAddress, 29999, self.__onLine)
+        self.__connection.open()
+        self.wait_dbs()
+        self._logger.info('Dashboard server constructor done')
+
+    def __onLine(self, line):
+        self._logger.info('UR Dashboard respond ' + line)
+        with self.__dataEvent:
+            self.last_respond = line
+            self.__dataEvent.notify_all()
+
+    def _send(self, cmd):
+        '''
+        Send a command and wait for the response (replaces the transport of DashBoard).
+        '''
+        t0 = time.time()
+        while not self.__connection.isConnected():
+            if time.time()-t0 > DEFAULT_TIMEOUT:
+                self._logger.error('Could not send command, not connected!')
+                return False
+            time.sleep(0.01)
+        with self.__dataEvent:
+            if not self.__connection.write(bytes(cmd, 'utf-8')):
+                self._logger.error('Could not send command!')
+                return False
+            self.__dataEvent.wait(URBasic.dashboard.DEFAULT_TIMEOUT)
+        return True
+
+    def dbs_is_running(self):
+        '''
+        Return True if Dash Board server is running
+        '''
+        return self.__connection.isConnected()
+
+    def wait_dbs(self, timeout=URBasic.dashboard.DEFAULT_TIMEOUT):
+        '''Wait for the next message from the dashboard server.'''
+        with self.__dataEvent:
+            return self.__dataEvent.wait(timeout)
+
+    def close(self):
+        '''
+        Close the DashBoard connection.
+        '''
+        self.__connection.close()
+        with self.__dataEvent:
+            self.__dataEvent.notify_all()
+        return True
+
+
+class ReactorLineConnection(ReactorConnection):
+    '''
+    Connection of a line based text protocol (e.g. the dashboard server), calling onLine
+    with each received line without the line ending.
+    '''
+
+    def __init__(self, reactor, host, port, onLine, **kwargs):
+        ReactorConnection.__init__(self, reactor, host, port, **kwargs)
+        self.__onLine = onLine
+        self.__buffer = bytearray(4096)
+        self.__pending = bytearray()
+
+    def getBuffer(self):
+        return memoryview(self.__buffer)
+
+    def onConnected(self):
+        self.__pending = bytearray()
+        self.resetBackoff()
+
+    def onData(self, nbytes):
+        self.__pending += self.__buffer[:nbytes]
+        while True:
+            end = self.__pending.find(b'\n')
+            if end < 0:
+                break
+            line = self.__pending[:end].decode('utf-8', 'replace').rstrip('\r')
+            del self.__pending[:end+1]
+            self.__onLine(line)
+
+
+class ReactorRealTimeClient(URBasic.realTimeClient.RealTimeClient):
+    '''
+    Real Time Client interface served by a Reactor, with the API of URBasic.realTimeClient.RealTimeClient.
+    Only the transport of RealTimeClient is replaced. The state data send by the controller on
+    the real time port is read and dropped by the reactor, so the socket buffers never fill up.
+
+    Input parameters:
+    reactor (Reactor): The reactor serving the connection
+    robotModel (RobotModel): The robot model, robotModel.ipAddress is the host
+    rtde (ReactorRTDE): [Optional] RTDE interface used to react on program status changes
+    '''
+
+    def __init__(self, reactor, robotModel, rtde=None):
+        '''
+        Constructor see class description for more info.
+        '''
+        self.__robotModel = robotModel
+        self.__connection = ReactorStateConnection(reactor, robotModel.ipAddress, 30003, robotModel)
+        self.__connection.open()
+        logger = URBasic.dataLogging.DataLogging()
+        name = logger.AddEventLogging(__name__, log2Consol=False,level = URBasic.logging.INFO)
+        self.__logger = logger.__dict__[name]
+        URBasic.realTimeClient.RealTimeClient.__init__(self, robotModel, rtde)
+
+    def _connect(self):
+        '''
+        Wait for the reactor to connect (replaces the transport of RealTimeClient).
+        '''
+        t0 = time.time()
+        while not self.__connection.isConnected():
+            if time.time()-t0 > URBasic.realTimeClient.DEFAULT_TIMEOUT:
+                return False
+            time.sleep(0.01)
+        self.__robotModel.rtcConnectionState = ConnectionState.CONNECTED
+        return True
+
+    def _sendPrg(self, prg):
+        '''
+        Send a program through the reactor (replaces the transport of RealTimeClient).
+        '''
+        self.__robotModel.forceRemoteActiveFlag = False
+        if self.__robotModel.stopRunningFlag or not self._connect() or not self.__connection.write(prg.encode()):
+            self.__robotModel.rtcProgramRunning = False
+            self.__logger.error('Program re-sending timed out - Could not send program!')
+            return
+        self.__logger.info('Program send to Robot:\n' + prg)
+        time.sleep(0.1)
+
+    def Disconnect(self):
+        '''
+        Disconnect the RT Client connection.
+        '''
+        self.__connection.close()
+        self.__robotModel.rtcConnectionState = ConnectionState.DISCONNECTED
+        return True
+
+
+class ReactorStateConnection(ReactorConnection):
+    '''
+    Connection to a controller port streaming state data that is not used (e.g. the real time port),
+    the data is dropped and the connection state is mirrored to robotModel.rtcConnectionState.
+    '''
+
+    def __init__(self, reactor, host, port, robotModel, **kwargs):
+        ReactorConnection.__init__(self, reactor, host, port, **kwargs)
+        self.__robotModel = robotModel
+        self.bytesDropped = 0
+
+    def onConnected(self):
+        self.__robotModel.rtcConnectionState = ConnectionState.CONNECTED
+        self.resetBackoff()
+
+    def onData(self, nbytes):
+        self.bytesDropped += nbytes
+
+    def onDisconnected(self):
+        self.__robotModel.rtcConnectionState = ConnectionState.DISCONNECTED
@@ -57,6 +57,7 @@ class RealTimeClient(object):
     host (string):  hostname or IP of UR Robot (RT CLient server)
     conf_filename (string):  Path to xml file describing what channels to activate
     logger (URBasis_DataLogging obj): A instance if a logger object if common logging is needed.
+    rtde (URBasic.rtde.RTDE): [Optional] RTDE interface used to react on program status changes within one RTDE cycle
 
     
     Example:
@@ -65,13 +66,14 @@ class RealTimeClient(object):
     '''
 
 
-    def __init__(self, robotModel):
+    def __init__(self, robotModel, rtde=None):
         '''
         Constructor see class description for more info.
         '''
         if(False):
             assert isinstance(robotModel, URBasic.robotModel.RobotModel)  ### This line is to get code completion for RobotModel
         self.__robotModel = robotModel
+        self.__rtde = rtde
 
         logger = URBasic.dataLogging.DataLogging()
         name = logger.AddEventLogging(__name__, log2Consol=False,level = URBasic.logging.INFO)        
@@ -80,14 +82,15 @@ class RealTimeClient(object):
         self.__reconnectTimeout = 60
         self.__sock = None
         self.__thread = None
-        if self.__connect():
+        if self._connect():
             self.__logger.info('RT_CLient constructor done')
         else:
             self.__logger.info('RT_CLient constructor done but not connected')
         
-    def __connect(self):
+    def _connect(self):
         '''
         Initialize RT Client connection to host .
+        Transport hook, replaced by subclasses with another transport (e.g. URBasic.reactor.ReactorRealTimeClient).
         
         Return value:
         success (boolean)
@@ -163,7 +166,7 @@ class RealTimeClient(object):
         rob.disconnect()        
         '''
         if not self.IsRtcConnected():
-            if not self.__connect():
+            if not self._connect():
                 self.__logger.error('SendProgram: Not connected to robot')
  
         if self.__robotModel.stopRunningFlag:
@@ -184,7 +187,7 @@ class RealTimeClient(object):
         self.__robotModel.rtcProgramExecutionError = False
         
         #Send and wait from program
-        self.__sendPrg(self.__AddStatusBit2Prog(prg))        
+        self._sendPrg(self.__AddStatusBit2Prog(prg))        
         self.__thread = threading.Thread(target=self.__waitForProgram2Finish, kwargs={'prg': prg})
         self.__thread.start()
         #self.__waitForProgram2Finish(prg)
@@ -208,7 +211,7 @@ class RealTimeClient(object):
         rob.disconnect()        
         '''
         if not self.IsRtcConnected():
-            if not self.__connect():
+            if not self._connect():
                 self.__logger.error('SendProgram: Not connected to robot')
         if self.__robotModel.stopRunningFlag:
             self.__logger.info('SendProgram: Send command aborted due to stopRunningFlag')
@@ -219,7 +222,7 @@ class RealTimeClient(object):
         self.__robotModel.rtcProgramExecutionError = False
         
         #Send
-        self.__sendPrg(prg)      
+        self._sendPrg(prg)      
         self.__robotModel.rtcProgramRunning = False
 
     def __AddStatusBit2Prog(self,prg):
@@ -246,9 +249,10 @@ class RealTimeClient(object):
             prg = 'def script():\n  write_output_boolean_register(0, True)\n  ' + prg + '\n  write_output_boolean_register(1, True)\nend\n'
         return prg
         
-    def __sendPrg(self,prg):
+    def _sendPrg(self,prg):
         '''
         Sending program str via socket
+        Transport hook, replaced by subclasses with another transport (e.g. URBasic.reactor.ReactorRealTimeClient).
         '''
         programSend = False      
         self.__robotModel.forceRemoteActiveFlag = False
@@ -263,7 +267,7 @@ class RealTimeClient(object):
                 self.__sock = None
                 self.__robotModel.rtcConnectionState = ConnectionState.ERROR
                 self.__logger.warning('Could not send program!')
-                self.__connect()                
+                self._connect()                
         if not programSend:
             self.__robotModel.rtcProgramRunning = False
             self.__logger.error('Program re-sending timed out - Could not send program!')
@@ -274,37 +278,50 @@ class RealTimeClient(object):
         '''
         waiting for program to finish
         '''
-        waitForProgramStart = len(prg)/50
-        notrun = 0
+        #Time limits in seconds, the loop may wake up more often than every 50ms
+        waitForProgramStart = len(prg)/1000.
+        waitForProgramStopped = 0.5
+        notRunSince = time.monotonic()
         prgRest = 'def resetRegister():\n  write_output_boolean_register(0, False)\n  write_output_boolean_register(1, False)\nend\n'
+        statusChanged = None
+        if self.__rtde is not None:
+            statusChanged = self.__rtde.subscribe(URBasic.rtde.RTDESubscription.changed(['output_bit_registers0_to_31', 'robot_status_bits', 'safety_status_bits']), once=False)
         while not self.__robotModel.stopRunningFlag and self.__robotModel.rtcProgramRunning:            
+            if statusChanged is not None:
+                #Cleared before reading the model, so a change arriving while reading wakes up the wait below
+                statusChanged.event.clear()
+            outputBits = self.__robotModel.OutputBitRegister()
             if self.__robotModel.SafetyStatus().StoppedDueToSafety:
                 self.__robotModel.rtcProgramRunning = False
                 self.__robotModel.rtcProgramExecutionError = True
                 self.__logger.error('SendProgram: Safety Stop')
-            elif self.__robotModel.OutputBitRegister()[0] == False:
+            elif outputBits[0] == False:
                 self.__logger.debug('sendProgram: Program not started')
-                notrun += 1
-                if notrun > waitForProgramStart:
+                if time.monotonic() - notRunSince > waitForProgramStart:
                     self.__robotModel.rtcProgramRunning = False
                     self.__logger.error('sendProgram: Program not able to run')
-            elif self.__robotModel.OutputBitRegister()[0] == True and self.__robotModel.OutputBitRegister()[1] == True:
+            elif outputBits[0] == True and outputBits[1] == True:
                 self.__robotModel.rtcProgramRunning = False
                 self.__logger.info('sendProgram: Finished')
-            elif self.__robotModel.OutputBitRegister()[0] == True:
+            elif outputBits[0] == True:
                 if self.__robotModel.RobotStatus().ProgramRunning:
                     self.__logger.debug('sendProgram: UR running')
-                    notrun = 0
+                    notRunSince = time.monotonic()
                 else:
-                    notrun += 1
-                    if notrun>10:
+                    if time.monotonic() - notRunSince > waitForProgramStopped:
                         self.__robotModel.rtcProgramRunning = False
                         self.__robotModel.rtcProgramExecutionError = True
                         self.__logger.error('SendProgram: Program Stopped but not finiched!!!')    
             else:
                 self.__robotModel.rtcProgramRunning = False
                 self.__logger.error('SendProgram: Unknown error')
-            time.sleep(0.05)
-        self.__sendPrg(prgRest)
+            if statusChanged is None:
+                time.sleep(0.05)
+            else:
+                #Wake up on the first RTDE package with changed status, at latest after 50ms
+                statusChanged.event.wait(0.05)
+        if statusChanged is not None:
+            self.__rtde.unsubscribe(statusChanged)
+        self._sendPrg(prgRest)
         self.__robotModel.rtcProgramRunning = False
         
\ No newline at end of file
@@ -33,11 +33,16 @@ class RobotConnector(object):
     Class to hold all connection to the Universal Robot and plus devises  
          
     Input parameters:
+    robotModel (RobotModel): The robot model
+    host (str): Hostname or IP of the robot
+    hasForceTorque (bool): Connect to a Robotiq FT sensor
+    reactor (URBasic.reactor.Reactor): [Optional] Serve all connections from this reactor thread
+                                       (shared by many robots) instead of a thread per connection
 
     '''
 
 
-    def __init__(self,robotModel, host, hasForceTorque=False):
+    def __init__(self,robotModel, host, hasForceTorque=False, reactor=None):
         '''
         Constructor see class description for more info.
         '''
@@ -46,13 +51,26 @@ class RobotConnector(object):
         self.RobotModel = robotModel
         self.RobotModel.ipAddress = host
         self.RobotModel.hasForceTorqueSensor = hasForceTorque
-        self.RealTimeClient = URBasic.realTimeClient.RealTimeClient(robotModel)
-        self.DataLog = URBasic.dataLog.DataLog(robotModel)
-        self.RTDE = URBasic.rtde.RTDE(robotModel)
-        self.DashboardClient = URBasic.dashboard.DashBoard(robotModel)
+        self.__reactor = reactor
+        self.__dataLogTimer = None
         self.ForceTourqe = None
-        if hasForceTorque:
-            self.ForceTourqe = URplus.forceTorqueSensor.ForceTorqueSensor(robotModel)
+        if reactor is None:
+            self.RTDE = URBasic.rtde.RTDE(robotModel)
+            self.RealTimeClient = URBasic.realTimeClient.RealTimeClient(robotModel, self.RTDE)
+            self.DataLog = URBasic.dataLog.DataLog(robotModel)
+            self.DashboardClient = URBasic.dashboard.DashBoard(robotModel)
+            if hasForceTorque:
+                import URplus
+                self.ForceTourqe = URplus.forceTorqueSensor.ForceTorqueSensor(robotModel)
+        else:
+            self.RTDE = URBasic.reactor.ReactorRTDE(reactor, robotModel)
+            self.RealTimeClient = URBasic.reactor.ReactorRealTimeClient(reactor, robotModel, self.RTDE)
+            self.DataLog = URBasic.dataLog.DataLog(robotModel, start=False)
+            self.__dataLogTimer = reactor.callEvery(0.005, self.DataLog.poll)
+            self.DashboardClient = URBasic.reactor.ReactorDashBoard(reactor, robotModel)
+            if hasForceTorque:
+                import URplus
+                self.ForceTourqe = URplus.forceTorqueSensor.ReactorForceTorqueSensor(reactor, robotModel)
         
         logger = URBasic.dataLogging.DataLogging()        
         name = logger.AddEventLogging(__name__)        
@@ -61,6 +79,8 @@ class RobotConnector(object):
 
 
     def close(self):
+        if self.__reactor is not None:
+            self.__reactor.cancel(self.__dataLogTimer)
         self.DataLog.close()
         self.RTDE.close()
         self.RealTimeClient.Disconnect()
@@ -26,6 +26,9 @@ __copyright__ = "Copyright 2017, Rope Robotics ApS, Denmark"
 __license__ = "MIT License"
 
 import URBasic
+import collections.abc
+import numpy as np
+from URBasic.derivedChannels import DerivedChannels
 
 class RobotModel(object):
     '''
@@ -49,7 +52,7 @@ class RobotModel(object):
         self.password = None
         self.ipAddress = None
         
-        self.dataDir = {'timestamp':None,
+        self.dataDir = DataDirectory({'timestamp':None,
                          'target_q':None,
                          'target_q':None,
                          'target_qd':None,
@@ -152,7 +155,11 @@ class RobotModel(object):
                          'output_double_register_23':None,
                          'urPlus_force_torque_sensor':None,
                          'urPlus_totalMovedVerticalDistance':None
-                         }
+                         })
+        self.dataDir.usedKeys = set()
+        self.__snapshot = None
+        self.__tracking = False
+        self.derivedChannels = DerivedChannels()
                             
         
         self.rtcConnectionState = None
@@ -164,8 +171,90 @@ class RobotModel(object):
         # UR plus content
         self.hasForceTorqueSensor = False
         self.forceTourqe = None
+
+    def trackUsage(self, enable=True):
+        '''
+        Start or stop recording which fields of dataDir are read, both directly and through
+        the accessor functions of the model. Starting clears the recorded fields.
+        Reading is slightly slower while recording.
+
+        Input parameters:
+        enable (bool): True to start recording, False to stop
+
+        Example:
+        robotModel.trackUsage()
+        ... run the application ...
+        robotModel.trackUsage(False)
+        print(robotModel.usedFields())
+        '''
+        if enable:
+            self.dataDir.usedKeys = set()
+            self.dataDir.__class__ = TrackedDataDirectory
+        else:
+            self.dataDir.__class__ = DataDirectory
+        self.__tracking = enable
+
+    def usedFields(self):
+        '''
+        Return the set of dataDir fields read while recording, see trackUsage.
+        '''
+        return set(self.dataDir.usedKeys)
+
+    def snapshot(self):
+        '''
+        Return the values of the latest RTDE output package as one immutable object (RobotSnapshot).
+        The receive thread publishes a new snapshot per package with a single reference swap,
+        so all fields read from a snapshot are from the same package, unlike reading dataDir
+        field by field while it is updated. The accessor functions of the model read from
+        the snapshot.
+
+        Return value:
+        snapshot (RobotSnapshot or None before the first package)
+
+        Example:
+        snapshot = robotModel.snapshot()
+        pose, force = snapshot['actual_TCP_pose'], snapshot['actual_TCP_force']
+        '''
+        snapshot = self.__snapshot
+        if self.__tracking and snapshot is not None:
+            return TrackedSnapshot(snapshot, self.dataDir.usedKeys)
+        return snapshot
+
+    def publish(self, snapshot):
+        '''
+        Publish the snapshot of a new package, see snapshot. Called by the receive thread.
+
+        Input parameters:
+        snapshot (RobotSnapshot)
+        '''
+        self.__snapshot = snapshot
+        self.dataDir.snapshot = snapshot
+
+    def __data(self):
+        '''
+        Return the latest snapshot, or dataDir before the first package.
+        '''
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return self.dataDir
+        return snapshot
+
+    def __value(self, name):
+        '''
+        Return the latest value of a field, vectors as a writable copy so the published snapshot is not changed.
+        '''
+        return writable(self.__data().get(name))
+
+    def __derived(self, name, function):
+        '''
+        Return a value derived from the latest package, computed once per package, see RobotSnapshot.derived
+        '''
+        data = self.__data()
+        if isinstance(data, RobotSnapshot):
+            return data.derived(name, function)
+        return function(data)
         
-    def RobotTimestamp(self):return self.dataDir['timestamp']
+    def RobotTimestamp(self):return self.__value('timestamp')
     def LastUpdateTimestamp(self):raise NotImplementedError('Function Not yet implemented')
     def RTDEConnectionState(self):raise NotImplementedError('Function Not yet implemented')
     def RuntimeState(self): return self.rtcProgramRunning
@@ -173,33 +262,33 @@ class RobotModel(object):
     def DigitalInputbits(self,n):
         if n>=0 & n<8:
             n = pow(2,n)
-            return n&self.dataDir['actual_digital_input_bits']==n
+            return n&self.__value('actual_digital_input_bits')==n
         else:
             return None
         
     def ConfigurableInputBits(self,n):
         if n>=8 & n<16:
             n = pow(2,n+8)
-            return n&self.dataDir['actual_digital_input_bits']==n
+            return n&self.__value('actual_digital_input_bits')==n
         else:
             return None
     
     def DigitalOutputBits(self,n):
         if n>=0 & n<8:
             n = pow(2,n)
-            return n&self.dataDir['actual_digital_output_bits']==n
+            return n&self.__value('actual_digital_output_bits')==n
         else:
             return None
     
     def ConfigurableOutputBits(self,n):
         if n>=8 & n<16:
             n = pow(2,n+8)
-            return n&self.dataDir['actual_digital_output_bits']==n
+            return n&self.__value('actual_digital_output_bits')==n
         else:
             return None
     
     def RTDEProtocolVersion(self):raise NotImplementedError('Function Not yet implemented')
-    def ActualTCPPose(self):return self.dataDir['actual_TCP_pose']
+    def ActualTCPPose(self):return self.__value('actual_TCP_pose')
     def RobotModee(self):raise NotImplementedError('Function Not yet implemented')
     def SafetyMode(self):raise NotImplementedError('Function Not yet implemented')
     def TargetQ(self):raise NotImplementedError('Function Not yet implemented')
@@ -207,7 +296,7 @@ class RobotModel(object):
     def TargetQDD(self):raise NotImplementedError('Function Not yet implemented')
     def TargetCurrent(self):raise NotImplementedError('Function Not yet implemented')
     def TargetMoment(self):raise NotImplementedError('Function Not yet implemented')     
-    def ActualQ(self):return self.dataDir['actual_q']
+    def ActualQ(self):return self.__value('actual_q')
     def ActualQD(self):raise NotImplementedError('Function Not yet implemented')
     def ActualCurrent(self):raise NotImplementedError('Function Not yet implemented')
     def JointControlOutput(self):raise NotImplementedError('Function Not yet implemented')
@@ -234,9 +323,9 @@ class RobotModel(object):
     def ToolOutputVoltage(self):raise NotImplementedError('Function Not yet implemented')
     def StandardAnalogInput(self,n):
         if n == 0:
-            return self.dataDir['standard_analog_input0']
+            return self.__value('standard_analog_input0')
         elif n == 1:
-            return self.dataDir['standard_analog_input1']
+            return self.__value('standard_analog_input1')
         else:
             raise KeyError('Index out of range')
 
@@ -245,53 +334,259 @@ class RobotModel(object):
     def RobotStatus(self):
         '''
         SafetyStatusBit class defined in the bottom of this file
+        The status is decoded once per package and shared by all callers, do not modify it.
         '''
-        result = RobotStatusBit()
-        result.PowerOn            =  1&self.dataDir['robot_status_bits']==1
-        result.ProgramRunning     =  2&self.dataDir['robot_status_bits']==2
-        result.TeachButtonPressed =  4&self.dataDir['robot_status_bits']==4
-        result.PowerButtonPressed =  8&self.dataDir['robot_status_bits']==8
-        return result
+        return self.__derived('RobotStatus', robotStatus)
     
     def SafetyStatus(self):
         '''
         SafetyStatusBit class defined in the bottom of this file
+        The status is decoded once per package and shared by all callers, do not modify it.
         '''
-        result = SafetyStatusBit()
-        result.NormalMode             =     1&self.dataDir['safety_status_bits']==1
-        result.ReducedMode            =     2&self.dataDir['safety_status_bits']==2
-        result.ProtectiveStopped      =     4&self.dataDir['safety_status_bits']==4
-        result.RecoveryMode           =     8&self.dataDir['safety_status_bits']==8
-        result.SafeguardStopped       =    16&self.dataDir['safety_status_bits']==16
-        result.SystemEmergencyStopped =    32&self.dataDir['safety_status_bits']==32
-        result.RobotEmergencyStopped  =    64&self.dataDir['safety_status_bits']==64
-        result.EmergencyStopped       =   128&self.dataDir['safety_status_bits']==128
-        result.Violation              =   256&self.dataDir['safety_status_bits']==256
-        result.Fault                  =   512&self.dataDir['safety_status_bits']==512
-        result.StoppedDueToSafety     =  1024&self.dataDir['safety_status_bits']==1024
-        return result
+        return self.__derived('SafetyStatus', safetyStatus)
     
     def TcpForceScalar(self):raise NotImplementedError('Function Not yet implemented')
     
     def OutputBitRegister(self):
-        result = [None]*64
-        for ii in range(64):
-            if ii<32 and self.dataDir['output_bit_registers0_to_31'] is not None:
-                result[ii] = 2**(ii)&self.dataDir['output_bit_registers0_to_31']==2**(ii)
-            elif ii>31 and self.dataDir['output_bit_registers32_to_63'] is not None:
-                result[ii] = 2**(ii-32)&self.dataDir['output_bit_registers32_to_63']==2**(ii-32)
-        return result
+        '''
+        Return the 64 output bit registers as a tuple of bool, None where the register is not received.
+        The registers are decoded once per package.
+        '''
+        return self.__derived('OutputBitRegister', outputBitRegister)
     
     def OutputDoubleRegister(self):raise NotImplementedError('Function Not yet implemented')
     def UrControlVersion(self):raise NotImplementedError('Function Not yet implemented')
     def ClearToSend(self):raise NotImplementedError('Function Not yet implemented')
 
 
+def writable(value):
+    '''
+    Return value, numpy arrays (e.g. the read only vectors of a RobotSnapshot) as a writable copy.
+    '''
+    if type(value) is np.ndarray:
+        return value.copy()
+    return value
+
+class DataDirectory(dict):
+    '''
+    Dictionary holding the data of the robot model (RobotModel.dataDir).
+
+    The fields of the latest RTDE output package are read from the published snapshot
+    (see RobotModel.snapshot), so the receive thread does not copy the package into the
+    dictionary. Vector values are returned as writable copies. Fields set in the dictionary
+    (e.g. by URplus devices) are read as stored, unless the package has a field of the same name.
+    '''
+    #Latest published RobotSnapshot, set by RobotModel.publish
+    snapshot = None
+
+    def __getitem__(self, key):
+        snapshot = self.snapshot
+        if snapshot is not None:
+            try:
+                return writable(snapshot[key])
+            except KeyError:
+                pass
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        snapshot = self.snapshot
+        return dict.__contains__(self, key) or (snapshot is not None and key in snapshot)
+
+    def __iter__(self):
+        snapshot = self.snapshot
+        for key in dict.__iter__(self):
+            yield key
+        if snapshot is not None:
+            for key in snapshot:
+                if not dict.__contains__(self, key):
+                    yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def keys(self):
+        return [key for key in self]
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def copy(self):
+        data = dict(dict.items(self))
+        snapshot = self.snapshot
+        if snapshot is not None:
+            for (key, value) in snapshot.copy().items():
+                data[key] = writable(value)
+        return data
+
+class TrackedDataDirectory(DataDirectory):
+    '''
+    DataDirectory recording the keys read into usedKeys, see RobotModel.trackUsage.
+    '''
+    def __getitem__(self, key):
+        self.usedKeys.add(key)
+        return DataDirectory.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        self.usedKeys.add(key)
+        return DataDirectory.get(self, key, default)
+
+class RobotSnapshot(collections.abc.Mapping):
+    '''
+    Immutable values of one RTDE output package, see RobotModel.snapshot.
+    Read like a dictionary of field name and value, e.g. snapshot['actual_q'].
+    Vector values are read only numpy arrays, dataDir and the accessor functions of RobotModel return writable copies.
+
+    Input parameters:
+    values (dict): Field values of the package, must not be changed after creating the snapshot
+    sequence (int): Sequence number of the package, see RTDE.sampleSequence
+    '''
+    __slots__ = ['_RobotSnapshot__values', '_RobotSnapshot__derived', 'sequence', 'timestamp']
+
+    def __init__(self, values, sequence):
+        object.__setattr__(self, '_RobotSnapshot__values', values)
+        object.__setattr__(self, '_RobotSnapshot__derived', {})
+        object.__setattr__(self, 'sequence', sequence)
+        object.__setattr__(self, 'timestamp', values.get('timestamp'))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('RobotSnapshot is immutable')
+
+    def __getitem__(self, key):
+        return self.__values[key]
+
+    def __iter__(self):
+        return iter(self.__values)
+
+    def __len__(self):
+        return len(self.__values)
+
+    def __contains__(self, key):
+        return key in self.__values
+
+    def get(self, key, default=None):
+        return self.__values.get(key, default)
+
+    def copy(self):
+        '''
+        Return the values of the package as a new dictionary, vectors are read only numpy arrays.
+        '''
+        return self.__values.copy()
+
+    def derived(self, name, function):
+        '''
+        Return a value derived from the package, computed by function(snapshot) the first time
+        it is requested and cached in the snapshot, so it is computed at most once per package.
+
+        Input parameters:
+        name (str): Name of the derived value
+        function (function): function(snapshot) computing the value
+
+        Example:
+        status = snapshot.derived('RobotStatus', URBasic.robotModel.robotStatus)
+        '''
+        try:
+            return self.__derived[name]
+        except KeyError:
+            value = function(self)
+            self.__derived[name] = value
+            return value
+
+class TrackedSnapshot(RobotSnapshot):
+    '''
+    RobotSnapshot recording the keys read into usedKeys, see RobotModel.trackUsage.
+    '''
+    __slots__ = ['usedKeys']
+
+    def __init__(self, snapshot, usedKeys):
+        RobotSnapshot.__init__(self, snapshot._RobotSnapshot__values, snapshot.sequence)
+        object.__setattr__(self, 'usedKeys', usedKeys)
+
+    def __getitem__(self, key):
+        self.usedKeys.add(key)
+        return RobotSnapshot.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        self.usedKeys.add(key)
+        return RobotSnapshot.get(self, key, default)
+
+#Integer bit fields decoded together by statusBits
+STATUS_WORDS = ('robot_status_bits', 'safety_status_bits', 'output_bit_registers0_to_31', 'output_bit_registers32_to_63')
+
+def unpackBits(values):
+    '''
+    Return the bits of integer fields as a numpy bool array with a row of 64 bits per value, bit 0 first.
+
+    Input parameters:
+    values (list<int>): Values of bit fields, e.g. robot_status_bits
+    '''
+    return np.unpackbits(np.array(values, '<u8').view(np.uint8), bitorder='little').reshape(-1, 64).view(bool)
+
+def statusBits(data):
+    '''
+    Decode the STATUS_WORDS fields of a package (snapshot or dataDir) with one unpackBits call.
+
+    Return value:
+    bits (dict): Field name and list of 64 bool, None if the field is not received
+    '''
+    values = [data.get(name) for name in STATUS_WORDS]
+    rows = unpackBits([0 if value is None else int(value) for value in values]).tolist()
+    return dict((STATUS_WORDS[ii], None if values[ii] is None else rows[ii]) for ii in range(len(STATUS_WORDS)))
+
+def __statusBits(data):
+    if isinstance(data, RobotSnapshot):
+        return data.derived('statusBits', statusBits)
+    return statusBits(data)
+
+def outputBitRegister(data):
+    '''
+    Decode the 64 output bit registers of a package (snapshot or dataDir), see RobotModel.OutputBitRegister
+    '''
+    bits = __statusBits(data)
+    result = [None]*64
+    if bits['output_bit_registers0_to_31'] is not None:
+        result[0:32] = bits['output_bit_registers0_to_31'][0:32]
+    if bits['output_bit_registers32_to_63'] is not None:
+        result[32:64] = bits['output_bit_registers32_to_63'][0:32]
+    return tuple(result)
+
+def robotStatus(data):
+    '''
+    Decode robot_status_bits of a package (snapshot or dataDir), see RobotModel.RobotStatus
+    '''
+    result = RobotStatusBit()
+    bits = __statusBits(data)['robot_status_bits']
+    if bits is not None:
+        for ii in range(len(RobotStatusBit.BITS)):
+            setattr(result, RobotStatusBit.BITS[ii], bits[ii])
+    return result
+
+def safetyStatus(data):
+    '''
+    Decode safety_status_bits of a package (snapshot or dataDir), see RobotModel.SafetyStatus
+    '''
+    result = SafetyStatusBit()
+    bits = __statusBits(data)['safety_status_bits']
+    if bits is not None:
+        for ii in range(len(SafetyStatusBit.BITS)):
+            setattr(result, SafetyStatusBit.BITS[ii], bits[ii])
+    return result
+
 class RobotStatusBit(object):
     PowerOn = None
     ProgramRunning = None
     TeachButtonPressed = None
     PowerButtonPressed = None
+    #Attribute of each bit of robot_status_bits, bit 0 first
+    BITS = ('PowerOn', 'ProgramRunning', 'TeachButtonPressed', 'PowerButtonPressed')
 
 class SafetyStatusBit(object):
     NormalMode = None
@@ -305,4 +600,8 @@ class SafetyStatusBit(object):
     Violation = None
     Fault = None
     StoppedDueToSafety = None
+    #Attribute of each bit of safety_status_bits, bit 0 first
+    BITS = ('NormalMode', 'ReducedMode', 'ProtectiveStopped', 'RecoveryMode', 'SafeguardStopped',
+            'SystemEmergencyStopped', 'RobotEmergencyStopped', 'EmergencyStopped', 'Violation',
+            'Fault', 'StoppedDueToSafety')
     
\ No newline at end of file
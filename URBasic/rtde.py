@@ -31,9 +31,18 @@ import socket
 import struct
 import select
 import numpy as np
-import xml.etree.ElementTree as ET
 import time
 import os.path
+import sys
+import concurrent.futures
+import collections
+import collections.abc
+import errno
+import random
+from URBasic.configuration import RTDEConfiguration, LogConfiguration, MAX_FIELDS
+from URBasic.columnLog import ColumnLog
+from URBasic.rtdeMetrics import RTDEMetrics
+from URBasic.sharedRobotModel import RTDESharedMemory
 
 DEFAULT_TIMEOUT = 1.0
 
@@ -55,148 +64,574 @@ class ConnectionState:
     PAUSED = 3
     STARTED = 4
 
-class RTDE(threading.Thread): #, metaclass=Singleton
+class RTDEFrameBuffer(object):
     '''
-    Interface to UR robot Real Time Data Exchange interface.
-    See this site for more detail:
-    http://www.universal-robots.com/how-tos-and-faqs/how-to/ur-how-tos/real-time-data-exchange-rtde-guide-22229/
+    Receive buffer framing the RTDE byte stream into packages.
 
-    The constructor takes a UR robot hostname as input and a path to a RTDE configuration file.
+    Data is read from the socket with recv_into directly into a preallocated bytearray,
+    and each package is handed out as a memoryview of that buffer, so no bytes objects
+    are created for the packages. A partial package at the end of a read is kept and
+    completed by the following read(s) instead of being thrown away.
+
+    The payload memoryviews are only valid until the next call to recv.
+
+    The counters allocations and copies count buffer allocations and byte moves
+    (compaction of a carried over partial package), so it can be verified that
+    the receive path does not allocate or copy per package.
 
     Input parameters:
-    host (string):  Hostname or IP of UR Robot (RT CLient server)
-    conf_filename (string):  Path to xml file describing what channels to activate
-    logger (URBasis_DataLogging obj): A instance if a logger object if common logging is needed.
+    size (int): Initial buffer size in bytes (minimum 2 times the max RTDE package size)
+    '''
+    HEADER = struct.Struct('>HB')
+    MAX_PACKAGE_SIZE = 65535
+
+    def __init__(self, size=131072):
+        size = max(size, 2*(self.MAX_PACKAGE_SIZE+1))
+        self.__buffer = bytearray(size)
+        self.__view = memoryview(self.__buffer)
+        self.__start = 0
+        self.__end = 0
+        self.allocations = 1
+        self.copies = 0
+        self.bytesCopied = 0
+        self.reads = 0
+        self.bytesReceived = 0
+        self.packages = 0
+        self.carriedOver = 0
+        self.discarded = 0
+
+    def clear(self):
+        '''
+        Drop all buffered data, e.g. after a reconnect.
+        '''
+        self.__start = 0
+        self.__end = 0
+
+    def pending(self):
+        '''
+        Return the number of buffered bytes not yet returned as a package.
+        '''
+        return self.__end - self.__start
+
+    def getBuffer(self):
+        '''
+        Return the free part of the buffer as a writable memoryview, to be filled by
+        the caller and committed with commit (used by e.g. asyncio.BufferedProtocol).
+        A partial package is moved to the front first if needed, so there is always room
+        for a full package.
+        '''
+        if self.__start == self.__end:
+            self.__start = 0
+            self.__end = 0
+        elif len(self.__buffer) - self.__end <= self.MAX_PACKAGE_SIZE:
+            #Move the partial package to the front, so a full package always fits behind it
+            pending = self.__end - self.__start
+            self.__view[0:pending] = self.__view[self.__start:self.__end]
+            self.__start = 0
+            self.__end = pending
+            self.copies += 1
+            self.bytesCopied += pending
+        return self.__view[self.__end:]
+
+    def commit(self, received):
+        '''
+        Commit the number of bytes written into the memoryview returned by getBuffer.
+        '''
+        self.__end += received
+        self.reads += 1
+        self.bytesReceived += received
+
+    def recv(self, sock):
+        '''
+        Read available data from the socket into the buffer.
+
+        Return value:
+        received (int): number of bytes read, 0 if the connection was closed by the peer
+        '''
+        received = sock.recv_into(self.getBuffer())
+        self.commit(received)
+        return received
+
+    def frames(self):
+        '''
+        Generator returning all complete packages in the buffer.
+        A trailing partial package is left in the buffer for the next read.
+
+        Return values:
+        command (int): RTDE package type
+        payload (memoryview): package payload without the 3 byte header
+        '''
+        header = self.HEADER
+        while self.__end - self.__start >= header.size:
+            (packet_size, packet_command) = header.unpack_from(self.__buffer, self.__start)
+            if packet_size < header.size:
+                #Not a valid package, the stream can not be resynchronised
+                self.discarded += self.__end - self.__start
+                self.clear()
+                return
+            if self.__end - self.__start < packet_size:
+                self.carriedOver += 1
+                return
+            payloadStart = self.__start + header.size
+            self.__start += packet_size
+            self.packages += 1
+            yield packet_command, self.__view[payloadStart:self.__start]
+
+    def stats(self):
+        '''
+        Return the buffer counters as a dictionary.
+        '''
+        return {'allocations':self.allocations,
+                'copies':self.copies,
+                'bytesCopied':self.bytesCopied,
+                'reads':self.reads,
+                'bytesReceived':self.bytesReceived,
+                'packages':self.packages,
+                'carriedOver':self.carriedOver,
+                'discarded':self.discarded,
+                'pending':self.pending(),
+                'bufferSize':len(self.__buffer)}
+
+
+class RTDERecorder(object):
+    '''
+    Append-only recording of the raw RTDE packages in both directions, recipe negotiation included,
+    for offline replay with URBasic.rtdeReplay.ReplayRTDE.
+
+    Two files are written:
+    filename: The packages (header and payload) as received from and send to the controller
+    filename + '.idx': Header (MAGIC) followed by one index entry (INDEX) per package with the
+                       offset of the package in filename, the local receive/send time and the direction
+
+    Input parameters:
+    filename (str): Path of the recording, existing files are appended
 
     Example:
-    import URBasic
-    import time
-    RobotModel = URBasic.robotModel.RobotModel()
-    RobotModel.ipAddress = '192.168.56.101'
-    rob = URBasic.rtde.RTDE(RobotModel)
-    time.sleep(10)
-    rob.close()
+    rob = URBasic.rtde.RTDE(robotModel, recordFile='incident.rtde')
     '''
+    MAGIC = b'URRTDEI1'
+    INDEX = struct.Struct('>QdB')
+    RECEIVED = 0
+    SENT = 1
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.__lock = threading.Lock()
+        self.__data = open(filename, 'ab')
+        self.__index = open(filename + '.idx', 'ab')
+        if self.__index.tell() == 0:
+            self.__index.write(self.MAGIC)
+        self.__offset = self.__data.tell()
+        self.packages = 0
+
+    def record(self, direction, command, payload):
+        '''
+        Append a package.
 
+        Input parameters:
+        direction (int): RECEIVED or SENT
+        command (int): RTDE package type
+        payload (bytes or memoryview): package payload without header
+        '''
+        header = RTDEFrameBuffer.HEADER.pack(RTDEFrameBuffer.HEADER.size + len(payload), command)
+        with self.__lock:
+            if self.__data is None:
+                return
+            self.__index.write(self.INDEX.pack(self.__offset, time.time(), direction))
+            self.__data.write(header)
+            self.__data.write(payload)
+            self.__offset += len(header) + len(payload)
+            self.packages += 1
+
+    def recordPackage(self, direction, package):
+        '''
+        Append a complete package (header and payload).
+        '''
+        (_, command) = RTDEFrameBuffer.HEADER.unpack_from(package)
+        self.record(direction, command, memoryview(package)[RTDEFrameBuffer.HEADER.size:])
 
-    def __init__(self, robotModel, conf_filename=None):
+    def close(self):
         '''
-        Constructor see class description for more info.
+        Flush and close the files.
         '''
-        if(False):
-            assert isinstance(robotModel, URBasic.robotModel.RobotModel)  ### This line is to get code completion for RobotModel
-        self.__robotModel = robotModel
+        with self.__lock:
+            if self.__data is not None:
+                self.__data.close()
+                self.__index.close()
+                self.__data = None
+                self.__index = None
+
+class RTDEHistory(object):
+    '''
+    Time series history of all fields of the output recipe.
 
-        logger = URBasic.dataLogging.DataLogging()
-        name = logger.AddEventLogging(__name__,log2Consol=False)
-        self._logger = logger.__dict__[name]
-        self.__reconnectTimeout = 600 #Seconds (while in run)
-        self.__dataSend = RTDEDataObject()
-        if conf_filename is None:
-            conf_filename = URBasic.__file__[0:URBasic.__file__.find('URBasic')] + 'rtdeConfiguration.xml'
-            if not os.path.isfile(conf_filename):
-                conf_filename = URBasic.__file__[0:URBasic.__file__.find('URBasic')] + 'rtdeConfigurationDefault.xml'
-        self.__conf_filename = conf_filename
-        self.__stop_event = True
-        threading.Thread.__init__(self)
-        self.__dataEvent = threading.Condition()
+    The history keeps the last packages in one preallocated array of the structured dtype of
+    RTDEOutputDecoder.record with a row per package, plus one shared timestamp column.
+    Each row is written twice (mirrored ring), so any window of up to capacity rows
+    is a contiguous slice and can be returned as a view without copying.
 
-        self.__conn_state = ConnectionState.DISCONNECTED
-        self.__sock = None
-        self.__rtde_output_names = None
-        self.__rtde_output_config = None
-        self.__rtde_input_names = None
-        self.__rtde_input_initValues = None
-        self.__rtde_input_config = None
-        self.__controllerVersion = None
-        self.__protocol_version = None
-        self.__packageCounter = 0
-        self.start()
-        self._logger.info('RTDE constructor done')
+    There is a single writer (the RTDE receive thread) and no lock. The writer fills the
+    row before it publishes it by incrementing the package count, so readers never block
+    the writer. A returned view is valid until the writer wraps around and overwrites
+    its oldest rows, i.e. hold it shorter than (capacity - window length) packages, or use copy=True.
+
+    Input parameters:
+    decoder (RTDEOutputDecoder): Decoder of the output recipe to store
+    seconds (float): Length of history to keep
+    frequency (float): Max package frequency, used to size the history
 
+    Example:
+    history = RTDEHistory(decoder, seconds=10.)
+    history.append(decoder.record, timestamp)
+    (timestamps, forces) = history.history('actual_TCP_force', seconds=2.0)
+    '''
 
+    def __init__(self, decoder, seconds=10., frequency=500.):
+        self.capacity = int(np.ceil(seconds*frequency))
+        if self.capacity < 1:
+            raise ValueError('RTDE history length must be positive')
+        self.seconds = seconds
+        self.names = decoder.names
+        self.__data = np.zeros(2*self.capacity, decoder.dtype)
+        self.__timestamps = np.zeros(2*self.capacity)
+        self.__count = 0
+
+    def count(self):
+        '''
+        Return the total number of packages appended to the history.
+        '''
+        return self.__count
 
+    def append(self, record, timestamp):
+        '''
+        Append a package to the history (only to be called from the writer thread).
 
-    def __connect(self):
+        Input parameters:
+        record (numpy array): Package values, see RTDEOutputDecoder.record
+        timestamp (float): Timestamp of the package
         '''
-        Initialize RTDE connection to host and set up data interfaces based on configuration XML.
+        index = self.__count % self.capacity
+        self.__data[index] = record
+        self.__data[index+self.capacity] = record
+        self.__timestamps[index] = timestamp
+        self.__timestamps[index+self.capacity] = timestamp
+        self.__count += 1
+
+    def history(self, name=None, seconds=None, samples=None, copy=False):
+        '''
+        Return the latest window of a field.
+
+        Input parameters:
+        name (str): Field name of the output recipe, None returns the rows of all fields (structured array)
+        seconds (float): [Optional] Window length in seconds, based on the timestamps
+        samples (int): [Optional] Window length in number of packages (default all available)
+        copy (bool): Return copies verified not to be overwritten while copying
 
         Return value:
-        success (boolean)
+        timestamps (numpy array): Timestamps of the window
+        values (numpy array): Values of the window, one row per package
         '''
-        if self.__sock:
-            return True
+        if name is not None and name not in self.names:
+            raise ValueError(str(name) + ' not found in RTDE output recipe')
+
+        while True:
+            count = self.__count
+            length = min(count, self.capacity)
+            if samples is not None:
+                length = min(length, samples)
+            stop = (count-1) % self.capacity + self.capacity + 1
+            timestamps = self.__timestamps[stop-length:stop]
+            if seconds is not None and length > 0:
+                first = np.searchsorted(timestamps, timestamps[-1]-seconds, side='left')
+                timestamps = timestamps[first:]
+                length = len(timestamps)
+            values = self.__data[stop-length:stop]
+            if name is not None:
+                values = values[name]
+            if not copy:
+                return timestamps, values
+            timestamps = timestamps.copy()
+            values = values.copy()
+            if self.__count - count <= self.capacity - length:
+                return timestamps, values
+
+
+class RTDESubscription(object):
+    '''
+    A predicate evaluated by the RTDE receive thread once per decoded data package.
+
+    When the predicate returns True the subscription is triggered: the callback (if any)
+    is called with the package, the future is resolved with the package and the event is set.
+    A subscription with once=True is removed after the first trigger.
+    If the predicate or callback raises, the future gets the exception and the subscription is removed.
+
+    The predicate and callback run in the receive thread, so they must be fast and never block.
+
+    Input parameters:
+    predicate (function): function(package) returning True when triggered, package is a dictionary of field name and value
+    callback (function): [Optional] function(package) called when triggered
+    once (bool): Remove the subscription after the first trigger
+
+    Example:
+    sub = rob.subscribe(URBasic.rtde.RTDESubscription.bitSet('output_bit_registers0_to_31', 1))
+    package = sub.wait(timeout=10)
+    '''
+
+    def __init__(self, predicate, callback=None, once=True):
+        self.predicate = predicate
+        self.callback = callback
+        self.once = once
+        self.active = True
+        self.triggerCount = 0
+        self.future = concurrent.futures.Future()
+        self.event = threading.Event()
+
+    def evaluate(self, package):
+        '''
+        Evaluate the predicate on a package (called by the receive thread).
 
+        Return value:
+        active (bool): False if the subscription is done and should be removed
+        '''
+        if not self.active:
+            return False
         try:
-            self.__sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.__sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-            self.__sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.__sock.settimeout(DEFAULT_TIMEOUT)
-            self.__sock.connect((self.__robotModel.ipAddress, 30004))
-            self.__conn_state = ConnectionState.CONNECTED
-        except (socket.timeout, socket.error):
-            if self.__sock:
-                self.sock.close()
-            self.__sock = None
+            if not self.predicate(package):
+                return True
+            self.triggerCount += 1
+            if self.callback is not None:
+                self.callback(package)
+        except Exception as e:
+            self.active = False
+            if not self.future.done():
+                self.future.set_exception(e)
+            self.event.set()
             return False
-        return True
+        if not self.future.done():
+            self.future.set_result(package)
+        self.event.set()
+        if self.once:
+            self.active = False
+        return self.active
+
+    def wait(self, timeout=None):
+        '''
+        Wait for the subscription to trigger.
 
-    def __disconnect(self):
+        Input parameters:
+        timeout (float): [Optional] Max time to wait in seconds
+
+        Return value:
+        package (dict): The package that triggered the subscription, None if timed out
         '''
-        Close the RTDE connection.
+        try:
+            return self.future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            return None
+
+    @staticmethod
+    def bitSet(name, bit):
         '''
-        if self.__sock:
-            self.__sock.close()
-            self.__sock = None
-        self.__conn_state = ConnectionState.DISCONNECTED
-        return True
+        Predicate that is True when bit number "bit" of the integer field "name" is set.
+        '''
+        mask = 1 << bit
+        return lambda package: package[name] is not None and (package[name] & mask) == mask
 
-    def __isConnected(self):
+    @staticmethod
+    def bitCleared(name, bit):
         '''
-        Returns True if the connection is open.
+        Predicate that is True when bit number "bit" of the integer field "name" is cleared.
+        '''
+        mask = 1 << bit
+        return lambda package: package[name] is not None and (package[name] & mask) == 0
+
+    @staticmethod
+    def normAbove(name, threshold, elements=slice(0, 3)):
+        '''
+        Predicate that is True when the norm of the vector field "name" is above threshold.
+        By default the norm of the first three elements is used (e.g. force of actual_TCP_force).
+        '''
+        return lambda package: np.linalg.norm(package[name][elements]) > threshold
+
+    @staticmethod
+    def changed(names):
+        '''
+        Predicate that is True when any of the fields in names has changed since the previous package.
+        '''
+        last = {}
+        def predicate(package):
+            result = False
+            for name in names:
+                value = package[name]
+                if name in last and np.any(last[name] != value):
+                    result = True
+                last[name] = value
+            return result
+        return predicate
+
+
+class RTDESession(object):
+    '''
+    Protocol state of one RTDE connection, independent of how the socket is served.
+
+    The session builds the request packages of the recipe negotiation, decodes the
+    packages received from the controller and updates the robot model, history and
+    subscriptions. It holds no socket, so the same negotiation and decoding is used by the
+    threaded RTDE interface, the asyncio AsyncRTDE interface and offline replay.
+
+    Input parameters:
+    robotModel (RobotModel): The robot model to update with received data
+    conf_filename (string): [Optional] Path to xml file describing what channels to activate
+    logger (logging.Logger): Logger for protocol events
+    historySeconds (float): [Optional] Keep a time series history of this length of all output fields
+    frequency (float): [Optional] Output package frequency, default is the controller frequency
+    columnLog (str or bool): [Optional] Log every output package to this column log file, see logColumns.
+                             Default is the log folder if the data log format of logConfig.xml is Columnar, False disables it.
+    '''
+
+    def __init__(self, robotModel, conf_filename=None, logger=None, historySeconds=None, frequency=None, columnLog=None):
+        if(False):
+            assert isinstance(robotModel, URBasic.robotModel.RobotModel)  ### This line is to get code completion for RobotModel
+        self.__robotModel = robotModel
+        self._logger = logger
+        if conf_filename is None:
+            conf_filename = RTDEConfiguration.defaultFilename()
+        self.conf_filename = conf_filename
+        if os.path.isfile(conf_filename):
+            RTDEConfiguration.load(conf_filename) #Reject invalid configurations before connecting
+        self.connectionState = ConnectionState.DISCONNECTED
+        self.__dataEvent = threading.Condition()
+
+        self.__rtde_output_names = None
+        self.__rtde_output_config = None
+        self.__pendingInputSetups = collections.deque()
+        self.__rtde_input_configs = collections.OrderedDict()
+        self.__inputFieldRecipe = {}
+        self.__dirtyRecipes = set()
+        self.__controllerVersion = None
+        self.__protocol_version = None
+        self.__requestedProtocol = None
+        self.__negotiation = None
+        self.__protocols = []
+        self.__outputVariables = None
+        self.__setupError = None
+        self.__setupRejected = False
+        self.__frequency = frequency
+        self.__outputFrequency = None
+        self.__decimation = 1
+        self.__decimationCount = 0
+        self.__maxDelta = 0.00800001
+        self.__checkDelta = False
+        self.__packageCounter = 0
+        self.__metrics = RTDEMetrics()
+        self.__historySeconds = historySeconds
+        self.__history = None
+        self.__sharedMemoryName = None
+        self.__sharedMemorySeconds = None
+        self.__sharedMemory = None
+        self.__subscriptions = ()
+        self.__subscriptionLock = threading.Lock()
+        self.__columnLogFilename = None
+        self.__columnLogChunk = None
+        self.__columnLog = None
+        if columnLog is None:
+            config = LogConfiguration.load()
+            if config.dataFormat == 'columnar':
+                self.logColumns(ColumnLog.defaultFilename(robotModel.ipAddress), config.chunkPackages)
+        elif columnLog:
+            self.logColumns(columnLog)
+
+    @staticmethod
+    def pack(command, payload=bytes()):
+        '''
+        Build a package from command and payload.
+
+        Input parameters:
+        command (int)
+        payload (bytes)
 
         Return value:
-        open (boolean)
+        package (bytes)
         '''
-        return self.__conn_state > ConnectionState.DISCONNECTED
+        return RTDEFrameBuffer.HEADER.pack(RTDEFrameBuffer.HEADER.size + len(payload), command) + payload
 
-    def isRunning(self):
+    def protocolVersion(self):
         '''
-        Return True if RTDE interface is running
+        Return the protocol version accepted by the controller, None if not negotiated
         '''
+        return self.__protocol_version
 
-        return self.__conn_state >= ConnectionState.STARTED
+    def controllerFrequency(self):
+        '''
+        Return the package frequency of the controller, 500 Hz for e-Series (version 5 and newer) else 125 Hz.
+        '''
+        if self.__controllerVersion is not None and self.__controllerVersion[0] >= 5:
+            return 500.
+        return 125.
 
-    def __getControllerVersion(self):
+    def outputFrequency(self):
+        '''
+        Return the frequency of the output packages used by the session, None before the output setup.
+        With protocol version 1 the controller always sends at the controller frequency,
+        and the packages are decimated when decoding.
         '''
-        Returns the software version of the robot controller running the RTDE server.
+        return self.__outputFrequency
 
-        Return values:
-        major (int)
-        minor (int)
-        bugfix (int)
+    def dataTimeout(self):
+        '''
+        Time without data packages before a running connection is considered lost:
+        3 package periods, at least DEFAULT_TIMEOUT.
         '''
-        cmd = Command.RTDE_GET_URCONTROL_VERSION
-        self.__send(cmd)
+        frequency = self.__outputFrequency
+        if frequency is None:
+            return DEFAULT_TIMEOUT
+        return max(DEFAULT_TIMEOUT, 3./frequency)
 
-    def __negotiateProtocolVersion(self, protocol):
+    def controllerVersionRequest(self):
         '''
-        Negotiate the protocol version with the server.
-        Returns True if the controller supports the specified protocol version.
-        We recommend that you use this to ensure full compatibility between your
-        application and future versions of the robot controller.
+        Request for the software version of the robot controller running the RTDE server.
+        '''
+        return self.pack(Command.RTDE_GET_URCONTROL_VERSION)
+
+    def protocolVersionRequest(self, protocol):
+        '''
+        Request to negotiate the protocol version with the server.
+        The response tells if the controller supports the specified protocol version,
+        see protocolVersion. A refused version 2 request can be followed by a version 1 request.
 
         Input parameters:
         protocol (int): protocol version number
+        '''
+        self.__requestedProtocol = protocol
+        return self.pack(Command.RTDE_REQUEST_PROTOCOL_VERSION, struct.pack('>H',protocol))
+
+    def inputRecipes(self):
+        '''
+        Return the input recipes of the xml configuration file.
+        Each <send> element of the configuration is a recipe, named by its key attribute.
+        The file is only parsed again when it is changed, see RTDEConfiguration.
 
         Return value:
-        success (boolean)
+        recipes (list): List of (key, input_variables, initValues)
+        '''
+        return [(recipe.key, list(recipe.names), list(recipe.initValues)) for recipe in RTDEConfiguration.load(self.conf_filename).inputs]
+
+    def setupInputsRequests(self):
         '''
-        cmd = Command.RTDE_REQUEST_PROTOCOL_VERSION
-        payload = struct.pack('>H',protocol)
-        self.__send(cmd, payload)
+        Return the setup requests of all input recipes of the xml configuration file,
+        see setupInputsRequest.
 
-    def __setupInput(self, input_variables=None, types=[], initValues=None):
+        Return value:
+        packages (list<bytes>)
+        '''
+        packages = []
+        for (key, input_variables, initValues) in self.inputRecipes():
+            package = self.setupInputsRequest(input_variables, initValues=initValues, recipe=key)
+            if package is not None:
+                packages.append(package)
+        return packages
+
+    def setupInputsRequest(self, input_variables=None, types=[], initValues=None, recipe='in'):
         '''
         Configure an input package that the external(this) application will send to the robot controller.
         An input package is a collection of input input_variables that the external application will provide
@@ -204,49 +639,49 @@ class RTDE(threading.Thread): #, metaclass=Singleton
         a subset of the names supported as input by the RTDE interface.The list of types is optional,
         but if any types are provided it should have the same length as the input_variables list.
         The provided types will be matched with the types that the RTDE interface expects and the
-        function returns None if they are not equal. Multiple input packages can be configured.
-        The returned InputObject has a reference to the recipe id which is used to identify the
-        specific input format when sending an update.
-        If input_variables is empty, xml configuration file is used.
+        function returns None if they are not equal. Multiple input packages can be configured,
+        each one is named by recipe and gets its own recipe id from the controller, which is
+        used to identify the specific input format when sending an update.
+        If input_variables is empty, the recipe of the xml configuration file is used.
 
         Input parameters:
         input_variables (list<string> or Str): [Optional] Variable names from the list of possible RTDE inputs
         types (list<string> or str): [Optional] Types matching the input_variables
+        initValues (list): [Optional] Initial values of the input_variables
+        recipe (str): Name of the input recipe
 
         Return value:
-        success (boolean)
+        package (bytes or None if input_variables is not valid)
         '''
 
         if input_variables is None:
-            tree = ET.parse(self.__conf_filename)
-            root = tree.getroot()
-
-            #setup data that can be send
-            recive = root.find('send')
-            input_variables = []
-            initValues = []
-            for child in recive:
-                input_variables.append(child.attrib['name'])
-                initValues.append(float(child.attrib['initValue']))
+            for (key, names, values) in self.inputRecipes():
+                if key == recipe:
+                    input_variables = names
+                    initValues = values
+            if input_variables is None:
+                self._logger.error('Input recipe not found in configuration: ' + str(recipe))
+                return None
 
         cmd = Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS
         if type(input_variables) is list:
             payload = ','.join(input_variables)
         elif type(input_variables) is str:
             payload = input_variables
+            input_variables = input_variables.split(',')
         else:
             self._logger.error('Variables must be list of stings or a single string, input_variables is: ' + str(type(input_variables)))
             return None
+        if len(input_variables) > MAX_FIELDS:
+            self._logger.error('Input recipe ' + str(recipe) + ' has more than ' + str(MAX_FIELDS) + ' fields')
+            return None
 
-        self.__rtde_input_names = input_variables
-        self.__rtde_input_initValues = initValues
-
-        payload = payload.encode('utf-8')
-        self.__send(cmd, payload)
+        #Responses are received in the order the requests are send
+        self.__pendingInputSetups.append((recipe, input_variables, initValues))
 
-        return True
+        return self.pack(cmd, payload.encode('utf-8'))
 
-    def __setupOutput(self, output_variables=None, types=[]):
+    def setupOutputsRequest(self, output_variables=None, types=[], frequency=None):
         '''
         Configure an output package that the robot controller will send to the
         external(this) application at the control frequency. Variables is a list of
@@ -255,29 +690,31 @@ class RTDE(threading.Thread): #, metaclass=Singleton
         it should have the same length as the output_variables list. The provided types will
         be matched with the types that the RTDE interface expects and the function
         returns False if they are not equal. Only one output package format can be
-        specified and hence no recipe id is used for output.
+        specified and hence no recipe id is used for output with protocol version 1.
+        With protocol version 2 the output frequency is part of the setup, and the
+        controller sends the packages with the output recipe id.
         If output_variables is empty, xml configuration file is used.
 
         Input parameters:
         output_variables (list<string> or str): [Optional] Variable names from the list of possible RTDE outputs
         types (list<string> or str): [Optional] Types matching the output_variables
+        frequency (float): [Optional] Output package frequency, default is the frequency of the session
 
         Return value:
-        success (boolean)
+        package (bytes or None if output_variables is not valid)
         '''
+        self.__setupError = None
+        self.__setupRejected = False
 
         if output_variables is None:
-            if not os.path.isfile(self.__conf_filename):
-                self._logger.error("Configuration file don't exist : " + self.__conf_filename)
-                return False
-            tree = ET.parse(self.__conf_filename)
-            root = tree.getroot()
-
-            #Setup data to be recived
-            recive = root.find('receive')
-            output_variables = ['timestamp']
-            for child in recive:
-                output_variables.append(child.attrib['name'])
+            if not os.path.isfile(self.conf_filename):
+                self._logger.error("Configuration file don't exist : " + self.conf_filename)
+                return None
+            outputs = RTDEConfiguration.load(self.conf_filename).outputs
+            if outputs is None:
+                self._logger.error('No receive element in configuration file: ' + self.conf_filename)
+                return None
+            output_variables = list(outputs.names)
 
 
         cmd = Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS
@@ -288,62 +725,196 @@ class RTDE(threading.Thread): #, metaclass=Singleton
         else:
             self._logger.error('Variables must be list of stings or a single string, output_variables is: ' + str(type(output_variables)))
             return None
+        if len(payload.split(',')) > MAX_FIELDS:
+            self._logger.error('Output recipe has more than ' + str(MAX_FIELDS) + ' fields')
+            return None
 
-        self.__rtde_output_names = output_variables
+        if frequency is None:
+            frequency = self.__frequency
+        controllerFrequency = self.controllerFrequency()
+        if frequency is None or frequency > controllerFrequency:
+            frequency = controllerFrequency
         payload = payload.encode('utf-8')
-        self.__send(cmd, payload)
-        return True
+        if self.__protocol_version is not None and self.__protocol_version >= 2:
+            self.__decimation = 1
+            payload = struct.pack('>d', frequency) + payload
+        else:
+            self.__decimation = max(1, int(round(controllerFrequency/frequency)))
+            frequency = controllerFrequency/self.__decimation
+            if self.__decimation > 1:
+                self._logger.info('RTDE protocol version 1, decoding every ' + str(self.__decimation) + '. package')
+        self.__decimationCount = 0
+        self.__outputFrequency = frequency
+        if frequency < controllerFrequency:
+            self.__maxDelta = 1.0/frequency + 1.0/controllerFrequency + 0.00000001
+        else:
+            self.__maxDelta = 0.00800001
 
-    def __sendStart(self):
+        self.__rtde_output_names = output_variables
+        return self.pack(cmd, payload)
+
+    def connectRequests(self, output_variables=None):
         '''
-        Sends a start command to the RTDE server.
-        Setup of all inputs and outputs must be done before starting the RTDE interface
+        Start the negotiation of a new connection, the responses are passed to negotiate.
+        The first time the controller version and protocol version are requested, and the
+        recipes are set up when the protocol version is accepted. When the connection is
+        reopened after a negotiation, the accepted protocol version and recipes are reused:
+        all requests up to start are send at once (pipelined), and the compiled recipes are
+        kept when the controller accepts the same recipes again, so reconnecting takes one
+        round trip and the configuration file is not read again.
+
+        Input parameters:
+        output_variables (list<string>): [Optional] Output fields of the first negotiation, see setupOutputsRequest
 
         Return value:
-        success (boolean)
+        packages (list<bytes>): Requests to send
         '''
-        cmd = Command.RTDE_CONTROL_PACKAGE_START
-        self.__send(cmd)
-        return True
-
-    def __sendPause(self):
+        self.__pendingInputSetups.clear()
+        self.__outputVariables = output_variables
+        self.__setupError = None
+        self.__setupRejected = False
+        if self.__protocol_version is not None and self.__controllerVersion is not None and self.__rtde_output_config is not None:
+            packages = [self.controllerVersionRequest(),
+                        self.protocolVersionRequest(self.__protocol_version),
+                        self.setupOutputsRequest(self.__rtde_output_config.names)]
+            for (key, config) in self.__rtde_input_configs.items():
+                packages.append(self.setupInputsRequest(config.names, recipe=key))
+            packages.append(self.startRequest())
+            self.__negotiation = 'start'
+            return packages
+        self.__protocols = [1]
+        self.__negotiation = 'protocol'
+        return [self.controllerVersionRequest(), self.protocolVersionRequest(2)]
+
+    def negotiate(self, packet_command):
         '''
-        Sends a pause command to the RTDE server
-        When paused it is possible to change the input and output configurations
+        Advance the negotiation started by connectRequests on a response handled by handlePackage.
+
+        Input parameters:
+        packet_command (int): RTDE package type of the response
 
         Return value:
-        success (boolean)
+        packages (list<bytes> or None if the negotiation failed): Requests to send. After a failure the connection
+                  must be reopened, unless a recipe was not accepted (see setupError), then reconnecting does not help.
         '''
-        cmd = Command.RTDE_CONTROL_PACKAGE_PAUSE
-        self.__send(cmd)
-        return True
+        if self.__negotiation is None or packet_command == Command.RTDE_DATA_PACKAGE:
+            return []
+        if self.__setupRejected:
+            self.__negotiation = None
+            return None
+        if packet_command == Command.RTDE_REQUEST_PROTOCOL_VERSION:
+            if self.__protocol_version is None:
+                if self.__negotiation == 'protocol' and len(self.__protocols):
+                    return [self.protocolVersionRequest(self.__protocols.pop(0))]
+                self.__negotiation = None
+                return None
+            if self.__negotiation == 'protocol':
+                package = self.setupOutputsRequest(self.__outputVariables)
+                if package is None:
+                    self.__negotiation = None
+                    return None
+                self.__negotiation = 'start'
+                return [package] + self.setupInputsRequests() + [self.startRequest()]
+        elif packet_command == Command.RTDE_CONTROL_PACKAGE_START and self.__negotiation == 'start':
+            self.__negotiation = None
+        return []
+
+    def setupError(self):
+        '''
+        Return the reason a recipe was not accepted by the controller in the last negotiation, when
+        reconnecting does not help, else None. E.g. an unknown field or an input field in use by another
+        RTDE client: the configuration must be changed.
+        '''
+        return self.__setupError
 
-    def sendData(self):
+    def setupRejected(self):
         '''
-        Send the contents of a RTDEDataObject as input to the RTDE server.
-        Returns True if successful.
+        Return True if a recipe was not accepted by the controller in the last negotiation, see setupError.
+        '''
+        return self.__setupRejected
+
+    def __setupFailed(self, recipe, names, payload, hasRecipeId, accepted):
+        '''
+        Record a recipe not accepted by the controller, see setupError.
+        The controller answers IN_USE or NOT_FOUND in place of the type of a field it does not accept.
+        Fields of a recipe accepted before (accepted) that are in use after a reconnect are most likely
+        still held by the previous connection of this session, until the controller drops it, so that
+        is not fatal and the negotiation is retried.
+        '''
+        self.__setupRejected = True
+        types = bytes(payload[1 if hasRecipeId else 0:]).decode('utf-8', 'replace').split(',')
+        inUse = [names[ii] for ii in range(min(len(names), len(types))) if types[ii] == 'IN_USE']
+        notFound = [names[ii] for ii in range(min(len(names), len(types))) if types[ii] == 'NOT_FOUND']
+        message = 'RTDE ' + recipe + ' not accepted by the controller'
+        if accepted and len(inUse) and not len(notFound):
+            self._logger.warning(message + ', fields still in use, retrying: ' + ', '.join(inUse))
+            return
+        if len(inUse):
+            message += ', fields in use by another RTDE client: ' + ', '.join(inUse)
+        if len(notFound):
+            message += ', unknown fields: ' + ', '.join(notFound)
+        self.__setupError = message if self.__setupError is None else self.__setupError + '; ' + message
+        self._logger.error(message)
+
+    def isNegotiating(self):
+        '''
+        Return True while a negotiation started by connectRequests is running.
+        '''
+        return self.__negotiation is not None
+
+    def startRequest(self):
+        '''
+        Request to start the RTDE server.
+        Setup of all inputs and outputs must be done before starting the RTDE interface
+        '''
+        return self.pack(Command.RTDE_CONTROL_PACKAGE_START)
+
+    def pauseRequest(self):
+        '''
+        Request to pause the RTDE server
+        When paused it is possible to change the input and output configurations
+        '''
+        return self.pack(Command.RTDE_CONTROL_PACKAGE_PAUSE)
+
+    def dataRequests(self, recipe=None, changedOnly=False):
+        '''
+        Build data packages with the contents of the input recipes.
+        If no recipe is given, a package is build for each recipe, or with changedOnly
+        only for the recipes with data changed since they were last send (see setData).
+
+        Input parameters:
+        recipe (str): [Optional] Name of the input recipe to send
+        changedOnly (bool): [Optional] Only send the recipes with changed data, unchanged recipes are not send again
 
         Return value:
-        success (boolean)
+        packages (list<memoryview> or None if the data can not be send), each package is
+        the send buffer of the recipe (see RTDEInputEncoder) and only valid until the next request
         '''
-        if self.__conn_state != ConnectionState.STARTED:
+        if self.connectionState != ConnectionState.STARTED:
             self._logger.error('Cannot send when RTDE is inactive')
-            return
-        #if not (self.__rtde_input_config.names.has_key(self.__dataSend.recipe_id)):
-        #    self._logger.error('Input configuration id not found: ' + str(self.__dataSend.recipe_id))
-        #    return
+            return None
         if self.__robotModel.StopRunningFlag():
             self._logger.info('"sendData" send ignored due to "stopRunningFlag" True')
-            return
-        #config = self.__rtde_input_config[self.__dataSend.recipe_id]
-        config = self.__rtde_input_config
-        return self.__send(Command.RTDE_DATA_PACKAGE, config.pack(self.__dataSend))
+            return None
+        if recipe is None:
+            recipes = [key for key in self.__rtde_input_configs if not changedOnly or key in self.__dirtyRecipes]
+        elif recipe in self.__rtde_input_configs:
+            recipes = [recipe]
+        else:
+            raise ValueError(str(recipe) + " not found in RTDE input recipes")
+
+        packages = []
+        for key in recipes:
+            packages.append(self.__rtde_input_configs[key].encoder.encode())
+            self.__dirtyRecipes.discard(key)
+        return packages
 
     def setData(self, variable_name, value):
         '''
         Set data to be send to the robot
         Object is locked while updating to avoid sending half updated values,
         hence send all values as two lists of equal lengths
+        The input recipe holding the variable is marked as changed if the value is changed.
 
         Input parameters:
         variable_name (List/str):  Variable name from the list of possible RTDE inputs
@@ -362,120 +933,361 @@ class RTDE(threading.Thread): #, metaclass=Singleton
                 raise ValueError("List of RTDE Output values does not have same length as list of variable names")
                 #return False
             for ii in range(len(value)):
-                if self.hasattr(self.__rtde_input_config.names, variable_name[ii]):
-                    self.__dataSend.__dict__[variable_name[ii]] = value[ii]
-                else:
-                    raise ValueError(str(variable_name[ii]) + " not found in RTDE OUTPUT config")
-                    #return False
+                self.__setValue(variable_name[ii], value[ii])
 
         else:
-            if variable_name in self.__rtde_input_config.names:
-                self.__dataSend.__dict__[variable_name] = value
-            else:
-                raise ValueError(str(variable_name) + " not found in RTDE OUTPUT config")
+            self.__setValue(variable_name, value)
+
+    def __setValue(self, variable_name, value):
+        if variable_name not in self.__inputFieldRecipe:
+            raise ValueError(str(variable_name) + " not found in RTDE OUTPUT config")
+        recipe = self.__inputFieldRecipe[variable_name]
+        if self.__rtde_input_configs[recipe].encoder.set(variable_name, value):
+            self.__dirtyRecipes.add(recipe)
+
+    def inputRecipeNames(self):
+        '''
+        Return the names of the accepted input recipes.
+        '''
+        return list(self.__rtde_input_configs.keys())
 
-    def __send(self, command, payload=bytes()):
+    def handlePackage(self, packet_command, packet):
         '''
-        Send command and data (payload) to Robot Controller
-        and receive the respond from the Robot Controller.
+        Decode a package received from the robot controller and act on it.
 
         Input parameters:
-        cmd (int)
-        payload (bytes)
+        packet_command (int): RTDE package type
+        packet (bytes or memoryview): package payload without header
 
         Return value:
-        success (boolean)
+        data: decoded payload (type is depended on the packet_command value)
         '''
-        fmt = '>HB'
-        size = struct.calcsize(fmt) + len(payload)
-        buf = struct.pack(fmt, size, command) + payload
-        if self.__sock is None:
-            self._logger.debug('Unable to send: not connected to Robot')
-            return False
+        if(packet_command == Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS):
+            if not len(self.__pendingInputSetups):
+                self._logger.error('RTDE_CONTROL_PACKAGE_SETUP_INPUTS: Response without request')
+                return None
+            (recipe, input_names, initValues) = self.__pendingInputSetups.popleft()
 
-        (_, writable, _) = select.select([], [self.__sock], [], DEFAULT_TIMEOUT)
-        if len(writable):
-            self.__sock.sendall(buf)
-            return True
+        if(packet_command == Command.RTDE_DATA_PACKAGE):
+            arrival = time.perf_counter_ns()
+            data = self.__decodePayload(packet_command, packet)
+            if data is not None:
+                self.__metrics.recordPackage(arrival, time.perf_counter_ns() - arrival)
         else:
-            self._logger.info("RTDE disconnected")
-            self.__disconnect()
-            return False
-
-    def __receive(self):
-        byte_buffer = bytes()
-
-        (readable, _, _) = select.select([self.__sock], [], [], DEFAULT_TIMEOUT)
-        if (len(readable)):
-            more = self.__sock.recv(16384)
-            if len(more) == 0:
-                self._logger.info("RTDE disconnected")
-                self.__disconnect()
+            data = self.__decodePayload(packet_command, packet)
+
+        if(packet_command == Command.RTDE_GET_URCONTROL_VERSION):
+            self.__verifyControllerVersion(data)
+        elif(packet_command == Command.RTDE_REQUEST_PROTOCOL_VERSION):
+            self.__verifyProtocolVersion(data)
+        elif(packet_command == Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS):
+            if data is None:
+                self.__setupFailed('input recipe ' + str(recipe), input_names, packet, True, recipe in self.__rtde_input_configs)
                 return None
-            byte_buffer +=  more
-
-        while len(byte_buffer) >= 3:
-            (packet_size, packet_command) = struct.unpack_from('>HB', byte_buffer)
-            buffer_length = len(byte_buffer)
-
-            if ((buffer_length) >= packet_size):
-                packet, byte_buffer = byte_buffer[3:packet_size], byte_buffer[packet_size:]
-                data = self.__decodePayload(packet_command, packet)
-
-                if(packet_command == Command.RTDE_GET_URCONTROL_VERSION):
-                    self.__verifyControllerVersion(data)
-                elif(packet_command == Command.RTDE_REQUEST_PROTOCOL_VERSION):
-                    self.__verifyProtocolVersion(data)
-                elif(packet_command == Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS):
-                    self.__rtde_input_config = data
-                    self.__rtde_input_config.names = self.__rtde_input_names
-                    #self.__rtde_input_config[self.__rtde_input_config.id] = self.__rtde_input_config
-                    self.__dataSend = RTDEDataObject.create_empty(self.__rtde_input_names, self.__rtde_input_config.id)
-                    if self.__rtde_input_initValues is not None:
-                        for ii in range(len(self.__rtde_input_config.names)):
-                            if 'UINT8' == self.__rtde_input_config.types[ii]:
-                                self.setData(self.__rtde_input_config.names[ii], int(self.__rtde_input_initValues[ii]))
-                            elif 'UINT32' == self.__rtde_input_config.types[ii]:
-                                self.setData(self.__rtde_input_config.names[ii], int(self.__rtde_input_initValues[ii]))
-                            elif 'INT32' == self.__rtde_input_config.types[ii]:
-                                self.setData(self.__rtde_input_config.names[ii], int(self.__rtde_input_initValues[ii]))
-                            elif 'DOUBLE' == self.__rtde_input_config.types[ii]:
-                                self.setData(self.__rtde_input_config.names[ii], (self.__rtde_input_initValues[ii]))
-                            else:
-                                self._logger.error('Unknown data type')
-
-                elif(packet_command == Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS):
-                    self.__rtde_output_config = data
-                    self.__rtde_output_config.names = self.__rtde_output_names
-                elif(packet_command == Command.RTDE_CONTROL_PACKAGE_START):
-                    self._logger.info('RTDE started')
-                    self.__conn_state = ConnectionState.STARTED
-                elif(packet_command == Command.RTDE_CONTROL_PACKAGE_PAUSE):
-                    self._logger.info('RTDE paused')
-                    self.__conn_state = ConnectionState.PAUSED
-                elif(packet_command == Command.RTDE_DATA_PACKAGE):
-                    self.__updateModel(data)
-                elif(packet_command == 0):
-                    byte_buffer = bytes()
-            else:
-                print("skipping package - unexpected packet_size - length: " + str(len(byte_buffer)))
-                byte_buffer = bytes()
+            config = self.__rtde_input_configs.get(recipe)
+            if config is not None and config.names == input_names and config.types == data.types:
+                #Same recipe accepted again (reconnect), keep the encoder and the values
+                config.id = data.id
+                config.encoder.setRecipeId(data.id)
+                self.__dirtyRecipes.add(recipe)
+                return data
+            config = data
+            config.names = input_names
+            config.compileInput()
+            self.__rtde_input_configs[recipe] = config
+            for name in input_names:
+                self.__inputFieldRecipe[name] = recipe
+            if initValues is not None:
+                for ii in range(len(config.names)):
+                    if 'UINT8' == config.types[ii]:
+                        self.setData(config.names[ii], int(initValues[ii]))
+                    elif 'UINT32' == config.types[ii]:
+                        self.setData(config.names[ii], int(initValues[ii]))
+                    elif 'INT32' == config.types[ii]:
+                        self.setData(config.names[ii], int(initValues[ii]))
+                    elif 'DOUBLE' == config.types[ii]:
+                        self.setData(config.names[ii], (initValues[ii]))
+                    else:
+                        self._logger.error('Unknown data type')
+            self.__dirtyRecipes.add(recipe)
+
+        elif(packet_command == Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS):
+            if data is None:
+                names = self.__rtde_output_names
+                if type(names) is str:
+                    names = names.split(',')
+                self.__setupFailed('output recipe', names or [], packet, self.__protocol_version is not None and self.__protocol_version >= 2, False)
+                return None
+            config = self.__rtde_output_config
+            if (config is not None and config.names == self.__rtde_output_names and config.types == data.types
+                    and (config.id is None) == (data.id is None)):
+                #Same recipe accepted again (reconnect), keep the decoder, history and shared memory
+                config.id = data.id
+                return data
+            if self.__rtde_output_config is not None:
+                #Fields removed from the recipe are no longer updated
+                for name in self.__rtde_output_config.names:
+                    if name not in self.__rtde_output_names:
+                        self.__robotModel.dataDir[name] = None
+            self.__rtde_output_config = data
+            self.__rtde_output_config.names = self.__rtde_output_names
+            self.__rtde_output_config.compile()
+            if self.__historySeconds is not None:
+                if self.__history is None or self.__history.names != self.__rtde_output_names:
+                    self.__history = RTDEHistory(self.__rtde_output_config.decoder, self.__historySeconds, self.__outputFrequency)
+            if self.__sharedMemoryName is not None:
+                if self.__sharedMemory is None or self.__sharedMemory.names != self.__rtde_output_names:
+                    self.closeSharedMemory()
+                    capacity = int(np.ceil(self.__sharedMemorySeconds*(self.__outputFrequency or self.controllerFrequency())))
+                    self.__sharedMemory = RTDESharedMemory(self.__sharedMemoryName, self.__rtde_output_config.decoder, max(2, capacity))
+            if self.__columnLogFilename is not None:
+                if self.__columnLog is None:
+                    self.__columnLog = ColumnLog(self.__columnLogFilename, self.__columnLogChunk)
+                self.__columnLog.setSchema(self.__rtde_output_config.decoder)
+        elif(packet_command == Command.RTDE_CONTROL_PACKAGE_START):
+            self._logger.info('RTDE started')
+            self.connectionState = ConnectionState.STARTED
+            self.__checkDelta = False
+        elif(packet_command == Command.RTDE_CONTROL_PACKAGE_PAUSE):
+            self._logger.info('RTDE paused')
+            self.connectionState = ConnectionState.PAUSED
+        elif(packet_command == Command.RTDE_DATA_PACKAGE):
+            if data is not None:
+                self.__updateModel(data)
+        return data
+
+    def handleRequest(self, packet_command, packet):
+        '''
+        Apply a request package send to the robot controller to the session, as if the request
+        was built by the session. Used to replay a recording, see URBasic.rtdeReplay.ReplayRTDE
+
+        Input parameters:
+        packet_command (int): RTDE package type
+        packet (bytes or memoryview): package payload without header
+        '''
+        if(packet_command == Command.RTDE_REQUEST_PROTOCOL_VERSION):
+            self.protocolVersionRequest(struct.unpack_from('>H', packet)[0])
+        elif(packet_command == Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS):
+            frequency = None
+            if self.__protocol_version is not None and self.__protocol_version >= 2:
+                frequency = struct.unpack_from('>d', packet)[0]
+                packet = packet[8:]
+            self.setupOutputsRequest(bytes(packet).decode('utf-8').split(','), frequency=frequency)
+        elif(packet_command == Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS):
+            input_variables = bytes(packet).decode('utf-8').split(',')
+            recipe = 'recipe' + str(len(self.__pendingInputSetups) + len(self.__rtde_input_configs))
+            for (key, names, _) in self.inputRecipes():
+                if names == input_variables:
+                    recipe = key
+            self.setupInputsRequest(input_variables, recipe=recipe)
+
+    def sampleSequence(self):
+        '''
+        Return the sequence number of the latest received data package.
+        The number is incremented by one for each package after the robot model is updated.
+
+        Return value:
+        sequence (int)
+        '''
+        return self.__packageCounter
+
+    def wait_for_sample(self, after_seq=None, timeout=DEFAULT_TIMEOUT):
+        '''
+        Wait until a data package newer than after_seq has been received and the robot model updated.
+        The receive thread notifies waiting threads for every package, so the call returns
+        as soon as the package is received.
+
+        Input parameters:
+        after_seq (int): [Optional] Sequence number to wait beyond, default is the latest received package
+        timeout (float): [Optional] Max time to wait in seconds, None waits forever
+
+        Return value:
+        sequence (int): Sequence number of the latest package, None if timed out
+
+        Example:
+        seq = rob.sampleSequence()
+        rob.sendData()
+        rob.wait_for_sample(seq)
+        '''
+        with self.__dataEvent:
+            if after_seq is None:
+                after_seq = self.__packageCounter
+            if self.__dataEvent.wait_for(lambda: self.__packageCounter > after_seq, timeout):
+                return self.__packageCounter
+        return None
+
+    def wait(self, timeout=None):
+        '''
+        Wait for the next notification of the data event (new package or stop).
+
+        Return value:
+        notified (bool): False if timed out
+        '''
+        with self.__dataEvent:
+            return self.__dataEvent.wait(timeout)
+
+    def notifyAll(self):
+        '''
+        Wake up all threads waiting for data, e.g. when the interface is stopped.
+        '''
+        with self.__dataEvent:
+            self.__dataEvent.notify_all()
+
+    def subscribe(self, predicate, callback=None, once=True):
+        '''
+        Register a predicate evaluated by the receive thread once per data package,
+        see RTDESubscription for details.
+
+        Input parameters:
+        predicate (function or RTDESubscription): function(package) returning True when triggered
+        callback (function): [Optional] function(package) called when triggered
+        once (bool): Remove the subscription after the first trigger
+
+        Return value:
+        subscription (RTDESubscription)
+
+        Example:
+        sub = rob.subscribe(RTDESubscription.normAbove('actual_TCP_force', 30.))
+        if sub.wait(timeout=5.) is None:
+            rob.unsubscribe(sub)
+        '''
+        if isinstance(predicate, RTDESubscription):
+            subscription = predicate
+        else:
+            subscription = RTDESubscription(predicate, callback, once)
+        with self.__subscriptionLock:
+            self.__subscriptions = self.__subscriptions + (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        '''
+        Remove a subscription, see subscribe.
+        '''
+        subscription.active = False
+        with self.__subscriptionLock:
+            self.__subscriptions = tuple(sub for sub in self.__subscriptions if sub is not subscription)
+
+    def history(self, name=None, seconds=None, samples=None, copy=False):
+        '''
+        Return the latest window of an output field from the history.
+        The history must be enabled with historySeconds in the constructor.
+        See RTDEHistory.history for details.
+
+        Input parameters:
+        name (str): Field name of the output recipe, e.g. 'actual_TCP_force'
+        seconds (float): [Optional] Window length in seconds
+        samples (int): [Optional] Window length in number of packages
+        copy (bool): Return copies instead of views
+
+        Return value:
+        timestamps (numpy array): Robot timestamps of the window
+        values (numpy array): Values of the window, one row per package
+
+        Example:
+        (t, force) = rob.history('actual_TCP_force', seconds=2.0)
+        '''
+        if self.__history is None:
+            raise ValueError('RTDE history is not enabled or output recipe not set up yet')
+        return self.__history.history(name, seconds, samples, copy)
+
+    def metrics(self):
+        '''
+        Return the link quality measurements of the session, see RTDEMetrics.
+        '''
+        return self.__metrics
 
-        if len(byte_buffer) != 0:
-            self._logger.warning('skipping package - not a package but buffer was not empty')
-            byte_buffer = bytes()
+    def publishSharedMemory(self, name, seconds=1.):
+        '''
+        Publish every decoded output package in a shared memory block, read by other
+        local processes with URBasic.sharedRobotModel.SharedRobotModel.
+        The block is created when the output recipe is set up, see RTDESharedMemory.
+
+        Input parameters:
+        name (str): Name of the shared memory block
+        seconds (float): Length of the history kept in the block
+        '''
+        self.__sharedMemoryName = name
+        self.__sharedMemorySeconds = seconds
+
+    def closeSharedMemory(self):
+        '''
+        Close and remove the shared memory block, if any.
+        '''
+        if self.__sharedMemory is not None:
+            self.__sharedMemory.close()
+            self.__sharedMemory = None
+
+    def logColumns(self, filename, chunkPackages=500):
+        '''
+        Log every decoded output package to a binary column log, see URBasic.columnLog.ColumnLog.
+        The log is opened when the output recipe is set up, and a new schema is written when it changes.
+
+        Input parameters:
+        filename (str): Path of the column log
+        chunkPackages (int): Packages per chunk written by the writer thread
+        '''
+        self.__columnLogFilename = filename
+        self.__columnLogChunk = chunkPackages
+
+    def closeColumnLog(self):
+        '''
+        Write the collected packages and close the column log, if any.
+        '''
+        self.__columnLogFilename = None
+        #The receive thread stops appending to the log when it is removed, see also ColumnLog.close
+        columnLog = self.__columnLog
+        self.__columnLog = None
+        if columnLog is not None:
+            columnLog.close()
+
+    def outputDecoder(self):
+        '''
+        Return the compiled decoder of the accepted output recipe, see RTDEOutputDecoder.
+        The decoder record holds the values of the latest received package.
+
+        Return value:
+        decoder (RTDEOutputDecoder or None if no output recipe is accepted)
+        '''
+        if self.__rtde_output_config is None:
+            return None
+        return self.__rtde_output_config.decoder
 
     def __updateModel(self, rtde_data_package):
-        self.__packageCounter = self.__packageCounter + 1
         #print("got a rtde package nr " + str(self.__packageCounter))
-        if(self.__packageCounter % 1000 == 0):
-            self._logger.info("Total packages: " + str(self.__packageCounter))
-        if(self.__robotModel.dataDir['timestamp'] != None):
+        if((self.__packageCounter+1) % 1000 == 0):
+            self._logger.info("Total packages: " + str(self.__packageCounter+1))
+        #The first package after (re)start is not compared to the package before the pause
+        if(self.__checkDelta and self.__robotModel.dataDir['timestamp'] != None):
             delta = rtde_data_package['timestamp'] - self.__robotModel.dataDir['timestamp']
-            if(delta > 0.00800001):
+            lost = 0
+            if(delta > self.__maxDelta):
                 self._logger.error("Lost some RTDE at " + str(rtde_data_package['timestamp']) + " - " + str(delta*1000) + " milliseconds since last package")
-        for tagname in rtde_data_package.keys():
-            self.__robotModel.dataDir[tagname] = rtde_data_package[tagname]
+                lost = max(1, int(round(delta*self.__outputFrequency)) - 1) if self.__outputFrequency else 1
+            self.__metrics.recordTimestampDelta(delta, lost)
+        self.__checkDelta = True
+        channels = self.__robotModel.derivedChannels
+        if len(channels):
+            rtde_data_package.update(channels.evaluate(rtde_data_package, self.__robotModel.dataDir, self.__packageCounter + 1))
+        #dataDir reads the fields of the package through the snapshot, see RobotModel.DataDirectory
+        self.__robotModel.publish(URBasic.robotModel.RobotSnapshot(rtde_data_package, self.__packageCounter + 1))
+        if self.__history is not None:
+            self.__history.append(self.__rtde_output_config.decoder.record, rtde_data_package['timestamp'])
+        if self.__sharedMemory is not None:
+            self.__sharedMemory.publish(self.__rtde_output_config.decoder.record)
+        columnLog = self.__columnLog
+        if columnLog is not None:
+            columnLog.append(self.__rtde_output_config.decoder.record)
+
+        #Publish the package sequence number and wake up threads waiting for a new sample
+        with self.__dataEvent:
+            self.__packageCounter = self.__packageCounter + 1
+            self.__dataEvent.notify_all()
+
+        subscriptions = self.__subscriptions
+        if len(subscriptions):
+            done = [sub for sub in subscriptions if not sub.evaluate(rtde_data_package)]
+            for sub in done:
+                self.unsubscribe(sub)
 
     def __verifyControllerVersion(self, data):
         self.__controllerVersion = data
@@ -487,9 +1299,15 @@ class RTDE(threading.Thread): #, metaclass=Singleton
                 raise ValueError("Please upgrade your controller to minimum version 3.2.19171")
 
     def __verifyProtocolVersion(self, data):
-        self.__protocol_version = data
-        if(self.__protocol_version != 1):
-            raise ValueError("We only support protocol version 1 at the moment")
+        if data == 1:
+            self.__protocol_version = self.__requestedProtocol
+            self._logger.info('RTDE protocol version: ' + str(self.__protocol_version))
+        elif self.__requestedProtocol is not None and self.__requestedProtocol > 1:
+            self.__protocol_version = None
+            self._logger.warning('RTDE protocol version ' + str(self.__requestedProtocol) + ' not supported by the controller')
+        else:
+            self.__protocol_version = None
+            raise ValueError("RTDE protocol version " + str(self.__requestedProtocol) + " not supported by the controller")
 
     def __decodePayload(self, cmd, payload):
         '''
@@ -525,8 +1343,15 @@ class RTDE(threading.Thread): #, metaclass=Singleton
             INFO_MESSAGE = 3
             fmt = ">" + str(len(payload)) + "B"
             out = struct.unpack_from(fmt, payload)
-            level = out[0]
-            message = ''.join(map(chr,out[1:]))
+            if self.__protocol_version is not None and self.__protocol_version >= 2:
+                #message length, message, source length, source, level
+                mlength = out[0]
+                slength = out[1+mlength]
+                message = ''.join(map(chr,out[1+mlength+1:1+mlength+1+slength])) + ': ' + ''.join(map(chr,out[1:1+mlength]))
+                level = out[-1]
+            else:
+                level = out[0]
+                message = ''.join(map(chr,out[1:]))
             if(level == EXCEPTION_MESSAGE or
                level == ERROR_MESSAGE):
                 self._logger.error('Server message: ' + message)
@@ -539,17 +1364,23 @@ class RTDE(threading.Thread): #, metaclass=Singleton
             if len(payload) < 1:
                 self._logger.error('RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS: No payload')
                 return None
-            has_recipe_id = False
-            output_config = RTDE_IO_Config.unpack_recipe(payload, has_recipe_id)
-            return output_config
+            has_recipe_id = self.__protocol_version is not None and self.__protocol_version >= 2
+            try:
+                return RTDE_IO_Config.unpack_recipe(payload, has_recipe_id)
+            except ValueError as e:
+                self._logger.error('RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS: ' + str(e))
+                return None
 
         elif cmd == Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS:
             if len(payload) < 1:
                 self._logger.error('RTDE_CONTROL_PACKAGE_SETUP_INPUTS: No payload')
                 return None
             has_recipe_id = True
-            input_config = RTDE_IO_Config.unpack_recipe(payload, has_recipe_id)
-            return input_config
+            try:
+                return RTDE_IO_Config.unpack_recipe(payload, has_recipe_id)
+            except ValueError as e:
+                self._logger.error('RTDE_CONTROL_PACKAGE_SETUP_INPUTS: ' + str(e))
+                return None
 
         elif cmd == Command.RTDE_CONTROL_PACKAGE_START:
             if len(payload) != 1:
@@ -567,6 +1398,16 @@ class RTDE(threading.Thread): #, metaclass=Singleton
             if self.__rtde_output_config is None:
                 self._logger.error('RTDE_DATA_PACKAGE: Missing output configuration')
                 return None
+            if self.__rtde_output_config.id is not None:
+                if payload[0] != self.__rtde_output_config.id:
+                    self._logger.warning('RTDE_DATA_PACKAGE: Unknown recipe id ' + str(payload[0]))
+                    return None
+                payload = payload[1:]
+            if self.__decimation > 1:
+                self.__decimationCount += 1
+                if self.__decimationCount < self.__decimation:
+                    return None
+                self.__decimationCount = 0
             output = self.__rtde_output_config.unpack(payload)
             return output
 
@@ -574,98 +1415,551 @@ class RTDE(threading.Thread): #, metaclass=Singleton
             self._logger.error('Unknown RTDE command type: ' + chr(cmd))
 
 
-    def __listEquals(self, l1, l2):
-        if len(l1) != len(l2):
+class RTDE(threading.Thread): #, metaclass=Singleton
+    '''
+    Interface to UR robot Real Time Data Exchange interface.
+    See this site for more detail:
+    http://www.universal-robots.com/how-tos-and-faqs/how-to/ur-how-tos/real-time-data-exchange-rtde-guide-22229/
+
+    The constructor takes a UR robot hostname as input and a path to a RTDE configuration file.
+
+    Input parameters:
+    host (string):  Hostname or IP of UR Robot (RT CLient server)
+    conf_filename (string):  Path to xml file describing what channels to activate
+    logger (URBasis_DataLogging obj): A instance if a logger object if common logging is needed.
+    historySeconds (float): [Optional] Keep a time series history of this length of all output fields, see RTDE.history
+    frequency (float): [Optional] Output package frequency, e.g. 10 Hz for monitoring, default is the controller frequency.
+                       Protocol version 2 is used if the controller supports it, else the packages are decimated.
+    outputFields (list<str>): [Optional] Output fields to receive instead of the receive fields of the configuration file
+    recordFile (str): [Optional] Record all packages to this file for offline replay, see RTDERecorder
+    sharedMemory (str): [Optional] Publish the output packages in a shared memory block of this name
+                        for other local processes, see URBasic.sharedRobotModel.SharedRobotModel
+    columnLog (str): [Optional] Log every output package to this column log file, see URBasic.columnLog.ColumnLog.
+                     Default is the log folder if the data log format of logConfig.xml is Columnar.
+
+    The output recipe can be reduced at runtime to the fields the application uses,
+    see startUsageTracking, reduceOutputRecipe and setupOutputRecipe.
+
+    A lost connection is reopened by the receive thread without blocking, with a jittered
+    exponential backoff between failed attempts. The accepted recipes are reused and the
+    negotiation is pipelined (see RTDESession.connectRequests), and the time to recover is
+    measured, see RTDEMetrics.recovery.
+
+    Example:
+    import URBasic
+    import time
+    RobotModel = URBasic.robotModel.RobotModel()
+    RobotModel.ipAddress = '192.168.56.101'
+    rob = URBasic.rtde.RTDE(RobotModel)
+    time.sleep(10)
+    rob.close()
+    '''
+
+
+    #timestamp and the fields followed by RealTimeClient while a program is running
+    REQUIRED_OUTPUT_FIELDS = ['timestamp', 'output_bit_registers0_to_31', 'robot_status_bits', 'safety_status_bits']
+
+    def __init__(self, robotModel, conf_filename=None, historySeconds=None, frequency=None, outputFields=None, recordFile=None, sharedMemory=None, columnLog=None):
+        '''
+        Constructor see class description for more info.
+        '''
+        if(False):
+            assert isinstance(robotModel, URBasic.robotModel.RobotModel)  ### This line is to get code completion for RobotModel
+        self.__robotModel = robotModel
+
+        logger = URBasic.dataLogging.DataLogging()
+        name = logger.AddEventLogging(__name__,log2Consol=False)
+        self._logger = logger.__dict__[name]
+        self.__reconnectTimeout = 600 #Seconds (while in run)
+        self.__reconnectDelay = 0.01 #Seconds, doubled for each failed attempt
+        self.__maxReconnectDelay = 5.
+        self.__attempt = 0
+        self.__nextAttempt = 0.
+        self.__deadline = None
+        self.__lastData = None
+        self.__connecting = False
+        #(socket, reason) of a failed send, handled as lost by the receive thread
+        self.__sendFailed = None
+        self.__session = RTDESession(robotModel, conf_filename, self._logger, historySeconds, frequency, columnLog)
+        self.__outputFields = outputFields
+        self.__recorder = None
+        if recordFile is not None:
+            self.__recorder = RTDERecorder(recordFile)
+        if sharedMemory is not None:
+            self.__session.publishSharedMemory(sharedMemory)
+        self.__stop_event = True
+        threading.Thread.__init__(self)
+
+        self.__sock = None
+        self.__frameBuffer = RTDEFrameBuffer()
+        self.start()
+        self._logger.info('RTDE constructor done')
+
+
+
+
+    def __connect(self):
+        '''
+        Start a non blocking connection to the RTDE server, completed by __connected when the socket is writable.
+
+        Return value:
+        success (boolean): False if the connection could not be started
+        '''
+        if self.__sock:
+            return True
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setblocking(False)
+        result = sock.connect_ex((self.__robotModel.ipAddress, 30004))
+        if result not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            sock.close()
+            return False
+        self.__sock = sock
+        self.__connecting = True
+        self.__deadline = time.time() + DEFAULT_TIMEOUT
+        return True
+
+    def __connected(self):
+        '''
+        Complete the connection and send the negotiation requests, see RTDESession.connectRequests
+
+        Return value:
+        success (boolean): False if the connection failed, a failed send is handled as lost by run, see __send
+        '''
+        if self.__sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) != 0:
+            return False
+        self.__sock.settimeout(DEFAULT_TIMEOUT)
+        self.__connecting = False
+        self.__frameBuffer.clear()
+        self.__session.connectionState = ConnectionState.CONNECTED
+        self.__deadline = time.time() + DEFAULT_TIMEOUT
+        for package in self.__session.connectRequests(self.__outputFields):
+            if not self.__send(package):
+                break
+        return True
+
+    def __disconnect(self):
+        '''
+        Close the RTDE connection.
+        '''
+        if self.__sock:
+            self.__sock.close()
+            self.__sock = None
+        self.__connecting = False
+        self.__session.connectionState = ConnectionState.DISCONNECTED
+        return True
+
+    def __lost(self, reason):
+        '''
+        Close a lost or failed connection and schedule the next attempt,
+        after a jittered exponential backoff if the connection was not running.
+        '''
+        if self.__session.connectionState >= ConnectionState.STARTED:
+            self._logger.warning('RTDE connection lost: ' + reason)
+            self.__session.metrics().recordReconnect()
+            self.__attempt = 0
+        else:
+            self._logger.debug('RTDE connection failed: ' + reason)
+        self.__disconnect()
+        self.__session.notifyAll()
+        delay = 0.
+        if self.__attempt > 0:
+            delay = min(self.__maxReconnectDelay, self.__reconnectDelay * 2**(self.__attempt-1)) * random.uniform(0.5, 1.)
+        self.__attempt += 1
+        self.__nextAttempt = time.time() + delay
+
+    def __isConnected(self):
+        '''
+        Returns True if the connection is open.
+
+        Return value:
+        open (boolean)
+        '''
+        return self.__session.connectionState > ConnectionState.DISCONNECTED
+
+    def isRunning(self):
+        '''
+        Return True if RTDE interface is running
+        '''
+
+        return self.__session.connectionState >= ConnectionState.STARTED
+
+    def session(self):
+        '''
+        Return the protocol session (RTDESession) of this interface.
+        '''
+        return self.__session
+
+    def __setupOutput(self, output_variables=None, types=[]):
+        '''
+        Configure the output package, see RTDESession.setupOutputsRequest
+
+        Return value:
+        success (boolean)
+        '''
+        if output_variables is None:
+            output_variables = self.__outputFields
+        package = self.__session.setupOutputsRequest(output_variables, types)
+        if package is None:
+            return False
+        self.__send(package)
+        return True
+
+    def __sendStart(self):
+        '''
+        Sends a start command to the RTDE server.
+        Setup of all inputs and outputs must be done before starting the RTDE interface
+
+        Return value:
+        success (boolean)
+        '''
+        self.__send(self.__session.startRequest())
+        return True
+
+    def __sendPause(self):
+        '''
+        Sends a pause command to the RTDE server
+        When paused it is possible to change the input and output configurations
+
+        Return value:
+        success (boolean)
+        '''
+        self.__send(self.__session.pauseRequest())
+        return True
+
+    def sendData(self, recipe=None, changedOnly=False):
+        '''
+        Send the input data to the RTDE server.
+        All input recipes are send, or with changedOnly only the recipes with data
+        changed since they were last send, see RTDESession.dataRequests
+        Returns True if successful.
+
+        Input parameters:
+        recipe (str): [Optional] Name of the input recipe to send
+        changedOnly (bool): [Optional] Only send the input recipes with changed data
+
+        Return value:
+        success (boolean)
+        '''
+        packages = self.__session.dataRequests(recipe, changedOnly)
+        if packages is None:
+            return
+        for package in packages:
+            if not self.__send(package):
+                return False
+        return True
+
+    def setData(self, variable_name, value):
+        '''
+        Set data to be send to the robot, see RTDESession.setData
+
+        Input parameters:
+        variable_name (List/str):  Variable name from the list of possible RTDE inputs
+        value (list/int/double)
+        '''
+        return self.__session.setData(variable_name, value)
+
+    def __send(self, package):
+        '''
+        Send a package (command and payload) to Robot Controller.
+        Also called from the threads of the application (e.g. sendData), so a failed send
+        only records the failure, the receive thread closes the connection and reconnects (see run).
+
+        Input parameters:
+        package (bytes or memoryview)
+
+        Return value:
+        success (boolean)
+        '''
+        sock = self.__sock
+        if sock is None:
+            self._logger.debug('Unable to send: not connected to Robot')
             return False
-        for i in range(len((l1))):
-            if l1[i] != l2[i]:
+
+        try:
+            (_, writable, _) = select.select([], [sock], [], DEFAULT_TIMEOUT)
+            if not len(writable):
+                self.__sendFailed = (sock, 'send timed out')
                 return False
+            sock.sendall(package)
+        except (OSError, ValueError) as e:
+            #ValueError if the socket was closed by the receive thread meanwhile
+            self.__sendFailed = (sock, 'send failed: ' + str(e))
+            return False
+        if self.__recorder is not None:
+            self.__recorder.recordPackage(RTDERecorder.SENT, package)
         return True
 
+    def __receive(self):
+        (readable, _, _) = select.select([self.__sock], [], [], DEFAULT_TIMEOUT)
+        nbytes = 0
+        if (len(readable)):
+            nbytes = self.__frameBuffer.recv(self.__sock)
+            if nbytes == 0:
+                self.__lost('disconnected by the server')
+                return None
+
+        packages = 0
+        for (packet_command, packet) in self.__frameBuffer.frames():
+            packages += 1
+            if(packet_command == 0):
+                self._logger.warning('skipping package - unexpected package type 0, receive buffer cleared')
+                self.__frameBuffer.clear()
+            else:
+                if self.__recorder is not None:
+                    self.__recorder.record(RTDERecorder.RECEIVED, packet_command, packet)
+                self.__session.handlePackage(packet_command, packet)
+                if packet_command != Command.RTDE_DATA_PACKAGE and self.__session.isNegotiating():
+                    self.__negotiate(packet_command)
+        if nbytes:
+            self.__session.metrics().recordRead(nbytes, packages)
+        return nbytes
+
+    def __negotiate(self, packet_command):
+        '''
+        Send the next requests of the negotiation, see RTDESession.negotiate
+        '''
+        packages = self.__session.negotiate(packet_command)
+        if packages is None:
+            if self.__session.setupError() is not None:
+                #Reconnecting does not help, stop the interface
+                self.__stop_event = True
+                raise ValueError(self.__session.setupError())
+            raise ValueError('RTDE negotiation failed')
+        for package in packages:
+            self.__send(package)
+        if not self.__session.isNegotiating():
+            self.__deadline = None
+            if self.__session.connectionState == ConnectionState.STARTED:
+                self.__attempt = 0
+                self._logger.info('RTDE interface started')
+            else:
+                raise ValueError('RTDE interface not able to start')
+
+    def sampleSequence(self):
+        '''
+        Return the sequence number of the latest received data package, see RTDESession.sampleSequence
+        '''
+        return self.__session.sampleSequence()
+
+    def wait_for_sample(self, after_seq=None, timeout=DEFAULT_TIMEOUT):
+        '''
+        Wait until a data package newer than after_seq has been received and the robot model updated.
+        See RTDESession.wait_for_sample
+
+        Input parameters:
+        after_seq (int): [Optional] Sequence number to wait beyond, default is the latest received package
+        timeout (float): [Optional] Max time to wait in seconds, None waits forever
+
+        Return value:
+        sequence (int): Sequence number of the latest package, None if timed out
+        '''
+        return self.__session.wait_for_sample(after_seq, timeout)
+
+    def subscribe(self, predicate, callback=None, once=True):
+        '''
+        Register a predicate evaluated by the receive thread once per data package,
+        see RTDESession.subscribe and RTDESubscription for details.
+
+        Return value:
+        subscription (RTDESubscription)
+        '''
+        return self.__session.subscribe(predicate, callback, once)
+
+    def unsubscribe(self, subscription):
+        '''
+        Remove a subscription, see subscribe.
+        '''
+        self.__session.unsubscribe(subscription)
+
+    def frameBufferStats(self):
+        '''
+        Return the counters of the receive buffer, see RTDEFrameBuffer.stats
+
+        Return value:
+        stats (dict)
+        '''
+        return self.__frameBuffer.stats()
+
+    def history(self, name=None, seconds=None, samples=None, copy=False):
+        '''
+        Return the latest window of an output field from the history, see RTDESession.history
+
+        Example:
+        (t, force) = rob.history('actual_TCP_force', seconds=2.0)
+        '''
+        return self.__session.history(name, seconds, samples, copy)
+
+    def startUsageTracking(self):
+        '''
+        Start recording which output fields the application reads from the robot model,
+        see RobotModel.trackUsage and reduceOutputRecipe.
+        '''
+        self.__robotModel.trackUsage(True)
+
+    def reduceOutputRecipe(self, fields=[], timeout=DEFAULT_TIMEOUT):
+        '''
+        Stop the usage tracking (see startUsageTracking) and renegotiate the output recipe,
+        so only the fields of the current recipe read by the application during the tracking
+        are received, together with REQUIRED_OUTPUT_FIELDS and fields. Fields used by
+        subscription predicates or the history must be given in fields,
+        as they do not read from the robot model.
+
+        Input parameters:
+        fields (list<str>): [Optional] Fields to keep in addition to the used fields
+        timeout (float): Max time to wait for the first package with the new recipe
+
+        Return value:
+        success (boolean)
+
+        Example:
+        rob.startUsageTracking()
+        ... warm-up run of the application ...
+        rob.reduceOutputRecipe()
+        '''
+        self.__robotModel.trackUsage(False)
+        decoder = self.__session.outputDecoder()
+        if decoder is None:
+            self._logger.error('reduceOutputRecipe: No output recipe set up')
+            return False
+        used = self.__robotModel.usedFields() | set(fields) | set(self.REQUIRED_OUTPUT_FIELDS)
+        names = [name for name in decoder.names if name in used]
+        self._logger.info('Output recipe reduced from ' + str(len(decoder.names)) + ' to ' + str(len(names)) + ' fields')
+        return self.setupOutputRecipe(names, timeout)
+
+    def setupOutputRecipe(self, output_variables, timeout=DEFAULT_TIMEOUT):
+        '''
+        Change the output recipe while running, by pausing, setting up the outputs and starting again.
+        The recipe is also used when reconnecting.
+
+        Input parameters:
+        output_variables (list<str>): Output fields to receive, timestamp is always included
+        timeout (float): Max time to wait for the first package with the new recipe
+
+        Return value:
+        success (boolean)
+        '''
+        names = ['timestamp'] + [name for name in output_variables if name != 'timestamp']
+        self.__outputFields = names
+        if not self.isRunning():
+            return False
+        self.__sendPause()
+        self.__setupOutput(names)
+        self.__sendStart()
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            sequence = self.__session.wait_for_sample(timeout=deadline-time.time())
+            decoder = self.__session.outputDecoder()
+            if sequence is not None and decoder is not None and decoder.names == names:
+                return True
+        self._logger.warning('setupOutputRecipe: No package received with the new output recipe')
+        return False
+
+    def metrics(self):
+        '''
+        Return the link quality measurements (RTDEMetrics) of the connection,
+        with histograms of package inter-arrival time, timestamp delta, decode time and
+        socket read sizes, and counters of lost packages and reconnects.
+
+        Example:
+        print(rob.metrics().snapshot()['timestampDelta']['percentiles'])
+        rob.metrics().dump('rtdeMetrics.json')
+        '''
+        return self.__session.metrics()
+
+    def outputDecoder(self):
+        '''
+        Return the compiled decoder of the accepted output recipe, see RTDEOutputDecoder.
+        '''
+        return self.__session.outputDecoder()
+
     def __wait(self):
         '''Wait while the data receiving thread is receiving a new data set.'''
         cnt = 0
-        while self.__conn_state < ConnectionState.STARTED:
+        while self.__session.connectionState < ConnectionState.STARTED:
             time.sleep(1)
             cnt +=1
             if cnt>5:
                 self._logger.warning('wait_rtde timed out while RTDE interface not running')
                 return False
 
-        with self.__dataEvent:
-            self.__dataEvent.wait()
+        self.__session.wait()
         return True
 
 
 
     '''Threading Data receive'''
+    def stopRecording(self):
+        '''
+        Stop recording and close the recording files, see recordFile.
+        '''
+        if self.__recorder is not None:
+            self.__recorder.close()
+            self.__recorder = None
+
     def close(self):
         if self.__stop_event is False:
             self.__stop_event = True
             self.__wait()
             self.join()
             self.__disconnect()
+        self.stopRecording()
+        self.__session.closeSharedMemory()
+        self.__session.closeColumnLog()
 
     def run(self):
         self.__stop_event = False
         t0 = time.time()
-        while (time.time()-t0<self.__reconnectTimeout) and self.__conn_state != ConnectionState.STARTED:
-            self.__connect()
-            self.__disconnect()
-            self.__connect()
-            self.__getControllerVersion()
-            self.__receive()
-            self.__negotiateProtocolVersion(1)
-            self.__receive()
-            self.__setupOutput()
-            self.__receive()
-            self.__setupInput()
-            self.__receive()
-            self.__sendStart()
-            self.__receive()
-            #time.sleep(0.5)
-        if self.__conn_state != ConnectionState.STARTED:
-            self._logger.error("RTDE interface not able to connect and timed out!")
-            return
-
         while (not self.__stop_event) and (time.time()-t0<self.__reconnectTimeout):
             try:
-                #self.__receive(Command.RTDE_DATA_PACKAGE)
-                #startTime = time.time()
-                self.__receive()
+                sendFailed = self.__sendFailed
+                if sendFailed is not None:
+                    self.__sendFailed = None
+                    if sendFailed[0] is self.__sock:
+                        self.__lost(sendFailed[1])
+                        continue
+                if self.__sock is None:
+                    delay = self.__nextAttempt - time.time()
+                    if delay > 0:
+                        time.sleep(min(delay, 0.1))
+                    elif not self.__connect():
+                        self.__lost('not able to connect')
+                elif self.__connecting:
+                    (_, writable, _) = select.select([], [self.__sock], [], 0.1)
+                    if len(writable):
+                        if not self.__connected():
+                            self.__lost('not able to connect')
+                    elif time.time() > self.__deadline:
+                        self.__lost('connect timed out')
+                elif self.__receive():
+                    self.__lastData = time.time()
+                elif self.__sock is not None:
+                    if self.__deadline is not None and time.time() > self.__deadline:
+                        self.__lost('negotiation timed out')
+                    elif self.__session.connectionState == ConnectionState.STARTED and time.time()-self.__lastData > self.__session.dataTimeout():
+                        self.__lost('no data received')
+            except Exception as e:
+                self._logger.error('RTDE error: ' + str(e))
+                self.__lost(str(e))
+            if self.__session.connectionState == ConnectionState.STARTED:
                 t0 = time.time()
-                #delta = t0-startTime
-                #print("Time to recieve: " + str(delta))
-            except Exception:
-                if self.__conn_state >= ConnectionState.STARTED:
-                    self.__conn_state = ConnectionState.ERROR
-                    self._logger.error("RTDE interface stopped running")
-
-                self.__sendPause()
-                if not self.__sendStart():
-                    self.__disconnect()
-                    time.sleep(1)
-                    self.__connect()
-                    self.__setupOutput()
-                    self.__setupInput()
-                    self.__sendStart()
-
-                if self.__conn_state == ConnectionState.STARTED:
-                    self._logger.info("RTDE interface restarted")
-                else:
-                    self._logger.warning("RTDE reconnection failed!")
 
+        if not self.__stop_event:
+            self._logger.error("RTDE interface not able to connect and timed out!")
         self.__sendPause()
-        with self.__dataEvent:
-            self.__dataEvent.notifyAll()
+        self.__session.notifyAll()
         self._logger.info("RTDE interface is stopped")
 
 
 class RTDE_IO_Config(object):
-    __slots__ = ['id', 'names', 'types', 'fmt']
+    __slots__ = ['id', 'names', 'types', 'fmt', 'decoder', 'encoder']
     @staticmethod
     def unpack_recipe(buf, has_recipe_id):
         rmd = RTDE_IO_Config();
+        rmd.decoder = None
+        rmd.encoder = None
         if has_recipe_id:
             rmd.id = struct.unpack_from('>B', buf)[0]
             fmt = ">" + str(len(buf)) + "B"
@@ -674,6 +1968,7 @@ class RTDE_IO_Config(object):
             rmd.types = buf.split(',')
             rmd.fmt = '>B'
         else:
+            rmd.id = None
             fmt = ">" + str(len(buf)) + "B"
             buf = struct.unpack_from(fmt, buf)
             buf = ''.join(map(chr,buf[:]))
@@ -708,10 +2003,295 @@ class RTDE_IO_Config(object):
         l = state.pack(self.names, self.types)
         return struct.pack(self.fmt, *l)
 
+    def compile(self):
+        '''
+        Compile the recipe into a RTDEOutputDecoder, used by unpack from now on.
+        Names must be set before compiling. The decoder takes the payload without recipe id.
+
+        Return value:
+        decoder (RTDEOutputDecoder)
+        '''
+        fmt = self.fmt if self.id is None else '>' + self.fmt[2:]
+        self.decoder = RTDEOutputDecoder(self.names, self.types, fmt)
+        return self.decoder
+
+    def compileInput(self):
+        '''
+        Compile the input recipe into a RTDEInputEncoder.
+        Names and id must be set before compiling.
+
+        Return value:
+        encoder (RTDEInputEncoder)
+        '''
+        self.encoder = RTDEInputEncoder(self.names, self.types, self.id)
+        return self.encoder
+
     def unpack(self, data):
+        if self.decoder is not None:
+            return self.decoder.unpack(data)
         li =  struct.unpack_from(self.fmt, data)
         return RTDEDataObject.unpack(li, self.names, self.types)
 
+class RTDEOutputDecoder(object):
+    '''
+    Output recipe compiled once into a numpy structured dtype.
+
+    A data package payload is decoded with one numpy take, reordering the big endian wire bytes
+    into a preallocated record with a field of the native type per output field (DOUBLE as float64,
+    UINT64 as uint64, VECTOR6INT32 as 6 int32 etc.), so integer fields are exact. The record has a named
+    view per field (views), so the latest package can be read without creating new objects.
+
+    unpack returns a read only copy of the record wrapped in an RTDEPackage, a dictionary like object
+    building the value of a field only when it is read.
+
+    Input parameters:
+    names (list<str>): Field names of the output recipe
+    types (list<str>): RTDE types of the fields
+    fmt (str): [Optional] struct format matching the types, as made by RTDE_IO_Config.unpack_recipe (only used to validate the types)
+
+    Example:
+    decoder = RTDEOutputDecoder(['timestamp', 'actual_q'], ['DOUBLE', 'VECTOR6D'])
+    decoder.decode(payload)
+    print(decoder.views['actual_q'])
+    '''
+    #Wire (big endian) type and number of elements of the RTDE types
+    DTYPES = {'DOUBLE':('>f8', 1),
+              'UINT64':('>u8', 1),
+              'UINT32':('>u4', 1),
+              'INT32':('>i4', 1),
+              'UINT8':('u1', 1),
+              'BOOL':('?', 1),
+              'VECTOR3D':('>f8', 3),
+              'VECTOR6D':('>f8', 6),
+              'VECTOR6INT32':('>i4', 6),
+              'VECTOR6UINT32':('>u4', 6)}
+
+    def __init__(self, names, types, fmt=None):
+        if len(names) != len(types):
+            raise ValueError('List sizes are not identical.')
+        for dataType in types:
+            if dataType not in self.DTYPES:
+                raise ValueError('Unknown data type: ' + str(dataType))
+        self.names = list(names)
+        self.types = list(types)
+        wire = []
+        for ii in range(len(names)):
+            (dtype, size) = self.DTYPES[types[ii]]
+            wire.append((names[ii], dtype) if size == 1 else (names[ii], dtype, (size,)))
+        self.wireDtype = np.dtype(wire)
+        self.dtype = self.wireDtype.newbyteorder('=')
+        self.size = self.wireDtype.itemsize
+        if fmt is not None and struct.calcsize(fmt) != self.size:
+            raise ValueError('Output recipe format does not match the field types')
+
+        #Byte order of the record: for each element the index of its bytes in the payload, most significant last
+        order = []
+        for name in self.names:
+            (fieldType, offset) = self.wireDtype.fields[name][:2]
+            itemsize = fieldType.base.itemsize
+            if sys.byteorder == 'big':
+                order.extend(range(offset, offset + fieldType.itemsize))
+                continue
+            for start in range(offset, offset + fieldType.itemsize, itemsize):
+                order.extend(range(start + itemsize - 1, start - 1, -1))
+        self.__order = np.array(order, np.intp)
+        self.buffer = np.zeros(self.size, np.uint8)
+        self.record = np.ndarray((), self.dtype, self.buffer)
+        self.views = {}
+        for name in self.names:
+            self.views[name] = self.record[name]
+        self.__scalars = frozenset(self.names[ii] for ii in range(len(names)) if self.DTYPES[types[ii]][1] == 1)
+        self.__vectors = [name for name in self.names if name not in self.__scalars]
+
+    def decode(self, payload):
+        '''
+        Decode a data package payload into the record.
+
+        Return value:
+        record (numpy array): The record, a 0-d array of the structured dtype
+        '''
+        np.take(np.frombuffer(payload, np.uint8, self.size), self.__order, out=self.buffer, mode='clip')
+        return self.record
+
+    def unpack(self, payload):
+        '''
+        Decode a data package payload into the record and return a read only copy of it
+        as an RTDEPackage. Values are built when read, vector values are read only views of the copy.
+        '''
+        self.decode(payload)
+        return RTDEPackage(np.ndarray((), self.dtype, self.buffer.tobytes()), self)
+
+    def value(self, row, name):
+        '''
+        Return the value of a field of a row (a record or a copy of it) as in RobotModel.dataDir:
+        a Python int, float or bool for scalar fields and a numpy array view for vector fields.
+        '''
+        if name in self.__scalars:
+            return row[name].item()
+        return row[name]
+
+    def values(self, row):
+        '''
+        Return the values of all fields of a row as a dictionary, see value.
+        '''
+        values = dict(zip(self.names, row.item()))
+        for name in self.__vectors:
+            values[name] = row[name]
+        return values
+
+class RTDEPackage(collections.abc.Mapping):
+    '''
+    The values of one decoded output package, see RTDEOutputDecoder.unpack.
+    Read like a dictionary of field name and value. The value of a field is built from the row
+    the first time it is read, so fields nobody reads cost nothing. Values added with update
+    (e.g. derived channels) are kept in addition to the fields of the row.
+
+    row (numpy array): Read only 0-d array of the structured dtype of the decoder
+    '''
+    __slots__ = ['row', '_RTDEPackage__decoder', '_RTDEPackage__values', '_RTDEPackage__extra']
+
+    def __init__(self, row, decoder):
+        self.row = row
+        self.__decoder = decoder
+        self.__values = {}
+        self.__extra = []
+
+    def __getitem__(self, key):
+        try:
+            return self.__values[key]
+        except KeyError:
+            pass
+        try:
+            value = self.__decoder.value(self.row, key)
+        except (ValueError, IndexError):
+            raise KeyError(key)
+        self.__values[key] = value
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key in self.__values or key in self.row.dtype.fields
+
+    def __iter__(self):
+        for name in self.__decoder.names:
+            yield name
+        for name in self.__extra:
+            yield name
+
+    def __len__(self):
+        return len(self.__decoder.names) + len(self.__extra)
+
+    def copy(self):
+        '''
+        Return all values of the package as a dictionary, built at once.
+        '''
+        values = self.__decoder.values(self.row)
+        values.update(self.__values)
+        return values
+
+    def update(self, values):
+        '''
+        Add values to the package (e.g. derived channels), only before the package is published.
+        '''
+        for (key, value) in values.items():
+            if key not in self:
+                self.__extra.append(key)
+            self.__values[key] = value
+
+class RTDEInputEncoder(object):
+    '''
+    Input recipe compiled once into a struct.Struct and a preallocated send buffer.
+
+    The send buffer holds the complete data package, header and recipe id included,
+    and the header is written once. Values are kept in a list in recipe order (values)
+    and packed in place into the send buffer with pack_into, so encoding a package
+    does not build a new bytes object.
+
+    Input parameters:
+    names (list<str>): Field names of the input recipe
+    types (list<str>): RTDE types of the fields
+    recipeId (int): Recipe id given by the controller
+
+    Example:
+    encoder = RTDEInputEncoder(['input_int_register_0'], ['INT32'], 1)
+    encoder.set('input_int_register_0', 5)
+    sock.sendall(encoder.encode())
+    '''
+    def __init__(self, names, types, recipeId):
+        if len(names) != len(types):
+            raise ValueError('List sizes are not identical.')
+        self.names = list(names)
+        self.types = list(types)
+        self.recipeId = recipeId
+        header = RTDEFrameBuffer.HEADER.size + 1
+        self.__struct = struct.Struct(RTDE_IO_Config.unpack_recipe(','.join(types).encode('utf-8'), False).fmt)
+        self.size = header + self.__struct.size
+
+        self.slices = {}
+        index = 0
+        for ii in range(len(names)):
+            size = RTDEDataObject.get_item_size(types[ii])
+            self.slices[names[ii]] = slice(index, index+size) if types[ii].startswith('VECTOR') else index
+            index += size
+        self.values = [None] * index
+
+        self.buffer = bytearray(self.size)
+        RTDEFrameBuffer.HEADER.pack_into(self.buffer, 0, self.size, Command.RTDE_DATA_PACKAGE)
+        self.buffer[header-1] = recipeId
+        self.__header = header
+        self.__view = memoryview(self.buffer)
+
+    def set(self, name, value):
+        '''
+        Set the value of a field.
+
+        Input parameters:
+        name (str): Field name
+        value (int/float/list)
+
+        Return value:
+        changed (bool): True if the value is different from the current value
+        '''
+        index = self.slices[name]
+        if type(index) is slice:
+            value = list(value)
+            if len(value) != index.stop - index.start:
+                raise ValueError(name + ' needs ' + str(index.stop - index.start) + ' values, got ' + str(len(value)))
+        if self.values[index] == value:
+            return False
+        self.values[index] = value
+        return True
+
+    def setRecipeId(self, recipeId):
+        '''
+        Change the recipe id, when the recipe is accepted again with a new id after a reconnect.
+        '''
+        self.recipeId = recipeId
+        self.buffer[self.__header-1] = recipeId
+
+    def get(self, name):
+        '''
+        Return the current value of a field.
+        '''
+        return self.values[self.slices[name]]
+
+    def encode(self):
+        '''
+        Pack the values into the send buffer.
+
+        Return value:
+        package (memoryview): The complete data package, only valid until the next encode
+        '''
+        if None in self.values:
+            raise ValueError('Uninitialized parameter: ' + self.names[self.values.index(None)])
+        self.__struct.pack_into(self.buffer, self.__header, *self.values)
+        return self.__view
+
 class RTDEDataObject(object):
     '''
     Data container for data send to or received from the Robot Controller.
@@ -0,0 +1,311 @@
+'''
+Python 3.x library to control an UR robot through its TCP/IP interfaces
+Copyright (C) 2017  Martin Huus Bjerge, Rope Robotics ApS, Denmark
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+and associated documentation files (the "Software"), to deal in the Software without restriction,
+including without limitation the rights to use, copy, modify, merge, publish, distribute,
+sublicense, and/or sell copies of the Software, and to permit persons to whom the Software
+is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL "Rope Robotics ApS" BE LIABLE FOR ANY CLAIM,
+DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Except as contained in this notice, the name of "Rope Robotics ApS" shall not be used
+in advertising or otherwise to promote the sale, use or other dealings in this Software
+without prior written authorization from "Rope Robotics ApS".
+'''
+__author__ = "Martin Huus Bjerge"
+__copyright__ = "Copyright 2017, Rope Robotics ApS, Denmark"
+__license__ = "MIT License"
+
+import URBasic
+import gc
+import itertools
+import sys
+import json
+import math
+import time
+import struct
+import platform
+import argparse
+import multiprocessing
+import URBasic.configuration
+from URBasic.rtde import RTDE_IO_Config, RTDEDataObject
+from URBasic.rtdeServer import OUTPUT_TYPES, RTDEServer
+
+
+def _serve(frequency, ready, stop):
+    '''
+    Run a RTDEServer in a benchmark sub process until stop is set.
+    '''
+    server = RTDEServer(port=30004, frequency=frequency, maxProtocol=1)
+    ready.set()
+    stop.wait()
+    server.close()
+
+
+class RTDEBenchmark(object):
+    '''
+    Benchmark suite of the RTDE hot path. Each benchmark adds a result dictionary to results,
+    and all results can be written as json (see dump) to track regressions over time.
+
+    Micro benchmarks (per call, best of repeat):
+    unpack_recipe, unpack, unpack compiled, pack: RTDE_IO_Config across recipe sizes
+    unpack_field: RTDEDataObject.unpack_field per data type
+    logdata: DataLog.logdata on robot model data of the default configuration
+
+    Macro benchmark:
+    receive: The RTDE receive thread fed by a RTDEServer in a sub process at a packet rate
+
+    Result keys:
+    nsPerCall: Time per call (one call is one packet) [ns]
+    nsPerField: Time per field of the recipe [ns]
+    packetsPerSecond: Calls (packets) per second
+    blocksPerCall: Memory blocks allocated per call that are still alive after the call,
+                   i.e. the objects created for the result (transient allocations are not counted)
+
+    Input parameters:
+    number (int): Calls per repetition of the micro benchmarks
+    repeat (int): Repetitions of the micro benchmarks, the fastest is reported
+    sizes (list<int>): Recipe sizes (number of fields) of the micro benchmarks, max 96
+
+    Example:
+    python -m URBasic.rtdeBenchmark --output benchmark.json
+
+    bench = URBasic.rtdeBenchmark.RTDEBenchmark()
+    bench.runMicro()
+    bench.runReceive(rate=500, seconds=5)
+    bench.dump('benchmark.json')
+    '''
+
+    def __init__(self, number=2000, repeat=5, sizes=(1, 10, 30, 96)):
+        self.number = number
+        self.repeat = repeat
+        self.sizes = [min(size, 96) for size in sizes]
+        self.results = []
+
+    @staticmethod
+    def recipe(size):
+        '''
+        Return the names and types of an output recipe with size fields, timestamp first.
+        '''
+        names = list(OUTPUT_TYPES.keys())[0:size]
+        return (names, [OUTPUT_TYPES[name] for name in names])
+
+    @staticmethod
+    def payload(names, types, sample=0, recipeId=None):
+        '''
+        Return a data package payload of the recipe with values changing by sample.
+        '''
+        values = []
+        fmt = '>'
+        if recipeId is not None:
+            values.append(recipeId)
+            fmt += 'B'
+        fmt += RTDE_IO_Config.unpack_recipe(','.join(types).encode('utf-8'), False).fmt[1:]
+        for ii in range(len(names)):
+            if names[ii] == 'timestamp':
+                values.append(sample * 0.002)
+            elif types[ii] in ('VECTOR6D', 'VECTOR3D'):
+                values.extend([math.sin(sample * 0.01 + jj) for jj in range(RTDEDataObject.get_item_size(types[ii]))])
+            elif types[ii] == 'DOUBLE':
+                values.append(math.cos(sample * 0.01 + ii))
+            elif types[ii].startswith('VECTOR'):
+                values.extend([(sample + jj) % 100 for jj in range(6)])
+            else:
+                values.append((sample + ii) % 100)
+        return struct.pack(fmt, *values)
+
+    def __measure(self, function, args, number=None):
+        '''
+        Time a function, returning (ns per call, blocks per call).
+        '''
+        if number is None:
+            number = self.number
+        results = [None] * number
+        best = None
+        gcEnabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(self.repeat):
+                t0 = time.perf_counter_ns()
+                for ii in range(number):
+                    results[ii] = function(*args)
+                elapsed = time.perf_counter_ns() - t0
+                if best is None or elapsed < best:
+                    best = elapsed
+            for ii in range(number):
+                results[ii] = None
+            blocks = sys.getallocatedblocks()
+            for ii in range(number):
+                results[ii] = function(*args)
+            blocks = sys.getallocatedblocks() - blocks
+        finally:
+            if gcEnabled:
+                gc.enable()
+        return (best / number, max(0., blocks / number))
+
+    def __add(self, name, fields, nsPerCall, blocksPerCall=None, **extra):
+        result = {'name': name,
+                  'fields': fields,
+                  'nsPerCall': nsPerCall,
+                  'nsPerField': nsPerCall / fields if fields else None,
+                  'packetsPerSecond': 1e9 / nsPerCall if nsPerCall else None,
+                  'blocksPerCall': blocksPerCall}
+        result.update(extra)
+        self.results.append(result)
+        return result
+
+    def runMicro(self):
+        '''
+        Run the micro benchmarks of RTDE_IO_Config, RTDEDataObject and DataLog.
+        '''
+        for size in self.sizes:
+            (names, types) = self.recipe(size)
+            recipe = struct.pack('>B', 1) + ','.join(types).encode('utf-8')
+            self.__add('unpack_recipe', size, *self.__measure(RTDE_IO_Config.unpack_recipe, (recipe, True)))
+
+            config = RTDE_IO_Config.unpack_recipe(recipe[1:], False)
+            config.names = names
+            data = self.payload(names, types, 1)
+            values = config.unpack(data)
+            self.__add('unpack', size, *self.__measure(config.unpack, (data,)))
+
+            config.compile()
+            self.__add('unpack compiled', size, *self.__measure(config.unpack, (data,)))
+            self.__add('decode compiled', size, *self.__measure(config.decoder.decode, (data,)))
+
+            state = RTDEDataObject.create_empty(names, None)
+            state.__dict__.update(values)
+            self.__add('pack', size, *self.__measure(config.pack, (state,)))
+
+        for dataType in ('DOUBLE', 'UINT32', 'UINT64', 'INT32', 'UINT8', 'VECTOR3D', 'VECTOR6D', 'VECTOR6INT32', 'VECTOR6UINT32'):
+            data = tuple(range(6))
+            self.__add('unpack_field ' + dataType, 1, *self.__measure(RTDEDataObject.unpack_field, (data, 0, dataType)))
+
+        self.runDataLog()
+        return self.results
+
+    def runDataLog(self, conf_filename=None, samples=1000):
+        '''
+        Benchmark DataLog.logdata on robot model data decoded from the output recipe
+        of the RTDE configuration, with all values changing each sample.
+        '''
+        if conf_filename is None:
+            conf_filename = URBasic.configuration.defaultPath('rtdeConfigurationDefault.xml')
+        outputs = URBasic.configuration.RTDEConfiguration.load(conf_filename).outputs
+        names = list(outputs.names[1:])
+        types = list(outputs.types[1:])
+        decoder = URBasic.rtde.RTDEOutputDecoder(names, types)
+        robotModel = URBasic.robotModel.RobotModel()
+        dataDirs = []
+        for sample in range(samples):
+            dataDir = dict(robotModel.dataDir)
+            dataDir.update(decoder.unpack(self.payload(names, types, sample)).copy())
+            dataDirs.append(dataDir)
+
+        dataLog = URBasic.dataLog.DataLog(robotModel)
+        dataLog.close()
+        dataLog.logdata(dataDirs[-1])
+        samples = itertools.cycle(dataDirs)
+        (nsPerCall, _) = self.__measure(lambda: dataLog.logdata(next(samples)), (), len(dataDirs))
+        return self.__add('logdata', len(names), nsPerCall)
+
+    def runReceive(self, rate=500, seconds=5.):
+        '''
+        Benchmark the receive path of RTDE (socket read, framing, decoding and robot model update)
+        fed by a RTDEServer in a sub process on the local host at rate packets per second.
+        The server uses protocol version 1 so it is not limited by the frequency negotiation.
+
+        Input parameters:
+        rate (float): Packets per second send by the server, e.g. 100000 to measure the max throughput
+        seconds (float): Duration of the measurement
+        '''
+        ready = multiprocessing.Event()
+        stop = multiprocessing.Event()
+        server = multiprocessing.Process(target=_serve, args=(rate, ready, stop))
+        server.daemon = True
+        server.start()
+        try:
+            if not ready.wait(10):
+                raise ValueError('RTDE benchmark server did not start')
+            robotModel = URBasic.robotModel.RobotModel()
+            robotModel.ipAddress = '127.0.0.1'
+            rtde = URBasic.rtde.RTDE(robotModel)
+            try:
+                if rtde.wait_for_sample(timeout=5) is None:
+                    raise ValueError('RTDE benchmark received no data')
+                fields = len(rtde.outputDecoder().names)
+                rtde.metrics().reset()
+                frameBuffer = rtde.frameBufferStats()
+                cpu = time.process_time()
+                time.sleep(seconds)
+                cpu = time.process_time() - cpu
+                metrics = rtde.metrics().snapshot()
+                frameBufferEnd = rtde.frameBufferStats()
+            finally:
+                rtde.close()
+        finally:
+            stop.set()
+            server.join(10)
+
+        packets = max(1, metrics['packages'])
+        return self.__add('receive', fields, cpu * 1e9 / packets,
+                          rate=rate,
+                          seconds=seconds,
+                          packets=metrics['packages'],
+                          receivedPerSecond=metrics['packages'] / seconds,
+                          cpuPerPacketNs=cpu * 1e9 / packets,
+                          decodeNs=metrics['decode']['percentiles'],
+                          arrivalNs=metrics['arrival']['percentiles'],
+                          packetsPerRead=metrics['readPackages']['mean'],
+                          allocationsPerPacket=(frameBufferEnd['allocations'] - frameBuffer['allocations']) / packets,
+                          copiesPerPacket=(frameBufferEnd['copies'] - frameBuffer['copies']) / packets)
+
+    def report(self):
+        '''
+        Return the results with a description of the environment as a dictionary.
+        '''
+        return {'time': time.time(),
+                'python': sys.version,
+                'implementation': platform.python_implementation(),
+                'platform': platform.platform(),
+                'machine': platform.machine(),
+                'number': self.number,
+                'repeat': self.repeat,
+                'results': self.results}
+
+    def dump(self, filename=None):
+        '''
+        Write the report (see report) as json to a file, or to stdout if filename is None.
+        '''
+        if filename is None:
+            json.dump(self.report(), sys.stdout, indent=2)
+            sys.stdout.write('\n')
+        else:
+            with open(filename, 'w') as f:
+                json.dump(self.report(), f, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark of the URBasic RTDE hot path')
+    parser.add_argument('--output', help='json file of the results, default stdout')
+    parser.add_argument('--number', type=int, default=2000, help='calls per repetition of the micro benchmarks')
+    parser.add_argument('--repeat', type=int, default=5, help='repetitions of the micro benchmarks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 30, 96], help='recipe sizes of the micro benchmarks')
+    parser.add_argument('--rates', type=float, nargs='*', default=[125, 500, 1000], help='packet rates of the receive benchmark')
+    parser.add_argument('--seconds', type=float, default=3., help='duration of each receive benchmark')
+    args = parser.parse_args()
+
+    bench = RTDEBenchmark(args.number, args.repeat, args.sizes)
+    bench.runMicro()
+    for rate in args.rates:
+        bench.runReceive(rate, args.seconds)
+    bench.dump(args.output)
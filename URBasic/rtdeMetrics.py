@@ -0,0 +1,272 @@
+'''
+Python 3.x library to control an UR robot through its TCP/IP interfaces
+Copyright (C) 2017  Martin Huus Bjerge, Rope Robotics ApS, Denmark
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+and associated documentation files (the "Software"), to deal in the Software without restriction,
+including without limitation the rights to use, copy, modify, merge, publish, distribute,
+sublicense, and/or sell copies of the Software, and to permit persons to whom the Software
+is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL "Rope Robotics ApS" BE LIABLE FOR ANY CLAIM,
+DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Except as contained in this notice, the name of "Rope Robotics ApS" shall not be used
+in advertising or otherwise to promote the sale, use or other dealings in this Software
+without prior written authorization from "Rope Robotics ApS".
+'''
+__author__ = "Martin Huus Bjerge"
+__copyright__ = "Copyright 2017, Rope Robotics ApS, Denmark"
+__license__ = "MIT License"
+
+import json
+import time
+import numpy as np
+
+
+class HdrHistogram(object):
+    '''
+    Histogram of positive integer values with a fixed relative precision (HDR histogram layout).
+    Values are counted in buckets covering a power of 2 each, divided in linear sub buckets,
+    so recording a value is a few integer operations and the memory use is fixed.
+
+    Input parameters:
+    highest (int): Highest value to record, larger values are counted as highest
+    significantDigits (int): Number of significant decimal digits kept for each value
+    unit (str): Unit of the values, only used for reporting
+
+    Example:
+    hist = HdrHistogram(10**9, 2, 'ns')
+    hist.record(2000000)
+    print(hist.percentile(99.9))
+    '''
+
+    def __init__(self, highest=60*10**9, significantDigits=2, unit='ns'):
+        largest = 2 * 10**significantDigits
+        self.__subBucketBits = int(np.ceil(np.log2(largest)))
+        self.__subBucketHalfCountMagnitude = self.__subBucketBits - 1
+        self.__subBucketHalfCount = 1 << self.__subBucketHalfCountMagnitude
+        self.__subBucketMask = (1 << self.__subBucketBits) - 1
+        self.highest = int(highest)
+        self.unit = unit
+        self.__counts = [0] * (self.__countsIndex(self.highest) + 1)
+        self.reset()
+
+    def reset(self):
+        '''
+        Clear all counts.
+        '''
+        for ii in range(len(self.__counts)):
+            self.__counts[ii] = 0
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def __countsIndex(self, value):
+        bucketIndex = (value | self.__subBucketMask).bit_length() - self.__subBucketBits
+        subBucketIndex = value >> bucketIndex
+        return ((bucketIndex + 1) << self.__subBucketHalfCountMagnitude) + subBucketIndex - self.__subBucketHalfCount
+
+    def __valueFromIndex(self, index):
+        bucketIndex = (index >> self.__subBucketHalfCountMagnitude) - 1
+        subBucketIndex = (index & (self.__subBucketHalfCount - 1)) + self.__subBucketHalfCount
+        if bucketIndex < 0:
+            subBucketIndex -= self.__subBucketHalfCount
+            bucketIndex = 0
+        return subBucketIndex << bucketIndex
+
+    def record(self, value):
+        '''
+        Count a value.
+
+        Input parameters:
+        value (int): Value to count, negative values are counted as 0
+        '''
+        value = int(value)
+        if value < 0:
+            value = 0
+        elif value > self.highest:
+            value = self.highest
+        self.__counts[self.__countsIndex(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def mean(self):
+        '''
+        Return the mean of the recorded values, None if empty.
+        '''
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+    def percentile(self, percentile):
+        '''
+        Return the value at a percentile (0-100) of the recorded values, None if empty.
+        The value is the lowest value of its sub bucket, so the relative error is given
+        by the significant digits.
+        '''
+        if self.count == 0:
+            return None
+        cumulative = np.cumsum(self.__counts)
+        index = int(np.searchsorted(cumulative, max(1, int(np.ceil(percentile / 100. * self.count)))))
+        return min(max(self.__valueFromIndex(index), self.min), self.max)
+
+    def buckets(self):
+        '''
+        Return the non-empty buckets.
+
+        Return value:
+        buckets (list): List of (lowest value, count)
+        '''
+        return [(self.__valueFromIndex(ii), count) for ii, count in enumerate(self.__counts) if count]
+
+    def snapshot(self, percentiles=(50., 90., 99., 99.9, 99.99)):
+        '''
+        Return a summary of the histogram as a dictionary.
+        '''
+        return {'unit': self.unit,
+                'count': self.count,
+                'min': self.min,
+                'max': self.max,
+                'mean': self.mean(),
+                'percentiles': dict((str(p), self.percentile(p)) for p in percentiles),
+                'buckets': self.buckets()}
+
+
+class RTDEMetrics(object):
+    '''
+    Link quality measurements of one RTDE connection.
+
+    Histograms (HdrHistogram):
+    arrival: Time between consecutive data packages on the local monotonic clock [ns]
+    timestampDelta: Time between consecutive data packages on the controller timestamp [ns]
+    decode: Time to decode a data package [ns]
+    readBytes: Bytes per socket read
+    readPackages: Packages per socket read
+    recovery: Time from a lost connection to the first data package after reconnecting [ns]
+
+    Counters:
+    packages: Decoded data packages
+    lost: Data packages missing according to the controller timestamp
+    lostEvents: Number of gaps with missing data packages
+    reconnects: Number of lost connections
+
+    Example:
+    rob = URBasic.rtde.RTDE(robotModel)
+    time.sleep(10)
+    print(rob.metrics().snapshot()['arrival']['percentiles'])
+    rob.metrics().dump('rtdeMetrics.json')
+    '''
+
+    def __init__(self):
+        self.arrival = HdrHistogram(60*10**9, 2, 'ns')
+        self.timestampDelta = HdrHistogram(60*10**9, 2, 'ns')
+        self.decode = HdrHistogram(10**9, 2, 'ns')
+        self.readBytes = HdrHistogram(1 << 20, 2, 'bytes')
+        self.readPackages = HdrHistogram(1 << 16, 2, 'packages')
+        self.recovery = HdrHistogram(600*10**9, 2, 'ns')
+        self.reset()
+
+    def reset(self):
+        '''
+        Clear all histograms and counters.
+        '''
+        for histogram in (self.arrival, self.timestampDelta, self.decode, self.readBytes, self.readPackages, self.recovery):
+            histogram.reset()
+        self.packages = 0
+        self.lost = 0
+        self.lostEvents = 0
+        self.reconnects = 0
+        self.started = time.time()
+        self.__lastArrival = None
+        self.__lostAt = None
+
+    def recordPackage(self, arrival, decodeTime):
+        '''
+        Record a received data package.
+
+        Input parameters:
+        arrival (int): Local monotonic time of the package, time.perf_counter_ns
+        decodeTime (int): Time used to decode the package in ns
+        '''
+        if self.__lastArrival is not None:
+            self.arrival.record(arrival - self.__lastArrival)
+        elif self.__lostAt is not None:
+            self.recovery.record(arrival - self.__lostAt)
+            self.__lostAt = None
+        self.__lastArrival = arrival
+        self.decode.record(decodeTime)
+        self.packages += 1
+
+    def recordTimestampDelta(self, delta, lost=0):
+        '''
+        Record the controller timestamp delta between two data packages.
+
+        Input parameters:
+        delta (float): Timestamp delta in seconds
+        lost (int): Number of packages missing in the gap
+        '''
+        self.timestampDelta.record(delta * 1e9)
+        if lost > 0:
+            self.lost += lost
+            self.lostEvents += 1
+
+    def recordRead(self, nbytes, packages):
+        '''
+        Record a socket read.
+
+        Input parameters:
+        nbytes (int): Bytes read
+        packages (int): Complete packages in the read data
+        '''
+        self.readBytes.record(nbytes)
+        self.readPackages.record(packages)
+
+    def recordReconnect(self):
+        '''
+        Count a lost connection, to be called when the connection is lost.
+        The arrival time of the next package is not compared to the last package,
+        but recorded as the recovery time of the connection.
+        '''
+        self.reconnects += 1
+        self.__lastArrival = None
+        if self.__lostAt is None:
+            self.__lostAt = time.perf_counter_ns()
+
+    def snapshot(self):
+        '''
+        Return all measurements as a dictionary.
+        '''
+        return {'started': self.started,
+                'time': time.time(),
+                'packages': self.packages,
+                'lost': self.lost,
+                'lostEvents': self.lostEvents,
+                'reconnects': self.reconnects,
+                'arrival': self.arrival.snapshot(),
+                'timestampDelta': self.timestampDelta.snapshot(),
+                'decode': self.decode.snapshot(),
+                'readBytes': self.readBytes.snapshot(),
+                'readPackages': self.readPackages.snapshot(),
+                'recovery': self.recovery.snapshot()}
+
+    def dump(self, filename):
+        '''
+        Write the measurements (see snapshot) to a json file.
+
+        Input parameters:
+        filename (str): Path of the file
+        '''
+        with open(filename, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
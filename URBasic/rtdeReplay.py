@@ -0,0 +1,217 @@
+'''
+Python 3.x library to control an UR robot through its TCP/IP interfaces
+Copyright (C) 2017  Martin Huus Bjerge, Rope Robotics ApS, Denmark
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+and associated documentation files (the "Software"), to deal in the Software without restriction,
+including without limitation the rights to use, copy, modify, merge, publish, distribute,
+sublicense, and/or sell copies of the Software, and to permit persons to whom the Software
+is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL "Rope Robotics ApS" BE LIABLE FOR ANY CLAIM,
+DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Except as contained in this notice, the name of "Rope Robotics ApS" shall not be used
+in advertising or otherwise to promote the sale, use or other dealings in this Software
+without prior written authorization from "Rope Robotics ApS".
+'''
+__author__ = "Martin Huus Bjerge"
+__copyright__ = "Copyright 2017, Rope Robotics ApS, Denmark"
+__license__ = "MIT License"
+
+import URBasic
+import threading
+import mmap
+import time
+import numpy as np
+from URBasic.rtde import ConnectionState, RTDEFrameBuffer, RTDERecorder, RTDESession, DEFAULT_TIMEOUT
+
+INDEX_DTYPE = np.dtype([('offset', '>u8'), ('time', '>f8'), ('direction', 'u1')])
+
+class ReplayRTDE(threading.Thread):
+    '''
+    Replay of a recording made with RTDERecorder (see the recordFile argument of RTDE) into a robot model.
+
+    The recording is memory mapped and each recorded package is fed through the same
+    RTDESession as a live RTDE interface, so the robot model, history, subscriptions and
+    metrics are updated exactly as when the packages were received. The recorded requests
+    are applied to the session (see RTDESession.handleRequest), so the recipe negotiation is
+    replayed too. Input data set by the application is accepted but not send anywhere.
+
+    Input parameters:
+    robotModel (RobotModel): The robot model to update
+    filename (str): Path of the recording
+    speed (float): Replay speed, 1.0 is real time, 10.0 is ten times faster and None is as fast as possible
+    conf_filename (string): [Optional] Path to xml file, used to name the input recipes
+    frequency (float): [Optional] Output frequency of recordings made with protocol version 1,
+                       where the packages are decimated when decoding, see RTDESession.setupOutputsRequest
+    historySeconds (float): [Optional] Keep a time series history of this length of all output fields
+    start (bool): Start the replay from the constructor
+
+    Example:
+    robotModel = URBasic.robotModel.RobotModel()
+    replay = URBasic.rtdeReplay.ReplayRTDE(robotModel, 'incident.rtde', speed=None)
+    replay.join()
+    print(replay.metrics().snapshot()['decode']['percentiles'])
+    '''
+
+    def __init__(self, robotModel, filename, speed=1.0, conf_filename=None, frequency=None, historySeconds=None, start=True):
+        '''
+        Constructor see class description for more info.
+        '''
+        if(False):
+            assert isinstance(robotModel, URBasic.robotModel.RobotModel)  ### This line is to get code completion for RobotModel
+        self.__robotModel = robotModel
+
+        logger = URBasic.dataLogging.DataLogging()
+        name = logger.AddEventLogging(__name__,log2Consol=False)
+        self._logger = logger.__dict__[name]
+        self.__session = RTDESession(robotModel, conf_filename, self._logger, historySeconds, frequency, columnLog=False)
+        self.__speed = speed
+        self.__stopEvent = threading.Event()
+
+        with open(filename + '.idx', 'rb') as f:
+            if f.read(len(RTDERecorder.MAGIC)) != RTDERecorder.MAGIC:
+                raise ValueError('Not a RTDE recording index: ' + filename + '.idx')
+            self.__index = np.frombuffer(f.read(), INDEX_DTYPE)
+        self.__file = open(filename, 'rb')
+        self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.replayed = 0
+        threading.Thread.__init__(self)
+        self.daemon = True
+        if start:
+            self.start()
+        self._logger.info('ReplayRTDE constructor done')
+
+    def packages(self):
+        '''
+        Return the number of packages in the recording (both directions).
+        '''
+        return len(self.__index)
+
+    def duration(self):
+        '''
+        Return the duration of the recording in seconds.
+        '''
+        if len(self.__index) == 0:
+            return 0.
+        return float(self.__index['time'][-1] - self.__index['time'][0])
+
+    def isRunning(self):
+        '''
+        Return True while the replay is running
+        '''
+        return self.__session.connectionState >= ConnectionState.STARTED
+
+    def session(self):
+        '''
+        Return the protocol session (RTDESession) of the replay.
+        '''
+        return self.__session
+
+    def setData(self, variable_name, value):
+        '''
+        Set input data, see RTDESession.setData
+        '''
+        return self.__session.setData(variable_name, value)
+
+    def sendData(self, recipe=None, changedOnly=False):
+        '''
+        Build the input packages like RTDE.sendData, they are not send anywhere.
+        '''
+        return self.__session.dataRequests(recipe, changedOnly) is not None
+
+    def sampleSequence(self):
+        '''
+        Return the sequence number of the latest replayed data package, see RTDESession.sampleSequence
+        '''
+        return self.__session.sampleSequence()
+
+    def wait_for_sample(self, after_seq=None, timeout=DEFAULT_TIMEOUT):
+        '''
+        Wait until a data package newer than after_seq has been replayed, see RTDESession.wait_for_sample
+        '''
+        return self.__session.wait_for_sample(after_seq, timeout)
+
+    def subscribe(self, predicate, callback=None, once=True):
+        '''
+        Register a predicate evaluated once per replayed data package, see RTDESession.subscribe
+        '''
+        return self.__session.subscribe(predicate, callback, once)
+
+    def unsubscribe(self, subscription):
+        '''
+        Remove a subscription, see subscribe.
+        '''
+        self.__session.unsubscribe(subscription)
+
+    def history(self, name=None, seconds=None, samples=None, copy=False):
+        '''
+        Return the latest window of an output field from the history, see RTDESession.history
+        '''
+        return self.__session.history(name, seconds, samples, copy)
+
+    def metrics(self):
+        '''
+        Return the measurements of the replay, see RTDEMetrics.
+        The arrival and decode times are measured during the replay.
+        '''
+        return self.__session.metrics()
+
+    def outputDecoder(self):
+        '''
+        Return the compiled decoder of the output recipe, see RTDESession.outputDecoder
+        '''
+        return self.__session.outputDecoder()
+
+    def close(self):
+        '''
+        Stop the replay and close the recording.
+        '''
+        self.__stopEvent.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+        if self.__map is not None:
+            self.__map.close()
+            self.__file.close()
+            self.__map = None
+
+    def run(self):
+        header = RTDEFrameBuffer.HEADER
+        view = memoryview(self.__map)
+        offsets = self.__index['offset'].tolist()
+        times = self.__index['time'].tolist()
+        directions = self.__index['direction'].tolist()
+        self.__session.connectionState = ConnectionState.CONNECTED
+        start = None
+        try:
+            for ii in range(len(offsets)):
+                if self.__stopEvent.is_set():
+                    break
+                (packet_size, packet_command) = header.unpack_from(view, offsets[ii])
+                packet = view[offsets[ii]+header.size:offsets[ii]+packet_size]
+                if directions[ii] == RTDERecorder.SENT:
+                    self.__session.handleRequest(packet_command, packet)
+                    continue
+                if self.__speed:
+                    if start is None:
+                        start = (time.time(), times[ii])
+                    delay = start[0] + (times[ii] - start[1]) / self.__speed - time.time()
+                    if delay > 0 and self.__stopEvent.wait(delay):
+                        break
+                self.__session.handlePackage(packet_command, packet)
+                self.replayed += 1
+        except Exception as e:
+            self._logger.error('Replay stopped at package ' + str(ii) + ': ' + str(e))
+        finally:
+            packet = None
+            view.release()
+        self.__session.connectionState = ConnectionState.DISCONNECTED
+        self.__session.notifyAll()
+        self._logger.info('Replay done, ' + str(self.replayed) + ' packages replayed')
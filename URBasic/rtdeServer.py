@@ -0,0 +1,494 @@
+'''
+Python 3.x library to control an UR robot through its TCP/IP interfaces
+Copyright (C) 2017  Martin Huus Bjerge, Rope Robotics ApS, Denmark
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+and associated documentation files (the "Software"), to deal in the Software without restriction,
+including without limitation the rights to use, copy, modify, merge, publish, distribute,
+sublicense, and/or sell copies of the Software, and to permit persons to whom the Software
+is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL "Rope Robotics ApS" BE LIABLE FOR ANY CLAIM,
+DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Except as contained in this notice, the name of "Rope Robotics ApS" shall not be used
+in advertising or otherwise to promote the sale, use or other dealings in this Software
+without prior written authorization from "Rope Robotics ApS".
+'''
+__author__ = "Martin Huus Bjerge"
+__copyright__ = "Copyright 2017, Rope Robotics ApS, Denmark"
+__license__ = "MIT License"
+
+import URBasic
+import threading
+import socket
+import select
+import struct
+import random
+import time
+import math
+from URBasic.rtde import Command, RTDEFrameBuffer, RTDE_IO_Config, RTDEDataObject
+
+OUTPUT_TYPES = {'timestamp':'DOUBLE',
+                'target_q':'VECTOR6D',
+                'target_qd':'VECTOR6D',
+                'target_qdd':'VECTOR6D',
+                'target_current':'VECTOR6D',
+                'target_moment':'VECTOR6D',
+                'actual_q':'VECTOR6D',
+                'actual_qd':'VECTOR6D',
+                'actual_current':'VECTOR6D',
+                'joint_control_output':'VECTOR6D',
+                'actual_TCP_pose':'VECTOR6D',
+                'actual_TCP_speed':'VECTOR6D',
+                'actual_TCP_force':'VECTOR6D',
+                'target_TCP_pose':'VECTOR6D',
+                'target_TCP_speed':'VECTOR6D',
+                'actual_digital_input_bits':'UINT64',
+                'joint_temperatures':'VECTOR6D',
+                'actual_execution_time':'DOUBLE',
+                'robot_mode':'INT32',
+                'joint_mode':'VECTOR6INT32',
+                'safety_mode':'INT32',
+                'actual_tool_accelerometer':'VECTOR3D',
+                'speed_scaling':'DOUBLE',
+                'target_speed_fraction':'DOUBLE',
+                'actual_momentum':'DOUBLE',
+                'actual_main_voltage':'DOUBLE',
+                'actual_robot_voltage':'DOUBLE',
+                'actual_robot_current':'DOUBLE',
+                'actual_joint_voltage':'VECTOR6D',
+                'actual_digital_output_bits':'UINT64',
+                'runtime_state':'UINT32',
+                'robot_status_bits':'UINT32',
+                'safety_status_bits':'UINT32',
+                'analog_io_types':'UINT32',
+                'standard_analog_input0':'DOUBLE',
+                'standard_analog_input1':'DOUBLE',
+                'standard_analog_output0':'DOUBLE',
+                'standard_analog_output1':'DOUBLE',
+                'io_current':'DOUBLE',
+                'euromap67_input_bits':'UINT32',
+                'euromap67_output_bits':'UINT32',
+                'euromap67_24V_voltage':'DOUBLE',
+                'euromap67_24V_current':'DOUBLE',
+                'tool_mode':'UINT32',
+                'tool_analog_input_types':'UINT32',
+                'tool_analog_input0':'DOUBLE',
+                'tool_analog_input1':'DOUBLE',
+                'tool_output_voltage':'INT32',
+                'tool_output_current':'DOUBLE',
+                'tcp_force_scalar':'DOUBLE',
+                'output_bit_registers0_to_31':'UINT32',
+                'output_bit_registers32_to_63':'UINT32',
+                'input_bit_registers0_to_31':'UINT32',
+                'input_bit_registers32_to_63':'UINT32'}
+
+INPUT_TYPES = {'speed_slider_mask':'UINT32',
+               'speed_slider_fraction':'DOUBLE',
+               'standard_digital_output_mask':'UINT8',
+               'configurable_digital_output_mask':'UINT8',
+               'standard_digital_output':'UINT8',
+               'configurable_digital_output':'UINT8',
+               'standard_analog_output_mask':'UINT8',
+               'standard_analog_output_type':'UINT8',
+               'standard_analog_output_0':'DOUBLE',
+               'standard_analog_output_1':'DOUBLE',
+               'input_bit_registers0_to_31':'UINT32',
+               'input_bit_registers32_to_63':'UINT32'}
+
+for ii in range(24):
+    OUTPUT_TYPES['output_int_register_' + str(ii)] = 'INT32'
+    OUTPUT_TYPES['output_double_register_' + str(ii)] = 'DOUBLE'
+    OUTPUT_TYPES['input_int_register_' + str(ii)] = 'INT32'
+    OUTPUT_TYPES['input_double_register_' + str(ii)] = 'DOUBLE'
+    INPUT_TYPES['input_int_register_' + str(ii)] = 'INT32'
+    INPUT_TYPES['input_double_register_' + str(ii)] = 'DOUBLE'
+
+SYNTHETIC_CONSTANTS = {'robot_mode':7,
+                       'safety_mode':1,
+                       'robot_status_bits':1,
+                       'safety_status_bits':1,
+                       'runtime_state':1,
+                       'speed_scaling':1.0,
+                       'target_speed_fraction':1.0}
+
+
+def syntheticSource(sample, timestamp):
+    '''
+    Default data source of RTDEServer: joint and TCP vectors move as slow sine waves,
+    the robot is powered on in normal mode and all other values are 0.
+
+    Input parameters:
+    sample (int): Sample number since start of the stream
+    timestamp (float): Controller timestamp of the sample
+
+    Return value:
+    values (dict): Field name and value
+    '''
+    wave = [0.1*math.sin(timestamp + ii) for ii in range(6)]
+    return {'target_q':wave,
+            'actual_q':wave,
+            'target_TCP_pose':wave,
+            'actual_TCP_pose':wave,
+            'actual_TCP_force':wave,
+            'actual_tool_accelerometer':wave[0:3]}
+
+
+class RecordedSource(object):
+    '''
+    Data source of RTDEServer streaming the data packages of a recording (see RTDERecorder)
+    in a loop. Fields not in the recording are synthetic.
+
+    Input parameters:
+    filename (str): Path of the recording
+    '''
+
+    def __init__(self, filename):
+        self.packages = []
+        replay = URBasic.rtdeReplay.ReplayRTDE(URBasic.robotModel.RobotModel(), filename, speed=None, start=False)
+        replay.subscribe(lambda package: True, self.packages.append, once=False)
+        replay.start()
+        replay.join()
+        replay.close()
+        if not len(self.packages):
+            raise ValueError('No data packages in recording: ' + filename)
+
+    def __call__(self, sample, timestamp):
+        return self.packages[sample % len(self.packages)]
+
+
+class RTDEServer(threading.Thread):
+    '''
+    Local stand-in for the RTDE server of a robot controller, for tests and benchmarks
+    without a robot or URSim.
+
+    The server answers the requests used by URBasic.rtde.RTDE (controller version, protocol
+    version 1 and 2, setup of outputs and inputs, start and pause), streams data packages at
+    the controller frequency (or the frequency requested with protocol version 2) and accepts
+    input packages. Output values come from a data source, synthetic by default.
+
+    Faults can be injected while running: fragmentation of the packages into small TCP
+    segments (fragment, with fragmentDelay seconds between the segments), random delays (jitter), a stall of the stream (injectDelay),
+    lost packages (injectLoss) and disconnects (disconnect, disconnectAfter).
+
+    Input parameters:
+    host (str): Address to listen on
+    port (int): Port to listen on, 0 selects a free port (see port attribute)
+    frequency (float): Controller frequency, e.g. 125, 500 or 1000 Hz
+    controllerVersion (tuple): Version reported to the client (major, minor, bugfix, build),
+                               default a CB3 controller at 125 Hz and an e-Series controller above
+    maxProtocol (int): Highest supported protocol version
+    source (function, str or None): Data source function(sample, timestamp) returning a dictionary
+                                    of field values, path of a recording (see RecordedSource) or None for synthetic data
+    echo (bool): Copy the received input registers to the output registers with the same number,
+                 e.g. to measure the round trip time of input_int_register_0 through output_int_register_0
+    fragment (int): [Optional] Send the packages in segments of this many bytes
+    jitter (float): Max random delay in seconds added before each data package
+
+    Example:
+    server = URBasic.rtdeServer.RTDEServer(port=30004, frequency=500)
+    robotModel = URBasic.robotModel.RobotModel()
+    robotModel.ipAddress = '127.0.0.1'
+    rtde = URBasic.rtde.RTDE(robotModel)
+    ...
+    server.disconnect()
+    server.close()
+    '''
+
+    def __init__(self, host='127.0.0.1', port=30004, frequency=500., controllerVersion=None, maxProtocol=2,
+                 source=None, echo=True, fragment=None, jitter=0.):
+        '''
+        Constructor see class description for more info.
+        '''
+        logger = URBasic.dataLogging.DataLogging()
+        name = logger.AddEventLogging(__name__,log2Consol=False)
+        self._logger = logger.__dict__[name]
+
+        self.frequency = float(frequency)
+        if controllerVersion is None:
+            controllerVersion = (3, 15, 0, 0) if self.frequency <= 125 else (5, 9, 0, 0)
+        self.controllerVersion = controllerVersion
+        self.maxProtocol = maxProtocol
+        if source is None:
+            source = syntheticSource
+        elif type(source) is str:
+            source = RecordedSource(source)
+        self.source = source
+        self.echo = echo
+        self.fragment = fragment
+        self.fragmentDelay = 0.
+        self.jitter = jitter
+        self.inputs = {}
+
+        self.__lock = threading.Lock()
+        self.__clients = []
+        self.__inputOwners = {}
+        self.__delay = 0.
+        self.__loss = 0
+        self.__disconnectAfter = None
+        self.__stop_event = threading.Event()
+        self.connections = 0
+        self.disconnects = 0
+        self.packagesSent = 0
+        self.packagesLost = 0
+        self.inputPackages = 0
+
+        self.__listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.__listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.__listener.bind((host, port))
+        self.__listener.listen(5)
+        self.host = host
+        self.port = self.__listener.getsockname()[1]
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.start()
+        self._logger.info('RTDEServer listening on ' + host + ':' + str(self.port))
+
+    def injectDelay(self, seconds):
+        '''
+        Stall the data stream of all clients for a number of seconds,
+        the packages of the stall are send late in a burst.
+        '''
+        self.__delay = seconds
+
+    def injectLoss(self, packages):
+        '''
+        Skip the next number of data packages of all clients, the controller timestamp continues.
+        '''
+        self.__loss = packages
+
+    def disconnectAfter(self, packages):
+        '''
+        Close the client connections after a number of data packages (per client), None to disable.
+        '''
+        self.__disconnectAfter = packages
+
+    def disconnect(self):
+        '''
+        Close all client connections now.
+        '''
+        with self.__lock:
+            clients = list(self.__clients)
+        for sock in clients:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def clients(self):
+        '''
+        Return the number of connected clients.
+        '''
+        return len(self.__clients)
+
+    def stats(self):
+        '''
+        Return the counters of the server.
+        '''
+        return {'connections': self.connections,
+                'clients': len(self.__clients),
+                'disconnects': self.disconnects,
+                'packagesSent': self.packagesSent,
+                'packagesLost': self.packagesLost,
+                'inputPackages': self.inputPackages}
+
+    def close(self):
+        '''
+        Stop the server and close all connections.
+        '''
+        self.__stop_event.set()
+        self.disconnect()
+        try:
+            self.__listener.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.__listener.close()
+        if threading.current_thread() is not self:
+            self.join()
+
+    def run(self):
+        while not self.__stop_event.is_set():
+            try:
+                (sock, _) = self.__listener.accept()
+            except OSError:
+                break
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.__lock:
+                self.__clients.append(sock)
+            self.connections += 1
+            thread = threading.Thread(target=self.__serve, args=(sock,))
+            thread.daemon = True
+            thread.start()
+        self._logger.info('RTDEServer stopped')
+
+    def __send(self, sock, command, payload=bytes()):
+        package = RTDEFrameBuffer.HEADER.pack(RTDEFrameBuffer.HEADER.size + len(payload), command) + payload
+        fragment = self.fragment
+        if fragment:
+            for start in range(0, len(package), fragment):
+                sock.sendall(package[start:start+fragment])
+                if self.fragmentDelay > 0:
+                    time.sleep(self.fragmentDelay)
+        else:
+            sock.sendall(package)
+
+    def __serve(self, sock):
+        frameBuffer = RTDEFrameBuffer()
+        protocol = 1
+        output = None
+        inputRecipes = {}
+        started = False
+        sample = 0
+        sent = 0
+        try:
+            while not self.__stop_event.is_set():
+                timeout = 0.1
+                if started and output is not None:
+                    deadline = output['start'] + output['ticks'](sample) / self.frequency
+                    timeout = max(0., deadline - time.perf_counter())
+                (readable, _, _) = select.select([sock], [], [], timeout)
+                if len(readable):
+                    if frameBuffer.recv(sock) == 0:
+                        break
+                    for (command, payload) in frameBuffer.frames():
+                        (protocol, output, started) = self.__handle(sock, command, bytes(payload), protocol, output, inputRecipes, started)
+                        if started and output is not None and output['start'] is None:
+                            output['start'] = time.perf_counter()
+                            sample = 0
+                    continue
+                if not started or output is None:
+                    continue
+
+                #Data package
+                if self.__delay > 0:
+                    (delay, self.__delay) = (self.__delay, 0.)
+                    time.sleep(delay)
+                if self.jitter > 0:
+                    time.sleep(random.uniform(0, self.jitter))
+                timestamp = output['ticks'](sample) / self.frequency
+                if self.__loss > 0:
+                    self.__loss -= 1
+                    self.packagesLost += 1
+                else:
+                    self.__send(sock, Command.RTDE_DATA_PACKAGE, self.__dataPayload(output, sample, timestamp))
+                    self.packagesSent += 1
+                    sent += 1
+                sample += 1
+                if self.__disconnectAfter is not None and sent >= self.__disconnectAfter:
+                    break
+        except (OSError, ValueError) as e:
+            self._logger.info('RTDEServer client error: ' + str(e))
+        except Exception as e:
+            self._logger.error('RTDEServer client error: ' + str(e))
+        finally:
+            with self.__lock:
+                self.__clients.remove(sock)
+                for name in [name for name in self.__inputOwners if self.__inputOwners[name] is sock]:
+                    del self.__inputOwners[name]
+            sock.close()
+            self.disconnects += 1
+
+    def __handle(self, sock, command, payload, protocol, output, inputRecipes, started):
+        if command == Command.RTDE_GET_URCONTROL_VERSION:
+            self.__send(sock, command, struct.pack('>IIII', *self.controllerVersion))
+        elif command == Command.RTDE_REQUEST_PROTOCOL_VERSION:
+            requested = struct.unpack_from('>H', payload)[0]
+            accepted = 1 <= requested <= self.maxProtocol
+            if accepted:
+                protocol = requested
+            self.__send(sock, command, struct.pack('>B', accepted))
+        elif command == Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS:
+            frequency = self.frequency
+            if protocol >= 2:
+                frequency = min(self.frequency, struct.unpack_from('>d', payload)[0])
+                payload = payload[8:]
+            names = payload.decode('utf-8').split(',')
+            types = [OUTPUT_TYPES.get(name, 'NOT_FOUND') for name in names]
+            response = ','.join(types).encode('utf-8')
+            if 'NOT_FOUND' in types:
+                output = None
+                if protocol >= 2:
+                    response = struct.pack('>B', 0) + response
+            else:
+                ratio = self.frequency / frequency
+                output = {'names': names,
+                          'types': types,
+                          'id': 1 if protocol >= 2 else None,
+                          'struct': struct.Struct(RTDE_IO_Config.unpack_recipe(response, False).fmt),
+                          'ticks': lambda sample: int(round(sample*ratio)),
+                          'start': None}
+                if protocol >= 2:
+                    response = struct.pack('>B', output['id']) + response
+            self.__send(sock, command, response)
+        elif command == Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS:
+            names = payload.decode('utf-8').split(',')
+            types = []
+            with self.__lock:
+                for name in names:
+                    if name not in INPUT_TYPES:
+                        types.append('NOT_FOUND')
+                    elif self.__inputOwners.get(name, sock) is not sock:
+                        types.append('IN_USE')
+                    else:
+                        types.append(INPUT_TYPES[name])
+                recipeId = 0
+                if 'NOT_FOUND' not in types and 'IN_USE' not in types:
+                    for name in names:
+                        self.__inputOwners[name] = sock
+                    recipeId = len(inputRecipes) + 1
+                    inputRecipes[recipeId] = (names, types, struct.Struct(RTDE_IO_Config.unpack_recipe(','.join(types).encode('utf-8'), False).fmt))
+            self.__send(sock, command, struct.pack('>B', recipeId) + ','.join(types).encode('utf-8'))
+        elif command == Command.RTDE_CONTROL_PACKAGE_START:
+            started = output is not None
+            if started:
+                output['start'] = None
+            self.__send(sock, command, struct.pack('>B', started))
+        elif command == Command.RTDE_CONTROL_PACKAGE_PAUSE:
+            started = False
+            self.__send(sock, command, struct.pack('>B', 1))
+        elif command == Command.RTDE_DATA_PACKAGE:
+            recipeId = payload[0]
+            if recipeId in inputRecipes:
+                (names, types, recipeStruct) = inputRecipes[recipeId]
+                values = recipeStruct.unpack_from(payload, 1)
+                index = 0
+                for ii in range(len(names)):
+                    size = RTDEDataObject.get_item_size(types[ii])
+                    self.inputs[names[ii]] = values[index] if size == 1 else list(values[index:index+size])
+                    index += size
+                self.inputPackages += 1
+        return (protocol, output, started)
+
+    def __dataPayload(self, output, sample, timestamp):
+        values = self.source(sample, timestamp)
+        packed = []
+        for ii in range(len(output['names'])):
+            name = output['names'][ii]
+            if name == 'timestamp':
+                value = timestamp
+            elif self.echo and name.startswith('output_') and 'input_' + name[7:] in self.inputs:
+                value = self.inputs['input_' + name[7:]]
+            elif name.startswith('input_') and name in self.inputs:
+                value = self.inputs[name]
+            elif name in values:
+                value = values[name]
+            else:
+                value = SYNTHETIC_CONSTANTS.get(name)
+            dataType = output['types'][ii]
+            if dataType.startswith('VECTOR'):
+                packed.extend(value if value is not None else [0]*RTDEDataObject.get_item_size(dataType))
+            elif dataType == 'DOUBLE':
+                packed.append(float(value if value is not None else 0.))
+            else:
+                packed.append(int(value if value is not None else 0))
+        payload = output['struct'].pack(*packed)
+        if output['id'] is not None:
+            payload = struct.pack('>B', output['id']) + payload
+        return payload
@@ -0,0 +1,427 @@
+'''
+Python 3.x library to control an UR robot through its TCP/IP interfaces
+Copyright (C) 2017  Martin Huus Bjerge, Rope Robotics ApS, Denmark
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+and associated documentation files (the "Software"), to deal in the Software without restriction,
+including without limitation the rights to use, copy, modify, merge, publish, distribute,
+sublicense, and/or sell copies of the Software, and to permit persons to whom the Software
+is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL "Rope Robotics ApS" BE LIABLE FOR ANY CLAIM,
+DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Except as contained in this notice, the name of "Rope Robotics ApS" shall not be used
+in advertising or otherwise to promote the sale, use or other dealings in this Software
+without prior written authorization from "Rope Robotics ApS".
+'''
+__author__ = "Martin Huus Bjerge"
+__copyright__ = "Copyright 2017, Rope Robotics ApS, Denmark"
+__license__ = "MIT License"
+
+import URBasic
+import os
+import json
+import time
+import struct
+import numpy as np
+from multiprocessing import shared_memory
+from URBasic.robotModel import RobotModel, RobotSnapshot, DataDirectory, writable
+
+DEFAULT_TIMEOUT = 1.0
+MAGIC = b'URSHM003'
+#magic, state, capacity, row size, count, layout length, process id of the publisher
+HEADER = struct.Struct('<8sQQQQQQ')
+STATE_ACTIVE = 1
+STATE_CLOSED = 2
+
+
+def _align(size, alignment=64):
+    return (size + alignment - 1) // alignment * alignment
+
+def _open(name):
+    '''
+    Open an existing block without letting the resource tracker remove it at exit.
+    '''
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        pass
+    #Python < 3.13, do not let the resource tracker remove the block of the publisher at exit
+    shm = shared_memory.SharedMemory(name)
+    from multiprocessing import resource_tracker
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+def _publisher(shm):
+    '''
+    Return the process id of the publisher of an active block, None if the block is closed,
+    not a valid block or left by a publisher that is not running anymore (e.g. after a crash).
+    '''
+    if shm.size < HEADER.size:
+        return None
+    (magic, state, _, _, _, _, pid) = HEADER.unpack_from(shm.buf, 0)
+    if magic != MAGIC or state != STATE_ACTIVE:
+        return None
+    if os.name == 'nt':
+        #The block is removed with its last handle on Windows, so an existing block is in use
+        return pid
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        pass
+    return pid
+
+
+class RTDESharedMemory(object):
+    '''
+    Publication of the decoded output packages of RTDE in a shared memory block,
+    read by other local processes with SharedRobotModel.
+
+    Layout of the block:
+    header: magic, state, capacity, row size, count (packages published) and the length of the layout
+    layout: json with the field names, types and the structured dtype of the rows
+    sequences: uint64 per row, the seqlock of the row
+    rows: ring of capacity rows of the structured dtype of RTDEOutputDecoder.record,
+          every field in its native type (UINT64 counters stay exact)
+
+    Each row is guarded by its own seqlock. The writer sets the sequence of the row odd
+    (2*n+1 for package n) while writing the row and even (2*n+2) when done, and then publishes
+    the package by incrementing count. A reader knows the sequence a complete row must have,
+    so a row that is being written or has been overwritten is detected without any lock,
+    and the writer is never blocked by readers.
+
+    When the output recipe changes the block is marked closed and a new block is created
+    with the same name; readers attach the new block automatically. A block left by a publisher
+    that is not running anymore is replaced, a ValueError is raised if another publisher
+    is using the name.
+
+    Input parameters:
+    name (str): Name of the shared memory block
+    decoder (RTDEOutputDecoder): Decoder of the output recipe to publish
+    capacity (int): Number of packages kept in the ring (history)
+
+    Example:
+    rob = URBasic.rtde.RTDE(robotModel, sharedMemory='ur_robot1')
+    '''
+
+    def __init__(self, name, decoder, capacity=500):
+        if capacity < 1:
+            raise ValueError('Shared memory capacity must be positive')
+        self.name = name
+        self.names = decoder.names
+        self.capacity = int(capacity)
+        self.dtype = decoder.dtype
+        fields = [decoder.dtype.fields[name] for name in decoder.names]
+        layout = json.dumps({'names': decoder.names,
+                             'types': decoder.types,
+                             'formats': [field[0].str if field[0].subdtype is None else [field[0].base.str, list(field[0].shape)] for field in fields],
+                             'offsets': [field[1] for field in fields],
+                             'itemsize': decoder.dtype.itemsize}).encode('utf-8')
+        sequencesOffset = _align(HEADER.size + len(layout))
+        rowsOffset = _align(sequencesOffset + 8*self.capacity)
+        size = rowsOffset + self.capacity*self.dtype.itemsize
+        try:
+            self.__shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            old = _open(name)
+            pid = _publisher(old)
+            if pid is None:
+                #Left over from a previous publisher, e.g. after a crash, readers attach the new block
+                old.buf[8:16] = struct.pack('<Q', STATE_CLOSED)
+            old.close()
+            if pid is not None:
+                raise ValueError('Shared memory ' + name + ' is in use by the publisher process ' + str(pid))
+            old = shared_memory.SharedMemory(name)
+            old.close()
+            old.unlink()
+            self.__shm = shared_memory.SharedMemory(name, create=True, size=size)
+        buf = self.__shm.buf
+        buf[HEADER.size:HEADER.size+len(layout)] = layout
+        self.__sequences = np.ndarray((self.capacity,), np.uint64, buf, sequencesOffset)
+        self.__rows = np.ndarray((self.capacity,), self.dtype, buf, rowsOffset)
+        self.__header = np.ndarray((7,), np.uint64, buf, 0)
+        self.__sequences[:] = 0
+        self.__count = 0
+        HEADER.pack_into(buf, 0, MAGIC, STATE_ACTIVE, self.capacity, self.dtype.itemsize, 0, len(layout), os.getpid())
+
+    def publish(self, record):
+        '''
+        Publish a package (only to be called from the writer thread).
+
+        Input parameters:
+        record (numpy array): Package values, see RTDEOutputDecoder.record
+        '''
+        count = self.__count
+        index = count % self.capacity
+        self.__sequences[index] = 2*count+1
+        self.__rows[index] = record
+        self.__sequences[index] = 2*count+2
+        self.__count = count + 1
+        self.__header[4] = self.__count
+
+    def close(self):
+        '''
+        Mark the block closed and remove it.
+        '''
+        if self.__shm is None:
+            return
+        self.__header[1] = STATE_CLOSED
+        self.__sequences = None
+        self.__rows = None
+        self.__header = None
+        self.__shm.close()
+        try:
+            self.__shm.unlink()
+        except FileNotFoundError:
+            pass
+        self.__shm = None
+
+
+class SharedDataDirectory(DataDirectory):
+    '''
+    Read only DataDirectory of SharedRobotModel, the fields of the shared output recipe are
+    read from the latest published package (see SharedRobotModel.snapshot), other fields are None.
+    '''
+    @property
+    def snapshot(self):
+        return self.model.snapshot()
+
+
+class SharedRobotModel(RobotModel):
+    '''
+    Read only robot model of another process, fed by the RTDE interface of that process
+    through shared memory (see RTDESharedMemory and the sharedMemory argument of RTDE).
+
+    Any number of local processes can read the latest package and a short history without
+    their own RTDE connection. Reads never block the publishing process and never return
+    a package that was partly overwritten (torn). dataDir and the accessor functions of
+    RobotModel work as in the publishing process.
+
+    Input parameters:
+    name (str): Name of the shared memory block
+    timeout (float): Max time to wait for the block to be created (or recreated by the publisher)
+
+    Example:
+    robotModel = URBasic.sharedRobotModel.SharedRobotModel('ur_robot1')
+    print(robotModel.ActualTCPPose())
+    (sequence, row) = robotModel.latest(copy=False)
+    pose = row['actual_TCP_pose']
+    if robotModel.isValid(sequence): ...
+    robotModel.close()
+    '''
+
+    def __init__(self, name, timeout=10.):
+        '''
+        Constructor see class description for more info.
+        '''
+        RobotModel.__init__(self)
+        self.name = name
+        self.__timeout = timeout
+        self.__shm = None
+        self.__attach(timeout)
+        dataDir = SharedDataDirectory(self.dataDir)
+        dataDir.usedKeys = set()
+        dataDir.model = self
+        self.dataDir = dataDir
+
+    def __attach(self, timeout):
+        t0 = time.time()
+        while True:
+            try:
+                shm = _open(self.name)
+            except FileNotFoundError:
+                shm = None
+            if shm is not None:
+                (magic, state, capacity, itemsize, _, layoutLength, _) = HEADER.unpack_from(shm.buf, 0)
+                if magic == MAGIC and state == STATE_ACTIVE:
+                    break
+                shm.close()
+            if timeout is not None and time.time()-t0 > timeout:
+                raise ValueError('Shared robot model not found: ' + self.name)
+            time.sleep(0.01)
+
+        layout = json.loads(bytes(shm.buf[HEADER.size:HEADER.size+layoutLength]).decode('utf-8'))
+        sequencesOffset = _align(HEADER.size + layoutLength)
+        rowsOffset = _align(sequencesOffset + 8*capacity)
+        self.names = layout['names']
+        self.types = dict(zip(layout['names'], layout['types']))
+        formats = [fmt if isinstance(fmt, str) else (fmt[0], tuple(fmt[1])) for fmt in layout['formats']]
+        self.dtype = np.dtype({'names': self.names, 'formats': formats,
+                               'offsets': layout['offsets'], 'itemsize': itemsize})
+        self.__scalars = frozenset(name for name in self.names if self.dtype.fields[name][0].subdtype is None)
+        self.capacity = capacity
+        self.__header = np.ndarray((7,), np.uint64, shm.buf, 0)
+        self.__sequences = np.ndarray((capacity,), np.uint64, shm.buf, sequencesOffset)
+        self.__rows = np.ndarray((capacity,), self.dtype, shm.buf, rowsOffset)
+        self.__shm = shm
+        self.__snapshot = None
+
+    def __reattach(self):
+        '''
+        Attach the new block if the publisher closed the block (e.g. recipe change),
+        raises ValueError if no new block is created within the timeout.
+        '''
+        if self.__shm is not None and int(self.__header[1]) == STATE_ACTIVE:
+            return False
+        self.__detach()
+        self.__attach(self.__timeout)
+        return True
+
+    def __detach(self):
+        self.__header = None
+        self.__sequences = None
+        self.__rows = None
+        if self.__shm is not None:
+            self.__shm.close()
+            self.__shm = None
+
+    def sampleSequence(self):
+        '''
+        Return the sequence number of the latest published package (1 for the first package), 0 if none.
+        '''
+        self.__reattach()
+        return int(self.__header[4])
+
+    def isValid(self, sequence):
+        '''
+        Return True if the row of a package returned with latest(copy=False) is still
+        holding that package, i.e. the values read from the view since latest are not torn.
+        '''
+        if self.__shm is None:
+            return False
+        return int(self.__sequences[(sequence-1) % self.capacity]) == 2*sequence
+
+    def latest(self, copy=True):
+        '''
+        Return the latest published package.
+
+        Input parameters:
+        copy (bool): Return a verified copy of the row, else a view into the shared memory
+                     that is valid until the publisher wraps around (check with isValid after reading)
+
+        Return value:
+        sequence (int): Sequence number of the package, 0 if none published yet
+        row (numpy array): Values of the package, a 0-d array of the structured dtype, index it by field name
+        '''
+        while True:
+            self.__reattach()
+            sequence = int(self.__header[4])
+            if sequence == 0:
+                return (0, None)
+            index = (sequence-1) % self.capacity
+            if int(self.__sequences[index]) != 2*sequence:
+                continue
+            row = self.__rows[index:index+1].reshape(())
+            if not copy:
+                return (sequence, row)
+            row = row.copy()
+            if int(self.__sequences[index]) == 2*sequence:
+                return (sequence, row)
+
+    def value(self, name):
+        '''
+        Return the latest value of a field as in RobotModel.dataDir, None if not shared.
+        The value is read from the snapshot, which is copied once per published package.
+        '''
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return None
+        return writable(snapshot.get(name))
+
+    def latestValues(self):
+        '''
+        Return all fields of the latest package as a dictionary (a consistent snapshot).
+        '''
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return {}
+        return dict((name, writable(value)) for (name, value) in snapshot.copy().items())
+
+    def snapshot(self):
+        '''
+        Return the latest published package as a RobotSnapshot (a verified copy), see RobotModel.snapshot
+        The snapshot is reused until a new package is published.
+
+        Return value:
+        snapshot (RobotSnapshot or None if no package is published yet)
+        '''
+        snapshot = self.__snapshot
+        if snapshot is not None and snapshot.sequence == self.sampleSequence() and self.__snapshot is snapshot:
+            return snapshot
+        (sequence, row) = self.latest()
+        if row is None:
+            return None
+        row.flags.writeable = False
+        snapshot = RobotSnapshot(self.__values(row), sequence)
+        self.__snapshot = snapshot
+        return snapshot
+
+    def __values(self, row):
+        scalars = self.__scalars
+        return dict((name, row[name].item() if name in scalars else row[name]) for name in self.names)
+
+    def history(self, name=None, samples=None):
+        '''
+        Return a verified copy of the latest packages in the shared ring.
+
+        Input parameters:
+        name (str): Field name of the output recipe, None returns the rows of all fields (structured array)
+        samples (int): [Optional] Number of packages (default all available)
+
+        Return value:
+        sequence (int): Sequence number of the latest package of the window
+        values (numpy array): Values of the window, one row per package, oldest first
+        '''
+        if name is not None and name not in self.types:
+            raise ValueError(str(name) + ' not found in shared output recipe')
+        while True:
+            self.__reattach()
+            sequence = int(self.__header[4])
+            length = min(sequence, self.capacity - 1)
+            if samples is not None:
+                length = min(length, samples)
+            indices = np.arange(sequence-length, sequence) % self.capacity
+            values = self.__rows[indices]
+            if name is not None:
+                values = values[name]
+            expected = 2*np.arange(sequence-length+1, sequence+1, dtype=np.uint64)
+            if np.array_equal(self.__sequences[indices], expected):
+                return (sequence, values)
+
+    def wait_for_sample(self, after_seq=None, timeout=DEFAULT_TIMEOUT, interval=0.0005):
+        '''
+        Wait until a package newer than after_seq is published, polling the shared memory.
+
+        Input parameters:
+        after_seq (int): [Optional] Sequence number to wait beyond, default is the latest package
+        timeout (float): [Optional] Max time to wait in seconds, None waits forever
+        interval (float): Polling interval in seconds
+
+        Return value:
+        sequence (int): Sequence number of the latest package, None if timed out
+        '''
+        if after_seq is None:
+            after_seq = self.sampleSequence()
+        t0 = time.time()
+        while True:
+            sequence = self.sampleSequence()
+            if sequence > after_seq:
+                return sequence
+            if timeout is not None and time.time()-t0 > timeout:
+                return None
+            time.sleep(interval)
+
+    def close(self):
+        '''
+        Detach the shared memory, the block is kept for the publisher and other readers.
+        '''
+        self.__detach()
@@ -47,6 +47,7 @@ class UrScript(object):
     host (string):  hostname or IP of UR Robot (RT CLient server)
     rtde_conf_filename (string):  Path to xml file describing what channels to activate
     logger (URBasis_DataLogging obj): A instance if a logger object if common logging is needed.
+    reactor (URBasic.reactor.Reactor): [Optional] Serve the connections from a reactor thread shared by many robots
 
     
     Example:
@@ -55,14 +56,14 @@ class UrScript(object):
     '''
 
 
-    def __init__(self, host, robotModel, hasForceTorque=False):
+    def __init__(self, host, robotModel, hasForceTorque=False, reactor=None):
         '''
         Constructor see class description for more info.
         '''
         logger = URBasic.dataLogging.DataLogging()        
         name = logger.AddEventLogging(__name__)        
         self.__logger = logger.__dict__[name]
-        self.robotConnector = URBasic.robotConnector.RobotConnector(robotModel, host, hasForceTorque)
+        self.robotConnector = URBasic.robotConnector.RobotConnector(robotModel, host, hasForceTorque, reactor)
         #time.sleep(200)
         while(self.robotConnector.RobotModel.ActualTCPPose() is None):      ## check paa om vi er startet
             print("waiting for everything to be ready")
@@ -1226,10 +1227,15 @@ end
         '''
         Uses up the remaining "physical" time a thread has in the current
         frame/sample.
+        Returns when the next RTDE data package has been received.
+
+        Return Value:
+        sequence (int): RTDE package sequence number, None if no package was received within the timeout
         '''
-        initialRobotTime = self.robotConnector.RobotModel.RobotTimestamp()
-        while(self.robotConnector.RobotModel.RobotTimestamp() == initialRobotTime):
-            time.sleep(0.001)
+        sequence = self.robotConnector.RTDE.wait_for_sample()
+        if sequence is None:
+            self.__logger.warning('sync: No RTDE data package received')
+        return sequence
 
     
     def textmsg(self, s1, s2=''):
@@ -49,6 +49,7 @@ class UrScriptExt(URBasic.urScript.UrScript):
     host (string):  hostname or IP of UR Robot (RT CLient server)
     rtde_conf_filename (string):  Path to xml file describing what channels to activate
     logger (URBasis_DataLogging obj): A instance if a logger object if common logging is needed.
+    reactor (URBasic.reactor.Reactor): [Optional] Serve the connections from a reactor thread shared by many robots
 
 
     Example:
@@ -57,10 +58,10 @@ class UrScriptExt(URBasic.urScript.UrScript):
     '''
 
 
-    def __init__(self, host, robotModel, hasForceTorque=False):
+    def __init__(self, host, robotModel, hasForceTorque=False, reactor=None):
         if host is None: #Only for enable code completion
             return
-        super(UrScriptExt, self).__init__(host, robotModel, hasForceTorque)        
+        super(UrScriptExt, self).__init__(host, robotModel, hasForceTorque, reactor)        
         logger = URBasic.dataLogging.DataLogging()
         name = logger.AddEventLogging(__name__)
         self.__logger = logger.__dict__[name]
@@ -395,25 +396,24 @@ end
         wrench_gain = np.array(wrench_gain)
         self.set_force_remote(task_frame, selection_vector, wrench, limits, f_type)
 
-        dist = np.array(range(60),float)
-        dist.fill(0.)
+        dist = URBasic.filters.MovingAverage(60, initial=0.)
         cnt = 0
         old_pose=self.get_actual_tcp_pose()*np.array(selection_vector)
-        while np.sum(dist)<start_tolerance and cnt<timeoutcnt:
+        while dist.total()<start_tolerance and cnt<timeoutcnt:
             new_pose = self.get_actual_tcp_pose()*np.array(selection_vector)
             wrench = wrench*wrench_gain #Need a max wrencd check
             self.set_force_remote(task_frame, selection_vector, wrench, limits, f_type)
-            dist[np.mod(cnt,60)] = np.abs(np.sum(new_pose-old_pose))
+            dist(np.abs(np.sum(new_pose-old_pose)))
             old_pose=new_pose
             cnt +=1
 
         #Check if robot started to move
         if cnt<timeoutcnt:
-            dist.fill(stop_tolerance)
+            dist = URBasic.filters.MovingAverage(60, initial=stop_tolerance)
             cnt = 0
-            while np.sum(dist)>stop_tolerance and cnt<timeoutcnt:
+            while dist.total()>stop_tolerance and cnt<timeoutcnt:
                 new_pose = self.get_actual_tcp_pose()*np.array(selection_vector)
-                dist[np.mod(cnt,60)] = np.abs(np.sum(new_pose-old_pose))
+                dist(np.abs(np.sum(new_pose-old_pose)))
                 old_pose=new_pose
                 cnt +=1
 
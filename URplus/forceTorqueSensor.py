@@ -188,4 +188,88 @@ class ForceTorqueSensor(threading.Thread):
             
         with self.__dataEvent:
             self.__dataEvent.wait()
-        return True
\ No newline at end of file
+        return True
+
+class ReactorForceTorqueSensor(URBasic.reactor.ReactorConnection):
+    '''
+    Interface to the Robotiq FT 300 Sensor served by a URBasic.reactor.Reactor,
+    with the API of ForceTorqueSensor. The "(fx , fy , fz , mx , my , mz)" messages
+    are parsed by the reactor thread as they arrive.
+    '''
+
+    def __init__(self, reactor, robotModel):
+        '''
+        Constructor
+        '''
+        URBasic.reactor.ReactorConnection.__init__(self, reactor, robotModel.ipAddress, 63351)
+        self.__robotModel = robotModel
+        logger = URBasic.dataLogging.DataLogging()
+        name = logger.AddEventLogging(__name__)
+        self._logger = logger.__dict__[name]
+        self.__dataEvent = threading.Condition()
+        self.__buffer = bytearray(4096)
+        self.__pending = bytearray()
+        self.__started = False
+        self.open()
+        self.wait_ft()
+        self._logger.info('FT constructor done')
+
+    def get_forceTorqueSignal(self,Wait=False):
+        if Wait:
+            self.wait_ft()
+        return self.__robotModel.dataDir['urPlus_force_torque_sensor']
+
+    def is_running(self):
+        '''
+        Return True if Force Torque sensor data interface is running
+        '''
+        return self.__started and self.isConnected()
+
+    def wait_ft(self, timeout=DEFAULT_TIMEOUT):
+        '''Wait for the next data set from the sensor.'''
+        with self.__dataEvent:
+            if not self.__dataEvent.wait(timeout):
+                self._logger.warning('wait_ft timed out while FT interface not running')
+                return False
+        return True
+
+    def getBuffer(self):
+        return memoryview(self.__buffer)
+
+    def onConnected(self):
+        self.__pending = bytearray()
+
+    def onData(self, nbytes):
+        self.__pending += self.__buffer[:nbytes]
+        while True:
+            end = self.__pending.find(b')')
+            if end < 0:
+                break
+            start = self.__pending.rfind(b'(', 0, end)
+            message = self.__pending[start+1:end].decode('ascii', 'replace')
+            del self.__pending[:end+1]
+            if start < 0:
+                continue
+            try:
+                self.__robotModel.dataDir['urPlus_force_torque_sensor'] = np.array([float(x) for x in message.split(' , ')])
+            except ValueError:
+                self._logger.warning('FT message not valid: ' + message)
+                continue
+            if not self.__started:
+                self.__started = True
+                self.resetBackoff()
+            with self.__dataEvent:
+                self.__dataEvent.notify_all()
+
+    def onDisconnected(self):
+        self.__started = False
+        self._logger.error("FT interface stopped running")
+
+    def close(self):
+        '''
+        Close the connection to the force torque sensor.
+        '''
+        URBasic.reactor.ReactorConnection.close(self)
+        with self.__dataEvent:
+            self.__dataEvent.notify_all()
+        return True